@@ -5,7 +5,8 @@ from enum import Enum, auto
 from dateutil.relativedelta import relativedelta
 
 from SimCFA.builder import GenericBuilder
-from SimCFA.compound_interest_calculator import compound_interest_calc
+from SimCFA.compound_interest_calculator import growth_factor
+from SimCFA.timeseries import Curve
 
 DAYS_YEAR = 365
 
@@ -61,9 +62,7 @@ class Bond(LedgerItem):
             days_passed = self.max_duration_in_days
             use_penalty = 0
 
-        days_as_year_float = days_passed / DAYS_YEAR
-
-        x = compound_interest_calc(self.percent, days_as_year_float, self.capitalisation_periods)
+        x = growth_factor(self.percent, days_passed, self.capitalisation_periods, DAYS_YEAR)
         cash_received = x * self.price
         return (cash_received - use_penalty) * self.properties.quantity
 
@@ -99,6 +98,36 @@ three_year_bond_builder = (
 )
 
 
+@dataclass
+class CompoundAsset(LedgerItem):
+    """Asset without maturity whose price compounds yearly at `percent` (0 keeps the price constant)"""
+
+    price: int
+    percent: float = 0
+
+    def get_value(self, n_day: int):
+        days_passed = n_day - self.properties.acquired_on
+        x = growth_factor(self.percent, days_passed, days_in_year=DAYS_YEAR)
+        return x * self.price * self.properties.quantity
+
+
+compound_asset_builder = GenericBuilder(CompoundAsset)
+
+
+@dataclass
+class CurveAsset(LedgerItem):
+    """Asset without maturity valued per unit by `price_curve`, a `Curve` indexed by simulation day"""
+
+    price: int
+    price_curve: Curve = None
+
+    def get_value(self, n_day: int):
+        return self.price_curve.value_at(n_day) * self.properties.quantity
+
+
+curve_asset_builder = GenericBuilder(CurveAsset)
+
+
 @dataclass
 class Debt(LedgerItem):
     percent: int
@@ -106,6 +135,6 @@ class Debt(LedgerItem):
     def get_value(self, n_day: int) -> int:
         acq_on = self.properties.acquired_on
         days_passed = n_day - acq_on
-        multiply = compound_interest_calc(self.percent, days_passed / DAYS_YEAR)
+        multiply = growth_factor(self.percent, days_passed, days_in_year=DAYS_YEAR)
         value = self.properties.quantity * multiply
         return -value
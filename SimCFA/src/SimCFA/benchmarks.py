@@ -0,0 +1,299 @@
+"""
+Benchmark suite of synthetic scenarios built from the existing procedures.
+
+Every scenario is run `repeat` times for the best wall time, once more under tracemalloc for the peak memory and once
+with the event profiler for the dispatch counts. Results are written as JSON, budgets (absolute limits) and a baseline
+(earlier results) make the run fail when a scenario regresses:
+
+    simcfa-bench --output results.json --budgets budgets.json --baseline previous.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import date
+from importlib import metadata
+
+from SimCFA.configs import build_config1_simulation
+from SimCFA.LedgerItem import DAYS_YEAR, three_year_bond_builder
+from SimCFA.simulation import Simulation
+from SimCFA.simulation_procedures import (
+    add_month_day_date_guard,
+    append_cash,
+    attach_run_summary,
+    create_bond_buy,
+    create_bond_buy_back_for_cash,
+    create_cash_income,
+    create_debt_payback_strategy,
+    create_debt_with_interest,
+    create_loan_on_negative_cash,
+    create_loan_payback,
+    create_simulate_monthly_cash_move,
+    create_simulation_state_recorder,
+    create_simulation_state_save,
+)
+
+BENCH_START_DATE = date(2023, 6, 1)
+# days simulated with a full state save, deep copying the whole simulation every day does not scale to decades
+STATE_SAVE_YEARS = 2
+
+
+def build_bond_ladder(years: int = 30, quantity: int = 50) -> Simulation:
+    """Monthly salary buying a new 3 year bond every month, the bonds are bought back for cash on expiry"""
+    simulation = Simulation(years * DAYS_YEAR, BENCH_START_DATE)
+    simulation.add_event_listener_applied('simulation_started', append_cash(100_000_00))
+    simulation.add_event_listener_applied('day_started', create_cash_income([(BENCH_START_DATE, 6000_00)]))
+    bonds_buy = add_month_day_date_guard(create_bond_buy(quantity, three_year_bond_builder), 15)
+    simulation.add_event_listener_applied('day_started', bonds_buy)
+    simulation.add_event_listener_applied('bond_buy_back', create_bond_buy_back_for_cash())
+    simulation.add_event_listener_applied('cash_state_negative', create_debt_with_interest())
+    return simulation
+
+
+def build_debt_churn(years: int = 20) -> Simulation:
+    """Expenses above the income every month, new debt is taken each month while the old one is paid back"""
+    simulation = Simulation(years * DAYS_YEAR, BENCH_START_DATE)
+    simulation.add_event_listener_applied('simulation_started', append_cash(0))
+    simulation.add_event_listener_applied('day_started', create_cash_income([(BENCH_START_DATE, 4000_00)], 10))
+    simulation.add_event_listener_applied('day_started', create_simulate_monthly_cash_move(-4500_00, day_apply=20))
+    simulation.add_event_listener_applied('day_started', create_debt_payback_strategy(300_00))
+    simulation.add_event_listener_applied('cash_state_negative', create_debt_with_interest())
+    return simulation
+
+
+def build_loan_churn(years: int = 20) -> Simulation:
+    """`build_debt_churn` with the shortfalls borrowed in the loan book: one loan, paid back with interest"""
+    simulation = Simulation(years * DAYS_YEAR, BENCH_START_DATE)
+    simulation.add_event_listener_applied('simulation_started', append_cash(0))
+    simulation.add_event_listener_applied('day_started', create_cash_income([(BENCH_START_DATE, 4000_00)], 10))
+    simulation.add_event_listener_applied('day_started', create_simulate_monthly_cash_move(-4500_00, day_apply=20))
+    simulation.add_event_listener_applied('day_started', add_month_day_date_guard(create_loan_payback(300_00), 10))
+    simulation.add_event_listener_applied('cash_state_negative', create_loan_on_negative_cash())
+    return simulation
+
+
+def _build_shortfalls(years: int, borrow, pay_back) -> Simulation:
+    simulation = Simulation(years * DAYS_YEAR, BENCH_START_DATE)
+    simulation.add_event_listener_applied('simulation_started', append_cash(0))
+    simulation.add_event_listener_applied('day_started', create_cash_income([(BENCH_START_DATE, 1000_00)], 10))
+    # spending on every day of the month outruns the income, the cash goes negative on most days and thousands of
+    # shortfalls pile up
+    for day_apply in range(1, 29):
+        simulation.add_event_listener_applied(
+            'day_started', create_simulate_monthly_cash_move(-150_00, day_apply=day_apply)
+        )
+    simulation.add_event_listener_applied('day_started', pay_back)
+    simulation.add_event_listener_applied('cash_state_negative', borrow)
+    return simulation
+
+
+def build_debt_shortfalls(years: int = 20) -> Simulation:
+    """Shortfalls on most days, each one a new `Debt` item walked by the monthly payback"""
+    return _build_shortfalls(years, create_debt_with_interest(), create_debt_payback_strategy(300_00))
+
+
+def build_loan_shortfalls(years: int = 20) -> Simulation:
+    """`build_debt_shortfalls` borrowing in the loan book, every shortfall is merged into the same loan"""
+    payback = add_month_day_date_guard(create_loan_payback(300_00), 10)
+    return _build_shortfalls(years, create_loan_on_negative_cash(), payback)
+
+
+SCENARIOS = {
+    'config1_10y': lambda: build_config1_simulation({'years': 10}),
+    'config1_50y': lambda: build_config1_simulation({'years': 50}),
+    'config1_100y': lambda: build_config1_simulation({'years': 100}),
+    'bond_ladder_30y': build_bond_ladder,
+    'debt_churn_20y': build_debt_churn,
+    'loan_churn_20y': build_loan_churn,
+    'debt_shortfalls_20y': build_debt_shortfalls,
+    'loan_shortfalls_20y': build_loan_shortfalls,
+}
+
+# generous limits for a developer machine, tighten them in a budgets file for the CI machine
+DEFAULT_BUDGETS = {
+    'config1_10y': {'max_seconds': 2, 'max_peak_memory_mb': 50},
+    'config1_50y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'config1_100y': {'max_seconds': 20, 'max_peak_memory_mb': 200},
+    'bond_ladder_30y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'debt_churn_20y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'loan_churn_20y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'debt_shortfalls_20y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'loan_shortfalls_20y': {'max_seconds': 10, 'max_peak_memory_mb': 100},
+    'state_save': {'max_seconds_per_state': 0.005, 'max_recorder_seconds_per_state': 0.0005},
+}
+
+
+def _run(build_fn, with_recorder: bool = True):
+    simulation = build_fn()
+    access_summary = attach_run_summary(simulation)
+    if with_recorder:
+        record_state, _ = create_simulation_state_recorder(simulation.n_days)
+        simulation.add_event_listener_applied('day_ended', record_state)
+    return simulation, access_summary
+
+
+def measure_scenario(build_fn, repeat: int = 3) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        simulation, access_summary = _run(build_fn)
+        start = time.perf_counter()
+        simulation.simulate()
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+
+    simulation, _ = _run(build_fn)
+    tracemalloc.start()
+    try:
+        simulation.simulate()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    simulation, _ = _run(build_fn)
+    profiler = simulation.enable_profiling()
+    simulation.simulate()
+    simulation.disable_profiling()
+
+    return {
+        'n_days': simulation.n_days,
+        'seconds': best,
+        'seconds_all': seconds,
+        'days_per_second': simulation.n_days / best,
+        'peak_memory_mb': peak / 2**20,
+        'events_posted': {event_type: stats.calls for event_type, stats in profiler.events.items()},
+        'listener_calls': sum(stats.calls for stats in profiler.listeners.values()),
+        'final_net_worth': access_summary()['final_net_worth'],
+    }
+
+
+def measure_state_save(repeat: int = 3) -> dict:
+    """Cost of one saved state: the deep copy of `create_simulation_state_save` against the columnar recorder"""
+
+    def time_listener(create_listener):
+        best = float('inf')
+        for _ in range(repeat):
+            simulation = build_config1_simulation({'years': STATE_SAVE_YEARS})
+            listener = create_listener(simulation)
+            simulation.add_event_listener_applied('day_ended', listener)
+            start = time.perf_counter()
+            simulation.simulate()
+            best = min(best, time.perf_counter() - start)
+        return best, simulation.n_days
+
+    without, n_days = time_listener(lambda simulation: lambda **kwargs: None)
+    deepcopy_seconds, _ = time_listener(lambda simulation: create_simulation_state_save()[0])
+    recorder_seconds, _ = time_listener(lambda simulation: create_simulation_state_recorder(simulation.n_days)[0])
+    return {
+        'n_days': n_days,
+        'seconds_per_state': max(deepcopy_seconds - without, 0) / n_days,
+        'recorder_seconds_per_state': max(recorder_seconds - without, 0) / n_days,
+    }
+
+
+def run_benchmarks(names=None, repeat: int = 3) -> dict:
+    names = list(SCENARIOS) + ['state_save'] if names is None else names
+    results = {}
+    for name in names:
+        if name == 'state_save':
+            results[name] = measure_state_save(repeat)
+        else:
+            results[name] = measure_scenario(SCENARIOS[name], repeat)
+    try:
+        version = metadata.version('simcfa')
+    except metadata.PackageNotFoundError:
+        version = 'unknown'
+    return {
+        'simcfa_version': version,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'scenarios': results,
+    }
+
+
+# budget key -> measured key, budgets are upper limits
+BUDGET_KEYS = {
+    'max_seconds': 'seconds',
+    'max_peak_memory_mb': 'peak_memory_mb',
+    'max_seconds_per_state': 'seconds_per_state',
+    'max_recorder_seconds_per_state': 'recorder_seconds_per_state',
+}
+# measured keys compared against the baseline, lower is better
+BASELINE_KEYS = ('seconds', 'peak_memory_mb', 'seconds_per_state', 'recorder_seconds_per_state')
+
+
+def check_budgets(results: dict, budgets: dict) -> list:
+    failures = []
+    for name, budget in budgets.items():
+        measured = results['scenarios'].get(name)
+        if measured is None:
+            continue
+        for budget_key, limit in budget.items():
+            value = measured[BUDGET_KEYS[budget_key]]
+            if value > limit:
+                failures.append(f'{name}: {BUDGET_KEYS[budget_key]} {value:.6g} over the budget of {limit:.6g}')
+    return failures
+
+
+def check_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of more than `tolerance` (relative) against the results of an earlier run"""
+    failures = []
+    for name, measured in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for key in BASELINE_KEYS:
+            if key in measured and previous.get(key) and measured[key] > previous[key] * (1 + tolerance):
+                change = measured[key] / previous[key] - 1
+                failures.append(
+                    f'{name}: {key} {measured[key]:.6g} is {change:.0%} over the baseline {previous[key]:.6g}'
+                )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the SimCFA benchmark scenarios')
+    parser.add_argument(
+        'scenarios', nargs='*', help=f'scenarios to run, all by default: {", ".join(SCENARIOS)}, state_save'
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario, the best time is kept')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--budgets', help='JSON file with the budgets, the default budgets are used when omitted')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression against baseline')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenarios or None, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    for name, measured in results['scenarios'].items():
+        if 'days_per_second' in measured:
+            print(
+                f'{name:<16} {measured["seconds"]:>8.3f} s {measured["days_per_second"]:>10.0f} days/s '
+                f'{measured["peak_memory_mb"]:>8.1f} MB {measured["listener_calls"]:>9} listener calls'
+            )
+        else:
+            print(
+                f'{name:<16} {measured["seconds_per_state"] * 1e6:>8.1f} us/state deepcopy '
+                f'{measured["recorder_seconds_per_state"] * 1e6:>8.1f} us/state recorder'
+            )
+
+    budgets = DEFAULT_BUDGETS
+    if args.budgets:
+        with open(args.budgets) as file:
+            budgets = json.load(file)
+    failures = check_budgets(results, budgets)
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures += check_baseline(results, json.load(file), args.tolerance)
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import copyreg
+import types
+from datetime import date, datetime, timedelta
+from enum import Enum
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+# values which are never changed in place, copies share them with the original
+IMMUTABLE_TYPES = (
+    type(None),
+    bool,
+    int,
+    float,
+    complex,
+    str,
+    bytes,
+    type,
+    range,
+    types.CodeType,
+    types.ModuleType,
+    date,
+    datetime,
+    timedelta,
+    relativedelta,
+    Enum,
+    np.dtype,
+    np.generic,
+)
+# exact types checked inline for the elements of containers, saves a call per number of a long curve
+SCALAR_TYPES = frozenset((type(None), bool, int, float, str))
+
+
+class StateCopier:
+    """
+    Deep copy of simulation state which also copies the closures of the listeners: the cells of every function with a
+    closure are copied, so a copied listener keeps its own state (counters, `nonlocal` variables, recordings) and
+    refers to the copied ledger and events instead of the original ones.
+
+    Values of `IMMUTABLE_TYPES`, module level functions and builtins are shared with the original rather than copied.
+    Everything mutable is copied in full, there is no copy on write: a fork costs as much memory and time as the whole
+    state, recordings and curves of the days already simulated included.
+    Objects are copied once per copier, references between them (e.g. two closures sharing a cell) are kept.
+    """
+
+    def __init__(self):
+        self.memo = {}
+        # originals are kept alive so their ids are not reused while copying
+        self._originals = []
+
+    def _remember(self, original, copied):
+        self.memo[id(original)] = copied
+        self._originals.append(original)
+        return copied
+
+    def copy(self, obj):
+        found = self.memo.get(id(obj), self.memo)
+        if found is not self.memo:
+            return found
+        cls = type(obj)
+        if issubclass(cls, IMMUTABLE_TYPES):
+            return obj
+        if cls is list:
+            copied = self._remember(obj, [])
+            copied.extend(item if type(item) in SCALAR_TYPES else self.copy(item) for item in obj)
+            return copied
+        if cls is dict:
+            copied = self._remember(obj, {})
+            for key, value in obj.items():
+                copied[self.copy(key)] = value if type(value) in SCALAR_TYPES else self.copy(value)
+            return copied
+        if cls is tuple:
+            copied = tuple(self.copy(item) for item in obj)
+            # a tuple of immutable values is immutable itself
+            if all(new is old for new, old in zip(copied, obj)):
+                return obj
+            return self._remember(obj, copied)
+        if cls is types.FunctionType:
+            return self._copy_function(obj)
+        if cls is types.CellType:
+            return self._copy_cell(obj)
+        if cls is types.BuiltinFunctionType:
+            owner = getattr(obj, '__self__', None)
+            if owner is None or isinstance(owner, types.ModuleType):
+                return obj
+        if cls is np.ndarray and obj.dtype != object:
+            return self._remember(obj, obj.copy())
+        return self._copy_object(obj)
+
+    def _copy_cell(self, cell):
+        copied = self._remember(cell, types.CellType())
+        self._fill_cell(cell, copied)
+        return copied
+
+    def _fill_cell(self, cell, copied):
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            # a closure variable not assigned yet
+            return
+        copied.cell_contents = self.copy(contents)
+
+    def _copy_function(self, fn):
+        if fn.__closure__ is None and not fn.__dict__ and not fn.__defaults__ and not fn.__kwdefaults__:
+            return fn
+        # the cells are created empty and filled once the copy is remembered, the contents may refer back to `fn`
+        closure = None
+        new_cells = []
+        if fn.__closure__ is not None:
+            closure = []
+            for cell in fn.__closure__:
+                copied_cell = self.memo.get(id(cell))
+                if copied_cell is None:
+                    copied_cell = self._remember(cell, types.CellType())
+                    new_cells.append((cell, copied_cell))
+                closure.append(copied_cell)
+            closure = tuple(closure)
+        copied = self._remember(fn, types.FunctionType(fn.__code__, fn.__globals__, fn.__name__, None, closure))
+        for cell, copied_cell in new_cells:
+            self._fill_cell(cell, copied_cell)
+        copied.__qualname__ = fn.__qualname__
+        copied.__module__ = fn.__module__
+        copied.__doc__ = fn.__doc__
+        copied.__defaults__ = self.copy(fn.__defaults__)
+        copied.__kwdefaults__ = self.copy(fn.__kwdefaults__)
+        copied.__dict__.update(self.copy(fn.__dict__))
+        return copied
+
+    def _copy_object(self, obj):
+        cls = type(obj)
+        deepcopy = getattr(obj, '__deepcopy__', None)
+        if deepcopy is not None:
+            return self._remember(obj, deepcopy(self.memo))
+        reductor = copyreg.dispatch_table.get(cls)
+        try:
+            reduced = reductor(obj) if reductor is not None else obj.__reduce_ex__(4)
+        except TypeError as error:
+            raise TypeError(f'Cannot copy the {cls.__name__} held by the simulation: {error}') from error
+        if isinstance(reduced, str):
+            return obj
+        fn, args, state, list_items, dict_items = (*reduced, None, None, None)[:5]
+        copied = self._remember(obj, fn(*self.copy(args)))
+        if state is not None:
+            state = self.copy(state)
+            if hasattr(copied, '__setstate__'):
+                copied.__setstate__(state)
+            else:
+                slot_state = None
+                if isinstance(state, tuple) and len(state) == 2:
+                    state, slot_state = state
+                if state:
+                    copied.__dict__.update(state)
+                for name, value in (slot_state or {}).items():
+                    setattr(copied, name, value)
+        if list_items is not None:
+            for item in list_items:
+                copied.append(self.copy(item))
+        if dict_items is not None:
+            for key, value in dict_items:
+                copied[self.copy(key)] = self.copy(value)
+        return copied
+
+
+class Checkpoint:
+    """
+    State of a simulation paused between two days, taken with `Simulation.checkpoint`.
+    Every `fork` is an independent simulation continuing from `n_day`, the days before it are not simulated again.
+    Forks are full copies of the checkpoint (see `StateCopier`), none of them shares mutable state with another.
+
+    :param simulation: private copy of the paused simulation, never run itself
+    :param carried: copies of objects taken along with the state (e.g. access functions of recorders)
+    """
+
+    def __init__(self, simulation, carried: tuple = ()):
+        self._simulation = simulation
+        self._carried = carried
+
+    @property
+    def n_day(self) -> int:
+        """Day the forks continue from"""
+        return self._simulation.next_day or 0
+
+    def fork(self, inject=None):
+        """
+        :param inject: called with the new simulation and the copies of the carried objects before they are returned,
+            sets what the fork differs in from the checkpoint (e.g. swaps the listener reading a parameter, see
+            `Simulation.replace_listener`). The state evolved before `n_day` is left as it is.
+        :return: new simulation continuing from the checkpoint, followed by the copies of the carried objects bound to
+            it when the checkpoint was taken with any, e.g. `simulation, access_summary = checkpoint.fork()`
+        """
+        if not self._carried:
+            simulation = copy_simulation(self._simulation)
+            if inject is not None:
+                inject(simulation)
+            return simulation
+        copies = copy_simulation(self._simulation, *self._carried)
+        if inject is not None:
+            inject(*copies)
+        return copies
+
+
+def copy_simulation(simulation, *carried):
+    """Copies the simulation with its listeners and the `carried` objects, see `StateCopier`"""
+    copier = StateCopier()
+    copied = copier.copy(simulation)
+    if not carried:
+        return copied
+    return copied, *(copier.copy(obj) for obj in carried)
@@ -0,0 +1,442 @@
+"""
+Cohort mode: many households with their own parameters simulated together.
+
+The households are rows of a table (a pandas DataFrame, a mapping of columns or a list of row dicts, see
+`HOUSEHOLD_COLUMNS`), their state is held in arrays with one entry per household. A day only touches the households
+an event applies to: monthly events are grouped by their day of the month and one-off purchases by their day, so the
+cost of a day is a few NumPy operations on the affected households instead of a listener call per household. Debt and
+bonds are kept as running aggregates valued in closed form (like the ledger books), they cost nothing on the days they
+are not touched.
+
+Listeners subscribed with `CohortSimulation.add_event_listener_applied` get one call per event with the indices of
+the affected households (`households`) rather than one call per household. An event nobody listens to is not posted.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import date, timedelta
+from numbers import Number
+
+import numpy as np
+
+from SimCFA.builder import GenericBuilder
+from SimCFA.event_types import EventPayload
+from SimCFA.events import Events
+from SimCFA.functional import bind_listener
+from SimCFA.LedgerItem import DAYS_YEAR, LedgerItemProperties
+from SimCFA.recorder import SAMPLING_MONTH_END, is_sampled_day
+
+# column -> default, amounts in cents, step tables and purchases are lists of (date, cents or quantity) pairs
+HOUSEHOLD_COLUMNS = {
+    'initial_cash': 0,  # like `append_cash`
+    'income_steps': (),  # monthly income, like `create_cash_income`
+    'income_day_apply': 10,
+    'expense_steps': (),  # monthly expenses (positive cents), same steps as the income
+    'expense_day_apply': 25,
+    'bond_purchases': (),  # (date, quantity) of the cohort bond, like `create_bond_buy_on_date`
+    'bond_monthly_quantity': 0,  # bonds bought every month on `bond_day_apply`
+    'bond_day_apply': 15,
+    'house_purchases': (),  # (date, price), like `create_buy_house`
+    'debt_percent': 18,  # cash going negative is borrowed at this yearly rate, like `create_debt_with_interest`
+    'debt_payback_monthly': 0,
+    'debt_payback_day_apply': 10,
+}
+
+
+@dataclass
+class CohortPlan:
+    """
+    :param households: table of the household parameters, see `HOUSEHOLD_COLUMNS`
+    :param bond_builder: bond bought by `bond_purchases` and `bond_monthly_quantity`, bought back for cash on expiry
+    """
+
+    n_days: int
+    start_date: date
+    households: object
+    bond_builder: GenericBuilder | None = None
+
+
+@dataclass
+class CohortResult:
+    """
+    :ivar bands: name -> array (n_samples, len(percentiles)) of the percentiles across households, `net_worth`,
+        `cash` and `debt`
+    :ivar final: name -> array (n_households,) of the last day, `net_worth`, `cash`, `debt`, `bonds` and `houses`
+    :ivar summary: name -> array (n_households,), like `create_run_summary`: `max_debt`, `min_cash` (at the end of a
+        day) and `first_negative_cash_day` (-1 when the cash never went negative)
+    :ivar paths: net worth of every household per sampled day (n_samples, n_households), only with `keep_paths`
+    """
+
+    percentiles: tuple
+    n_day: np.ndarray
+    dates: np.ndarray
+    bands: dict
+    final: dict
+    summary: dict
+    index: object = None
+    paths: np.ndarray | None = None
+
+    def band(self, name: str, percentile) -> np.ndarray:
+        return self.bands[name][:, self.percentiles.index(percentile)]
+
+    def to_frame(self):
+        """Final state and summary per household as a DataFrame, indexed like the households table"""
+        import pandas as pd
+
+        return pd.DataFrame({**self.final, **self.summary}, index=self.index)
+
+
+class HouseholdsEvent(EventPayload):
+    """
+    Event of the households at `households` (index array), `amounts` is what the event did to each of them in cents:
+    the cash borrowed for `cash_state_negative`, paid for `debt_payback`, received for `bond_buy_back`
+    """
+
+    __slots__ = ('amounts', 'day_date', 'households', 'n_day', 'state')
+
+    def __init__(self, state, households: np.ndarray, amounts: np.ndarray, n_day: int, day_date: date):
+        self.context = {}
+        self.state = state
+        self.households = households
+        self.amounts = amounts
+        self.n_day = n_day
+        self.day_date = day_date
+
+
+def _table_columns(table) -> tuple:
+    """
+    (columns with the defaults filled in, number of households, index of the table), a list, array or Series is a
+    column of one value per household, anything else (a number, a tuple of steps) is the value of every household
+    """
+    index = None
+    if hasattr(table, 'to_dict') and hasattr(table, 'columns'):
+        index = table.index
+        columns = {name: table[name].tolist() for name in table.columns}
+    elif isinstance(table, Mapping):
+        # a Series or an array is one value per household
+        columns = {name: column.tolist() if hasattr(column, 'tolist') else column for name, column in table.items()}
+    else:
+        rows = list(table)
+        names = {name for row in rows for name in row}
+        columns = {name: [row.get(name, HOUSEHOLD_COLUMNS.get(name)) for row in rows] for name in names}
+    unknown = set(columns) - set(HOUSEHOLD_COLUMNS)
+    if unknown:
+        raise ValueError(f'Unknown household columns {sorted(unknown)}, expected some of {list(HOUSEHOLD_COLUMNS)}')
+    lengths = {len(column) for column in columns.values() if isinstance(column, list)}
+    if len(lengths) > 1:
+        raise ValueError(f'Household columns of different lengths {sorted(lengths)}')
+    if not lengths or not min(lengths):
+        raise ValueError('No households in the table')
+    (n_households,) = lengths
+    for name, default in HOUSEHOLD_COLUMNS.items():
+        column = columns.get(name, default)
+        if not isinstance(column, list):
+            column = [column] * n_households
+        columns[name] = column
+    return columns, n_households, index
+
+
+def _day_number(day, start_date: date) -> int:
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return (day - start_date).days
+
+
+def _number_column(column, dtype=np.float64) -> np.ndarray:
+    return np.array([0 if value is None else value for value in column], dtype=dtype)
+
+
+def _step_changes(column, start_date: date, n_days: int) -> tuple:
+    """
+    Step tables of all households as the days their amount changes: (households with steps, day -> (households, new
+    amounts)), steps started before the first day apply from day 0
+    """
+    has_steps = np.zeros(len(column), dtype=bool)
+    changes = {}
+    for household, steps in enumerate(column):
+        if isinstance(steps, Number):
+            # a number is the same amount from the start on, like `as_curve`
+            steps = [(start_date, steps)]
+        for start, value in sorted((_day_number(start, start_date), value) for start, value in steps or ()):
+            has_steps[household] = True
+            if start < n_days:
+                # the latest step of a day wins
+                changes.setdefault(max(start, 0), {})[household] = value
+    by_day = {
+        day: (np.fromiter(amounts, dtype=np.int64, count=len(amounts)), np.array(list(amounts.values()), dtype=float))
+        for day, amounts in changes.items()
+    }
+    return has_steps, by_day
+
+
+def _day_events(column, start_date: date, n_days: int) -> dict:
+    """
+    One-off (date, amount) events of all households by simulation day: day -> (households, amounts), the amounts of a
+    household on the same day are summed
+    """
+    households, days, amounts = [], [], []
+    for household, events in enumerate(column):
+        for day, amount in events or ():
+            n_day = _day_number(day, start_date)
+            if 0 <= n_day < n_days:
+                households.append(household)
+                days.append(n_day)
+                amounts.append(amount)
+    if not days:
+        return {}
+    n_households = len(column)
+    keys, inverse = np.unique(np.array(days) * n_households + np.array(households), return_inverse=True)
+    summed = np.bincount(inverse, np.array(amounts, dtype=np.float64))
+    by_day = {}
+    day_of_key = keys // n_households
+    boundaries = np.flatnonzero(np.diff(day_of_key)) + 1
+    for chunk, amounts_chunk in zip(np.split(keys, boundaries), np.split(summed, boundaries)):
+        by_day[int(chunk[0] // n_households)] = (chunk % n_households, amounts_chunk)
+    return by_day
+
+
+def _month_day_groups(day_apply: np.ndarray, active: np.ndarray) -> dict:
+    """Day of the month -> indices of the active households applying their monthly event on it"""
+    groups = {}
+    for month_day in np.unique(day_apply[active]):
+        groups[int(month_day)] = np.flatnonzero(active & (day_apply == month_day))
+    return groups
+
+
+class CohortState:
+    """
+    State of every household, one array entry each. Debt and bonds are stored divided by their growth since day 0,
+    `debt_value` and `bond_value` turn them into the value on a day.
+    """
+
+    def __init__(self, columns: dict, n_households: int, bond):
+        self.cash = _number_column(columns['initial_cash'])
+        self.houses = np.zeros(n_households)
+        # debt of a household is one principal and one value, paybacks reduce the value pro rata
+        self.debt_principal = np.zeros(n_households)
+        self.debt_discounted = np.zeros(n_households)
+        self.debt_daily_growth = (1 + _number_column(columns['debt_percent']) / 100) ** (1 / DAYS_YEAR)
+        # bonds held, not matured yet: sum of quantity * price / growth up to the purchase, sum of the penalties
+        self.bonds_discounted = np.zeros(n_households)
+        self.bonds_penalty = np.zeros(n_households)
+        self.bond_daily_growth = 1.0
+        if bond is not None:
+            periods = bond.capitalisation_periods
+            self.bond_daily_growth = (1 + bond.percent / 100 / periods) ** (periods / DAYS_YEAR)
+
+    def debt_value(self, households, n_day: int) -> np.ndarray:
+        return self.debt_discounted[households] * self.debt_daily_growth[households] ** n_day
+
+    def bond_value(self, households, n_day: int) -> np.ndarray:
+        """
+        Value of the bonds held, they are valued as not matured during the few days a bond with a month based duration
+        may be held past its `max_duration_in_days`
+        """
+        return self.bonds_discounted[households] * self.bond_daily_growth**n_day - self.bonds_penalty[households]
+
+    def net_worth(self, n_day: int) -> np.ndarray:
+        everyone = slice(None)
+        return self.cash + self.houses - self.debt_value(everyone, n_day) + self.bond_value(everyone, n_day)
+
+
+class CohortSimulation:
+    """
+    Households of the plan advanced together day by day, see the module docstring. Follows the semantics of
+    `simulate_monte_carlo`: cash going negative is borrowed, monthly paybacks reduce the debt principal at face value
+    (and its value pro rata) and may borrow again when the cash does not cover them, bonds are bought back for their
+    value on expiry. A household owing one debt at a time matches a `Simulation` wired with `create_debt_with_interest`
+    and `create_debt_payback_strategy`. With several debts they differ: the scalar strategy pays the debts one by one
+    at face value, the cohort keeps one principal per household.
+
+    Events (posted only when listened to): `cash_state_negative`, `debt_payback`, `bond_buy_back` (see
+    `HouseholdsEvent`) and `day_ended` (`state`, `n_day`, `day_date`).
+    """
+
+    def __init__(self, plan: CohortPlan):
+        self.plan = plan
+        self.events = Events()
+        columns, self.n_households, self.index = _table_columns(plan.households)
+        start_date = plan.start_date
+        self.bond = None
+        if plan.bond_builder is not None:
+            self.bond = plan.bond_builder.set('properties', LedgerItemProperties(1, 0)).build()
+        self.state = CohortState(columns, self.n_households, self.bond)
+
+        # monthly income and expenses of the current step, updated on the days a step starts
+        self.income = np.zeros(self.n_households)
+        self.expenses = np.zeros(self.n_households)
+        has_income, self.income_changes = _step_changes(columns['income_steps'], start_date, plan.n_days)
+        has_expenses, self.expense_changes = _step_changes(columns['expense_steps'], start_date, plan.n_days)
+        self.income_groups = _month_day_groups(_number_column(columns['income_day_apply'], int), has_income)
+        self.expense_groups = _month_day_groups(_number_column(columns['expense_day_apply'], int), has_expenses)
+        self.bond_monthly_quantity = _number_column(columns['bond_monthly_quantity'])
+        self.bond_groups = _month_day_groups(
+            _number_column(columns['bond_day_apply'], int), self.bond_monthly_quantity > 0
+        )
+        self.debt_payback_monthly = _number_column(columns['debt_payback_monthly'])
+        self.payback_groups = _month_day_groups(
+            _number_column(columns['debt_payback_day_apply'], int), self.debt_payback_monthly > 0
+        )
+        self.house_purchases = _day_events(columns['house_purchases'], start_date, plan.n_days)
+        self.bond_purchases = _day_events(columns['bond_purchases'], start_date, plan.n_days)
+        if self.bond is None and (self.bond_purchases or self.bond_groups):
+            raise ValueError('Households buy bonds, the plan needs a `bond_builder`')
+        # day -> [(households, quantity, day bought)] of the bonds bought back on that day
+        self.bond_expiries = {}
+
+        self.max_debt = np.zeros(self.n_households)
+        self.min_cash = self.state.cash.copy()
+        self.first_negative_cash_day = np.full(self.n_households, -1, dtype=np.int64)
+
+    def add_event_listener_applied(self, event_type, fn, **subscribe_kwargs):
+        return self.events.subscribe(event_type, bind_listener(fn), **subscribe_kwargs)
+
+    def _post(self, event_type: str, households, amounts, n_day: int, day_date: date):
+        if self.events.has_listeners(event_type):
+            self.events.post_event(event_type, HouseholdsEvent(self.state, households, amounts, n_day, day_date))
+
+    def _borrow_if_negative(self, households, n_day: int, day_date: date):
+        state = self.state
+        negative = households[state.cash[households] < 0]
+        if not len(negative):
+            return
+        borrowed = -state.cash[negative]
+        state.debt_principal[negative] += borrowed
+        state.debt_discounted[negative] += borrowed / state.debt_daily_growth[negative] ** n_day
+        state.cash[negative] = 0
+        first = negative[self.first_negative_cash_day[negative] < 0]
+        self.first_negative_cash_day[first] = n_day
+        self._post('cash_state_negative', negative, borrowed, n_day, day_date)
+
+    def _change_cash(self, households, amounts, n_day: int, day_date: date):
+        self.state.cash[households] += amounts
+        self._borrow_if_negative(households, n_day, day_date)
+
+    def _buy_bonds(self, households, quantity, n_day: int, day_date: date):
+        state, bond = self.state, self.bond
+        state.bonds_discounted[households] += quantity * bond.price / state.bond_daily_growth**n_day
+        state.bonds_penalty[households] += quantity * bond.pre_maturity_buy_back_penalty
+        expiry_day = _day_number(day_date + bond.duration, self.plan.start_date)
+        self.bond_expiries.setdefault(expiry_day, []).append((households, quantity, n_day))
+        self._change_cash(households, -quantity * bond.price, n_day, day_date)
+
+    def _buy_back_bonds(self, n_day: int, day_date: date):
+        state, bond = self.state, self.bond
+        for households, quantity, bought_on in self.bond_expiries.pop(n_day, ()):
+            bond.properties.acquired_on = bought_on
+            received = quantity * bond.get_value(n_day)
+            state.bonds_discounted[households] -= quantity * bond.price / state.bond_daily_growth**bought_on
+            state.bonds_penalty[households] -= quantity * bond.pre_maturity_buy_back_penalty
+            self._change_cash(households, received, n_day, day_date)
+            self._post('bond_buy_back', households, received, n_day, day_date)
+
+    def _pay_back_debt(self, households, n_day: int, day_date: date):
+        state = self.state
+        paid = np.minimum(state.debt_principal[households], self.debt_payback_monthly[households])
+        owing = paid > 0
+        households, paid = households[owing], paid[owing]
+        if not len(households):
+            return
+        value = state.debt_value(households, n_day)
+        value -= paid * value / state.debt_principal[households]
+        state.debt_discounted[households] = value / state.debt_daily_growth[households] ** n_day
+        state.debt_principal[households] -= paid
+        self._post('debt_payback', households, paid, n_day, day_date)
+        self._change_cash(households, -paid, n_day, day_date)
+
+    def simulate(
+        self, percentiles=(5, 25, 50, 75, 95), sampling: str = SAMPLING_MONTH_END, keep_paths: bool = False
+    ) -> CohortResult:
+        """
+        :param sampling: `daily` or `month_end`, days the percentile bands are computed on
+        :param keep_paths: also return the net worth of every household on every sampled day
+        """
+        plan, state = self.plan, self.state
+        rows, paths, n_days_sampled, dates = [], [], [], []
+        for n_day in range(plan.n_days):
+            day_date = plan.start_date + timedelta(days=n_day)
+            month_day = day_date.day
+            touched = []
+            for amounts, changes in ((self.income, self.income_changes), (self.expenses, self.expense_changes)):
+                if n_day in changes:
+                    households, new_amounts = changes[n_day]
+                    amounts[households] = new_amounts
+            payback_group = self.payback_groups.get(month_day)
+            if payback_group is not None and n_day:
+                # debt only shrinks on paybacks, its maximum is reached at the end of the day before one
+                before = state.debt_value(payback_group, n_day - 1)
+                self.max_debt[payback_group] = np.maximum(self.max_debt[payback_group], before)
+
+            group = self.income_groups.get(month_day)
+            if group is not None:
+                self._change_cash(group, self.income[group], n_day, day_date)
+                touched.append(group)
+            group = self.expense_groups.get(month_day)
+            if group is not None:
+                self._change_cash(group, -self.expenses[group], n_day, day_date)
+                touched.append(group)
+            purchases = self.house_purchases.get(n_day)
+            if purchases is not None:
+                households, prices = purchases
+                state.houses[households] += prices
+                self._change_cash(households, -prices, n_day, day_date)
+                touched.append(households)
+            purchases = self.bond_purchases.get(n_day)
+            if purchases is not None:
+                self._buy_bonds(*purchases, n_day, day_date)
+                touched.append(purchases[0])
+            group = self.bond_groups.get(month_day)
+            if group is not None:
+                self._buy_bonds(group, self.bond_monthly_quantity[group], n_day, day_date)
+                touched.append(group)
+            if payback_group is not None:
+                self._pay_back_debt(payback_group, n_day, day_date)
+                touched.append(payback_group)
+            if n_day in self.bond_expiries:
+                touched.extend(households for households, _, _ in self.bond_expiries[n_day])
+                self._buy_back_bonds(n_day, day_date)
+
+            for households in touched:
+                self.min_cash[households] = np.minimum(self.min_cash[households], state.cash[households])
+            if self.events.has_listeners('day_ended'):
+                self.events.post_event('day_ended', {'state': state, 'n_day': n_day, 'day_date': day_date})
+            if not is_sampled_day(sampling, n_day, day_date, plan.n_days):
+                continue
+            net_worth = state.net_worth(n_day)
+            debt = state.debt_value(slice(None), n_day)
+            rows.append(np.percentile(np.stack((net_worth, state.cash, debt)), percentiles, axis=1).T)
+            if keep_paths:
+                paths.append(net_worth)
+            n_days_sampled.append(n_day)
+            dates.append(day_date)
+
+        last_day = plan.n_days - 1
+        everyone = slice(None)
+        debt = state.debt_value(everyone, last_day)
+        self.max_debt = np.maximum(self.max_debt, debt)
+        bands = np.stack(rows) if rows else np.empty((0, 3, len(percentiles)))
+        return CohortResult(
+            percentiles=tuple(percentiles),
+            n_day=np.array(n_days_sampled, dtype=np.int64),
+            dates=np.array(dates, dtype='datetime64[D]'),
+            bands={'net_worth': bands[:, 0, :], 'cash': bands[:, 1, :], 'debt': bands[:, 2, :]},
+            final={
+                'net_worth': state.net_worth(last_day),
+                'cash': state.cash.copy(),
+                'debt': debt,
+                'bonds': state.bond_value(everyone, last_day),
+                'houses': state.houses.copy(),
+            },
+            summary={
+                'max_debt': self.max_debt,
+                'min_cash': self.min_cash,
+                'first_negative_cash_day': self.first_negative_cash_day,
+            },
+            index=self.index,
+            paths=np.stack(paths) if keep_paths and paths else None,
+        )
+
+
+def simulate_cohort(plan: CohortPlan, **simulate_kwargs) -> CohortResult:
+    """Runs all the households of the plan at once, see `CohortSimulation.simulate` for the arguments"""
+    return CohortSimulation(plan).simulate(**simulate_kwargs)
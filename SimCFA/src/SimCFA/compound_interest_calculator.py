@@ -1,3 +1,8 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
 def compound_interest_calc(percent, years, n_times_during_year=1):
     """
     Calculates "how much money will I make with 1000 USD"
@@ -48,3 +53,95 @@ def rate_of_interest_calc(percent, years, n_times_during_year=1):
     x -= 1
     x *= n_times_during_year
     return x
+
+
+class GrowthFactorTable:
+    """
+    Lazily extended table of `compound_interest_calc(percent, day / days_in_year, n_times_during_year)` for whole day
+    offsets. Entries are computed with the same float operations as the scalar function, so lookups are exact.
+    """
+
+    def __init__(self, percent, n_times_during_year=1, days_in_year=365, max_days=100 * 366):
+        self.percent = percent
+        self.n_times_during_year = n_times_during_year
+        self.days_in_year = days_in_year
+        self.max_days = max_days
+        self.factors = np.empty(0)
+
+    def _extend(self, day: int):
+        start = len(self.factors)
+        stop = min(max(day + 1, 2 * start, int(self.days_in_year) + 1), self.max_days + 1)
+        exponent = 1 + (self.percent / 100) / self.n_times_during_year
+        n_times = self.n_times_during_year
+        days_in_year = self.days_in_year
+        extension = np.fromiter(
+            (exponent ** ((day / days_in_year) * n_times) for day in range(start, stop)),
+            dtype=np.float64,
+            count=stop - start,
+        )
+        self.factors = np.concatenate((self.factors, extension))
+
+    def _compute(self, days):
+        return compound_interest_calc(self.percent, days / self.days_in_year, self.n_times_during_year)
+
+    def get(self, days):
+        """Multiplier after `days`, days outside of the table (fractional, negative, too far) are computed directly"""
+        if days < 0 or days > self.max_days or days != int(days):
+            return self._compute(days)
+        days = int(days)
+        if days >= len(self.factors):
+            self._extend(days)
+        return self.factors[days].item()
+
+    def take(self, days: np.ndarray) -> np.ndarray:
+        """Vectorized `get` for an array of day offsets"""
+        days = np.asarray(days)
+        if not days.size:
+            return np.empty(days.shape)
+        integral = days.dtype.kind in 'iu' or (np.floor(days) == days).all()
+        highest = days.max()
+        if integral and days.min() >= 0 and highest <= self.max_days:
+            if highest >= len(self.factors):
+                self._extend(int(highest))
+            return self.factors[days.astype(np.int64, copy=False)]
+
+        in_table = (days >= 0) & (days <= self.max_days) & (np.floor(days) == days)
+        result = np.empty(days.shape)
+        result[in_table] = self.take(days[in_table])
+        result[~in_table] = [self._compute(day) for day in days[~in_table].tolist()]
+        return result
+
+
+class GrowthFactorCache:
+    """Growth factor tables keyed by rate, the least recently used table is evicted once `max_tables` is reached"""
+
+    def __init__(self, max_tables=64):
+        self.max_tables = max_tables
+        self.tables = OrderedDict()
+
+    def get_table(self, percent, n_times_during_year=1, days_in_year=365) -> GrowthFactorTable:
+        key = (percent, n_times_during_year, days_in_year)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            return table
+        table = self.tables[key] = GrowthFactorTable(percent, n_times_during_year, days_in_year)
+        if len(self.tables) > self.max_tables:
+            self.tables.popitem(last=False)
+        return table
+
+    def clear(self):
+        self.tables.clear()
+
+
+growth_factor_cache = GrowthFactorCache()
+
+
+def growth_factor(percent, days, n_times_during_year=1, days_in_year=365):
+    """Cached `compound_interest_calc(percent, days / days_in_year, n_times_during_year)`"""
+    return growth_factor_cache.get_table(percent, n_times_during_year, days_in_year).get(days)
+
+
+def growth_factors(percent, days, n_times_during_year=1, days_in_year=365) -> np.ndarray:
+    """Vectorized `growth_factor`, one multiplier per day offset in `days`"""
+    return growth_factor_cache.get_table(percent, n_times_during_year, days_in_year).take(days)
@@ -0,0 +1,687 @@
+"""
+Compiler of the JSON simulation configs (see `data/example_simulation_config0*.json`).
+
+The config is validated and resolved once into a `SimulationPlan`: plain data with the amounts in cents, the assets as
+builder parameters and the instructions as a strategy table in the order they run. The plan is cached by the hash of
+the config content, in memory and, opt-in with the `SIMCFA_PLAN_CACHE` env variable, on disk (see `PlanCache`), so
+repeated and swept runs only wire the listeners of an already compiled plan with `build_simulation_from_plan`.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from SimCFA.ledger_books import DEFAULT_BOOK_TYPES, PAYOFF_ORDERS, CurveBook, LedgerBooks
+from SimCFA.LedgerItem import DAYS_YEAR, Cash, bond_builder, compound_asset_builder, curve_asset_builder
+from SimCFA.price_series import DEFAULT_DATE_COLUMN, DEFAULT_PRICE_COLUMN, open_price_series, series_fingerprints
+from SimCFA.run_cache import code_version
+from SimCFA.simulation import GRANULARITIES, GRANULARITY_DAILY, STEPPING_DAILY, STEPPING_NEXT_EVENT, Simulation
+from SimCFA.simulation_procedures import (
+    add_date_guard_date_between,
+    add_date_guard_exact_date,
+    add_month_day_date_guard,
+    create_append_ledger_item,
+    create_asset_buy,
+    create_asset_sell,
+    create_bond_buy_back_for_cash,
+    create_calculate_inflation,
+    create_cash_change_on_date,
+    create_cash_income,
+    create_debt_payback,
+    create_debt_with_interest,
+    create_loan_on_negative_cash,
+    create_loan_payback,
+)
+from SimCFA.timeseries import Curve, PiecewiseLinearCurve, StepCurve
+
+# part of the cache key, bump when the plan format or the meaning of a config changes
+PLAN_FORMAT_VERSION = 3
+PLAN_CACHE_ENV = 'SIMCFA_PLAN_CACHE'
+DEFAULT_PLAN_CACHE_MAX_BYTES = 64 * 2**20
+PLAN_CACHE_SECRET = 'secret'
+PLAN_ENTRY_MAGIC = b'SIMCFA-PLAN\n'
+MEMORY_CACHE_SIZE = 256
+
+ASSET = 'asset'
+DEBT = 'debt'
+METHOD_BUY = 'buy'
+METHOD_SELL = 'sell'
+METHOD_PAYBACK = 'payback'
+# the example configs spell the debt payback `pay-pup`
+METHOD_ALIASES = {'pay-pup': METHOD_PAYBACK, 'pay-back': METHOD_PAYBACK}
+REFERENCES = ('cash', 'count')
+# ledger categories of the cash and the debt, an asset named like one needs another `category`
+RESERVED_CATEGORIES = ('cash', 'debt', 'loans')
+DEFAULT_DEBT_PERCENT = 18
+DEFAULT_INCOME_DAY = 10
+DEFAULT_EXPENSE_DAY = 25
+# book preallocation of the categories bought by recurring instructions, the books still grow past it if needed
+MAX_PREALLOCATED_ITEMS = 4096
+
+
+class ConfigError(ValueError):
+    """Invalid config, the message starts with the path of the offending value, e.g. `assets[1].price`"""
+
+    def __init__(self, path: str, message: str):
+        super().__init__(f'{path}: {message}')
+        self.path = path
+
+
+@dataclass
+class AssetDefinition:
+    asset_id: int
+    name: str
+    category: str
+    price: int  # cents
+    percent: float
+    duration: relativedelta | None = None  # assets with a duration are bonds, bought back on expiry
+    capitalisation_periods: int = 1
+    pre_maturity_buy_back_penalty: int = 0  # cents
+    price_curve: Curve | None = None  # value of a unit in cents by simulation day: `step`, `linear` and `series`
+
+    def builder(self):
+        if self.price_curve is not None:
+            return curve_asset_builder.set('price', self.price).set('price_curve', self.price_curve)
+        if self.duration is None:
+            return compound_asset_builder.set('price', self.price).set('percent', self.percent)
+        return (
+            bond_builder.set('percent', self.percent)
+            .set('duration', self.duration)
+            .set('rebuy_cost', self.price)
+            .set('pre_maturity_buy_back_penalty', self.pre_maturity_buy_back_penalty)
+            .set('price', self.price)
+            .set('capitalisation_periods', self.capitalisation_periods)
+        )
+
+
+@dataclass
+class CashFlow:
+    """Monthly change of cash on `day_apply`, `steps` are (start date, cents) pairs, see `create_cash_income`"""
+
+    name: str
+    steps: list
+    day_apply: int
+
+
+@dataclass
+class Instruction:
+    """Row of the strategy table"""
+
+    name: str
+    strategy: str  # `asset` or `debt`
+    method: str  # `buy`, `sell` or `payback`
+    asset_id: int | None = None
+    reference: str = 'cash'
+    amount: int | None = None  # cents for `cash`, units for `count`, None means all
+    date_apply: date | None = None
+    day_apply: int | None = None
+    start_date: date | None = None
+    end_date: date | None = None
+
+    @property
+    def is_scheduled(self) -> bool:
+        """Scheduled instructions run on `day_started`, the rest on `day_ended` of every simulated day"""
+        return self.date_apply is not None or self.day_apply is not None
+
+
+@dataclass
+class SimulationPlan:
+    start_date: date
+    n_days: int
+    stepping: str = STEPPING_DAILY
+    granularity: str = GRANULARITY_DAILY
+    one_off_cash: list = field(default_factory=list)  # [(date, cents)]
+    cash_flows: list = field(default_factory=list)  # [CashFlow]
+    assets: dict = field(default_factory=dict)  # asset id -> AssetDefinition
+    instructions: list = field(default_factory=list)  # [Instruction] in the order they run
+    debt_percent: float = DEFAULT_DEBT_PERCENT
+    payoff_order: str | None = None  # debts are kept in the loan book and paid back in this order when set
+    inflation_percent: float | None = None
+    book_capacities: dict = field(default_factory=dict)
+    source_hash: str = ''
+
+
+def _require(mapping, key, path):
+    if not isinstance(mapping, dict):
+        raise ConfigError(path, f'expected an object, got {type(mapping).__name__}')
+    if key not in mapping:
+        raise ConfigError(f'{path}.{key}', 'missing')
+    return mapping[key]
+
+
+def _parse_date(value, path) -> date:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ConfigError(path, f'expected an ISO date, got {value!r}') from None
+
+
+def _optional_date(mapping, key, path):
+    value = mapping.get(key)
+    return None if value is None else _parse_date(value, f'{path}.{key}')
+
+
+def _parse_number(value, path) -> float:
+    if isinstance(value, bool):
+        raise ConfigError(path, f'expected a number, got {value!r}')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ConfigError(path, f'expected a number, got {value!r}') from None
+
+
+def _to_cents(value, path) -> int:
+    return round(_parse_number(value, path) * 100)
+
+
+def _parse_day(value, path) -> int:
+    day = _parse_number(value, path)
+    if day != int(day) or not 1 <= day <= 31:
+        raise ConfigError(path, f'expected a day of the month, got {value!r}')
+    return int(day)
+
+
+def _parse_monthly(mapping, path, default_day):
+    """`apply_duration`/`applies_on` (incomes, expenses) or `apply_method`/`apply_day` (events, instructions)"""
+    method = mapping.get('apply_duration', mapping.get('apply_method', 'monthly'))
+    if method != 'monthly':
+        raise ConfigError(f'{path}.apply_method', f'only `monthly` is supported, got {method!r}')
+    day = mapping.get('applies_on', mapping.get('apply_day', default_day))
+    return _parse_day(day, f'{path}.apply_day')
+
+
+def _parse_steps(steps, path, sign):
+    if not isinstance(steps, list) or not steps:
+        raise ConfigError(path, 'expected a non empty list of {"start", "value"}')
+    parsed = []
+    for index, step in enumerate(steps):
+        step_path = f'{path}[{index}]'
+        start = _parse_date(_require(step, 'start', step_path), f'{step_path}.start')
+        parsed.append((start, sign * _to_cents(_require(step, 'value', step_path), f'{step_path}.value')))
+    return sorted(parsed, reverse=True)
+
+
+def _compile_cash_flow(flow, path, start_date, sign, default_day, name):
+    method = _require(flow, 'method', path)
+    if method == 'const':
+        steps = [(start_date, sign * _to_cents(_require(flow, 'value', path), f'{path}.value'))]
+    elif method == 'step':
+        steps = _parse_steps(flow.get('zipped', flow.get('value')), f'{path}.zipped', sign)
+    else:
+        raise ConfigError(f'{path}.method', f'expected `const` or `step`, got {method!r}')
+    if all(value == 0 for _, value in steps):
+        return None
+    return CashFlow(flow.get('name', name), steps, _parse_monthly(flow, path, default_day))
+
+
+def _compile_asset(asset, path, start_date) -> AssetDefinition:
+    asset_id = _require(asset, 'ID', path)
+    name = _require(asset, 'name', path)
+    calc_path = f'{path}.value_calc_method'
+    calc = _require(asset, 'value_calc_method', path)
+    method = _require(calc, 'method', calc_path)
+    price_curve = None
+    if method == 'series':
+        price_curve, price = _compile_price_series(asset, calc, calc_path, path, start_date)
+    else:
+        price = _to_cents(_require(asset, 'price', path), f'{path}.price')
+    if price <= 0:
+        raise ConfigError(f'{path}.price', 'has to be positive')
+    if method == 'series':
+        percent = 0
+    elif method == 'compound':
+        percent = _parse_number(_require(calc, '%year', calc_path), f'{calc_path}.%year')
+    elif method == 'const':
+        # constant multiple of the price
+        price = round(price * _parse_number(calc.get('value', 1), f'{calc_path}.value'))
+        percent = 0
+    elif method in ('step', 'linear'):
+        # value of a unit from the start of every step or interpolated between the points, the price before them
+        points = _parse_steps(calc.get('zipped', calc.get('value')), f'{calc_path}.zipped', 1)
+        curve = StepCurve.from_pairs(points, default=price) if method == 'step' else PiecewiseLinearCurve(points)
+        price_curve = curve.shifted(start_date)
+        percent = 0
+    else:
+        raise ConfigError(
+            f'{calc_path}.method', f'expected `compound`, `const`, `step`, `linear` or `series`, got {method!r}'
+        )
+
+    duration = None
+    if asset.get('duration') is not None:
+        if method != 'compound':
+            raise ConfigError(f'{path}.duration', 'only `compound` assets (bonds) can have a duration')
+        duration_spec = asset['duration']
+        unknown = set(duration_spec) - {'years', 'months'}
+        if unknown:
+            raise ConfigError(f'{path}.duration', f'unknown keys {sorted(unknown)}, use `years` and `months`')
+        duration = relativedelta(years=duration_spec.get('years', 0), months=duration_spec.get('months', 0))
+    category = asset.get('category', 'bonds' if duration is not None else name)
+    if category in RESERVED_CATEGORIES:
+        raise ConfigError(f'{path}.category', f'`{category}` is not an asset category, set another `category`')
+    if duration is not None and category != 'bonds':
+        raise ConfigError(f'{path}.category', 'assets with a duration are bonds, their category is `bonds`')
+    return AssetDefinition(
+        asset_id=asset_id,
+        name=name,
+        category=category,
+        price=price,
+        percent=percent,
+        duration=duration,
+        capitalisation_periods=int(calc.get('capitalisation_periods', 1)),
+        pre_maturity_buy_back_penalty=_to_cents(asset.get('pre_maturity_buy_back_penalty', 0), f'{path}.penalty'),
+        price_curve=price_curve,
+    )
+
+
+def _compile_price_series(asset, calc, calc_path, path, start_date) -> tuple:
+    """
+    Series of the CSV at `path` (relative to the working directory), the prices are in currency units. With a `price`
+    the series is scaled so that a unit costs `price` on the start date, e.g. for an index.
+
+    :return: (curve of the unit value in cents by simulation day, unit price on the start date)
+    """
+    csv_path = _require(calc, 'path', calc_path)
+    try:
+        series = open_price_series(
+            csv_path,
+            calc.get('date_column', DEFAULT_DATE_COLUMN),
+            calc.get('price_column', DEFAULT_PRICE_COLUMN),
+            scale=100,
+        )
+    except OSError as error:
+        raise ConfigError(f'{calc_path}.path', f'cannot read {csv_path!r}: {error.strerror or error}') from error
+    except (ValueError, KeyError) as error:
+        raise ConfigError(f'{calc_path}.path', f'cannot read prices from {csv_path!r}: {error}') from error
+    start_price = series.value_at(start_date)
+    if asset.get('price') is not None:
+        price = _to_cents(asset['price'], f'{path}.price')
+        if start_price <= 0:
+            raise ConfigError(f'{calc_path}.path', f'no positive price on {start_date} to scale the series to `price`')
+        series = series.scaled(price / start_price)
+    else:
+        price = round(start_price)
+    return series.shifted(start_date), price
+
+
+def _compile_how_much(how_much, path, method):
+    reference = _require(how_much, 'reference', path)
+    if reference not in REFERENCES:
+        raise ConfigError(f'{path}.reference', f'expected one of {REFERENCES}, got {reference!r}')
+    amount = _require(how_much, 'amount', path)
+    if amount == 'all':
+        if method == METHOD_BUY and reference == 'count':
+            raise ConfigError(f'{path}.amount', 'cannot buy `all` units, reference `cash` to spend all the cash')
+        return reference, None
+    value = _parse_number(amount, f'{path}.amount')
+    if reference == 'count':
+        if value != int(value) or value <= 0:
+            raise ConfigError(f'{path}.amount', f'expected a positive whole number of units, got {amount!r}')
+        return reference, int(value)
+    return reference, _to_cents(value, f'{path}.amount')
+
+
+def _compile_instruction(instruction, path, strategy, assets) -> Instruction:
+    method = _require(instruction, 'method', path)
+    method = METHOD_ALIASES.get(method, method)
+    allowed = (METHOD_BUY, METHOD_SELL) if strategy == ASSET else (METHOD_PAYBACK,)
+    if method not in allowed:
+        raise ConfigError(f'{path}.method', f'expected one of {allowed}, got {method!r}')
+    asset_id = None
+    if strategy == ASSET:
+        asset_id = _require(instruction, 'asset_id', path)
+        if asset_id not in assets:
+            raise ConfigError(f'{path}.asset_id', f'no asset with ID {asset_id!r}')
+    reference, amount = _compile_how_much(_require(instruction, 'how_much', path), f'{path}.how_much', method)
+    if method == METHOD_PAYBACK and reference != 'cash':
+        raise ConfigError(f'{path}.how_much.reference', 'debt is paid back in `cash`')
+    has_monthly = 'apply_method' in instruction or 'apply_day' in instruction
+    compiled = Instruction(
+        name=instruction.get('name', method),
+        strategy=strategy,
+        method=method,
+        asset_id=asset_id,
+        reference=reference,
+        amount=amount,
+        date_apply=_optional_date(instruction, 'date_apply', path),
+        day_apply=_parse_monthly(instruction, path, None) if has_monthly else None,
+        start_date=_optional_date(instruction, 'date_start', path),
+        end_date=_optional_date(instruction, 'date_end', path),
+    )
+    if compiled.date_apply is not None and compiled.day_apply is not None:
+        raise ConfigError(path, '`date_apply` and a monthly `apply_day` cannot be combined')
+    return compiled
+
+
+def _compile_strategy(config, key, strategy, assets) -> list:
+    handle_strategy = config.get(key)
+    if handle_strategy is None:
+        return []
+    instructions = _require(handle_strategy, 'instructions', key)
+    return [
+        _compile_instruction(instruction, f'{key}.instructions[{index}]', strategy, assets)
+        for index, instruction in enumerate(instructions)
+    ]
+
+
+def _compile_simulation_parameters(config):
+    path = 'simulation_parameters'
+    params = _require(config, path, 'config')
+    start_date = _parse_date(_require(params, 'start_date', path), f'{path}.start_date')
+    if 'end_date' in params:
+        n_days = (_parse_date(params['end_date'], f'{path}.end_date') - start_date).days
+    elif 'years' in params:
+        n_days = int(_parse_number(params['years'], f'{path}.years') * DAYS_YEAR)
+    else:
+        n_days = int(_parse_number(_require(params, 'n_days', path), f'{path}.n_days'))
+    if n_days <= 0:
+        raise ConfigError(path, 'the simulation has to last at least one day')
+    stepping = params.get('stepping', STEPPING_DAILY)
+    if stepping not in (STEPPING_DAILY, STEPPING_NEXT_EVENT):
+        raise ConfigError(f'{path}.stepping', f'expected `{STEPPING_DAILY}` or `{STEPPING_NEXT_EVENT}`')
+    granularity = params.get('granularity', GRANULARITY_DAILY)
+    if granularity not in GRANULARITIES:
+        raise ConfigError(f'{path}.granularity', f'expected one of {", ".join(GRANULARITIES)}, got {granularity!r}')
+    return start_date, n_days, stepping, granularity
+
+
+def _compile_curves(config):
+    inflation_percent = None
+    for index, curves in enumerate(config.get('curves') or []):
+        for name, curve in curves.items():
+            path = f'curves[{index}].{name}'
+            if name != 'inflation':
+                raise ConfigError(path, 'only the `inflation` curve is supported')
+            if _require(curve, 'method', path) != 'compound':
+                raise ConfigError(f'{path}.method', 'only `compound` inflation is supported')
+            inflation_percent = _parse_number(_require(curve, '%year', path), f'{path}.%year')
+    return inflation_percent
+
+
+def _estimate_book_capacities(plan: SimulationPlan) -> dict:
+    """Items a category can get at most: one per buy, recurring buys at most once per simulated month"""
+    months = plan.n_days // 28 + 1
+    capacities = {}
+    for instruction in plan.instructions:
+        if instruction.method != METHOD_BUY:
+            continue
+        category = plan.assets[instruction.asset_id].category
+        buys = 1 if instruction.date_apply is not None else months
+        capacities[category] = min(capacities.get(category, 0) + buys, MAX_PREALLOCATED_ITEMS)
+    return capacities
+
+
+def compile_config(config: dict) -> SimulationPlan:
+    """Validates the config (raising `ConfigError`) and resolves it into a plan, amounts are converted to cents"""
+    start_date, n_days, stepping, granularity = _compile_simulation_parameters(config)
+    plan = SimulationPlan(start_date, n_days, stepping, granularity, source_hash=config_hash(config))
+
+    assets = {}
+    for index, asset in enumerate(config.get('assets') or []):
+        compiled = _compile_asset(asset, f'assets[{index}]', start_date)
+        if compiled.asset_id in assets:
+            raise ConfigError(f'assets[{index}].ID', f'duplicate ID {compiled.asset_id!r}')
+        assets[compiled.asset_id] = compiled
+    plan.assets = assets
+
+    for key, sign, default_day in (('incomes', 1, DEFAULT_INCOME_DAY), ('expenses', -1, DEFAULT_EXPENSE_DAY)):
+        for index, flow in enumerate(config.get(key) or []):
+            compiled = _compile_cash_flow(flow, f'{key}[{index}]', start_date, sign, default_day, key)
+            if compiled is not None:
+                plan.cash_flows.append(compiled)
+
+    asset_instructions = _compile_strategy(config, 'asset_handle_strategy', ASSET, assets)
+    for index, event in enumerate(config.get('events_to_start_with') or []):
+        path = f'events_to_start_with[{index}]'
+        name = _require(event, 'name', path)
+        method = _require(event, 'method', path)
+        if name == 'acquire_cash' and method == 'const':
+            day = _parse_date(event.get('date_apply', start_date), f'{path}.date_apply')
+            plan.one_off_cash.append((day, _to_cents(_require(event, 'value', path), f'{path}.value')))
+        elif name == 'acquire_cash' and method == 'step':
+            steps = _parse_steps(_require(event, 'value', path), f'{path}.value', 1)
+            plan.cash_flows.append(CashFlow(name, steps, _parse_monthly(event, path, DEFAULT_INCOME_DAY)))
+        elif method in (METHOD_BUY, METHOD_SELL):
+            asset_instructions.append(_compile_instruction(event, path, ASSET, assets))
+        else:
+            raise ConfigError(path, f'unknown event {name!r} with method {method!r}')
+    debt_instructions = _compile_strategy(config, 'debt_handle_strategy', DEBT, assets)
+
+    priority = config.get('strategy_priority', ASSET)
+    if priority not in (ASSET, DEBT):
+        raise ConfigError('strategy_priority', f'expected `{ASSET}` or `{DEBT}`, got {priority!r}')
+    ordered = (asset_instructions, debt_instructions) if priority == ASSET else (debt_instructions, asset_instructions)
+    plan.instructions = [instruction for instructions in ordered for instruction in instructions]
+
+    debt_strategy = config.get('debt_handle_strategy') or {}
+    plan.debt_percent = _parse_number(
+        debt_strategy.get('percent', DEFAULT_DEBT_PERCENT), 'debt_handle_strategy.percent'
+    )
+    plan.payoff_order = debt_strategy.get('payoff_order')
+    if plan.payoff_order is not None and plan.payoff_order not in PAYOFF_ORDERS:
+        raise ConfigError(
+            'debt_handle_strategy.payoff_order',
+            f'expected one of {", ".join(PAYOFF_ORDERS)}, got {plan.payoff_order!r}',
+        )
+    plan.inflation_percent = _compile_curves(config)
+    plan.book_capacities = _estimate_book_capacities(plan)
+    return plan
+
+
+def _instruction_listener(instruction: Instruction, plan: SimulationPlan):
+    if instruction.method == METHOD_PAYBACK:
+        if plan.payoff_order is not None:
+            return create_loan_payback(instruction.amount, plan.payoff_order)
+        return create_debt_payback(instruction.amount)
+    asset = plan.assets[instruction.asset_id]
+    if instruction.method == METHOD_BUY:
+        return create_asset_buy(asset.builder(), asset.category, instruction.reference, instruction.amount)
+    return create_asset_sell(asset.category, instruction.reference, instruction.amount)
+
+
+def build_simulation_from_plan(plan: SimulationPlan) -> Simulation:
+    """Wires the listeners of a compiled plan into a new simulation"""
+    simulation = Simulation(plan.n_days, plan.start_date, stepping=plan.stepping, granularity=plan.granularity)
+    # the lots of assets valued by a curve are valued at once, one price lookup per curve and day
+    curve_books = {asset.category: CurveBook for asset in plan.assets.values() if asset.price_curve is not None}
+    for asset in plan.assets.values():
+        if asset.price_curve is None:
+            # a category mixing them with other assets stays a list
+            curve_books.pop(asset.category, None)
+    simulation.ledger_items = LedgerBooks(DEFAULT_BOOK_TYPES | curve_books, capacities=plan.book_capacities)
+
+    simulation.add_event_listener_applied('simulation_started', create_append_ledger_item(ledger_item=Cash(None)))
+    for day, quantity in plan.one_off_cash:
+        simulation.add_event_listener_applied('day_started', create_cash_change_on_date(quantity, day))
+    for flow in plan.cash_flows:
+        simulation.add_event_listener_applied('day_started', create_cash_income(flow.steps, flow.day_apply))
+    if plan.inflation_percent is not None:
+        simulation.add_event_listener_applied('day_started', create_calculate_inflation(plan.inflation_percent))
+
+    for instruction in plan.instructions:
+        listener = _instruction_listener(instruction, plan)
+        if instruction.date_apply is not None:
+            listener = add_date_guard_exact_date(listener, instruction.date_apply)
+        elif instruction.day_apply is not None:
+            listener = add_month_day_date_guard(listener, instruction.day_apply)
+        listener = add_date_guard_date_between(listener, instruction.start_date, instruction.end_date)
+        # unscheduled instructions react to the cash of the day, after the scheduled events changed it
+        event_type = 'day_started' if instruction.is_scheduled else 'day_ended'
+        simulation.add_event_listener_applied(event_type, listener, expires_on=instruction.end_date)
+
+    if any(asset.duration is not None for asset in plan.assets.values()):
+        simulation.add_event_listener_applied('bond_buy_back', create_bond_buy_back_for_cash())
+    if plan.payoff_order is not None:
+        simulation.add_event_listener_applied('cash_state_negative', create_loan_on_negative_cash(plan.debt_percent))
+    else:
+        simulation.add_event_listener_applied('cash_state_negative', create_debt_with_interest(plan.debt_percent))
+    return simulation
+
+
+def config_hash(config: dict) -> str:
+    """
+    Hash of the config content (key order and formatting do not matter), of the plan format and of the CSVs read by the
+    `series` assets
+    """
+    canonical = json.dumps(config, sort_keys=True, separators=(',', ':'), default=str)
+    fingerprints = ','.join(map(str, series_fingerprints(config)))
+    return hashlib.sha256(f'{PLAN_FORMAT_VERSION}:{fingerprints}:{canonical}'.encode()).hexdigest()
+
+
+def default_plan_cache_dir() -> str | None:
+    """Directory of the compiled plans on disk, the `SIMCFA_PLAN_CACHE` env variable (unset or empty: memory only)"""
+    return os.environ.get(PLAN_CACHE_ENV) or None
+
+
+_memory_cache = OrderedDict()
+
+
+class PlanCache:
+    """
+    Directory of compiled plans. An entry is the pickled plan behind an HMAC of the plan key, the SimCFA version and the
+    pickle, signed with a secret created in the directory (readable by its owner only): plans of older code or files
+    not written by the cache are compiled again and never unpickled. The directory is kept under `max_bytes`, the
+    least recently used plans are removed first.
+
+    :param path: directory of the cache, created when missing
+    :param max_bytes: size the directory is trimmed to after every write
+    """
+
+    def __init__(self, path, max_bytes: int = DEFAULT_PLAN_CACHE_MAX_BYTES):
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self.secret = self._read_secret()
+
+    def _read_secret(self) -> bytes:
+        path = os.path.join(self.path, PLAN_CACHE_SECRET)
+        try:
+            descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(path, 'rb') as file:
+                return file.read()
+        secret = os.urandom(32)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(secret)
+        return secret
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.pickle')
+
+    def _signature(self, key: str, payload: bytes) -> bytes:
+        message = f'{key}:{code_version()}:'.encode() + payload
+        return hmac.new(self.secret, message, hashlib.sha256).digest()
+
+    def get(self, key: str) -> SimulationPlan | None:
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as file:
+                entry = file.read()
+        except OSError:
+            return None
+        header = len(PLAN_ENTRY_MAGIC) + hashlib.sha256().digest_size
+        signature, payload = entry[len(PLAN_ENTRY_MAGIC) : header], entry[header:]
+        if not entry.startswith(PLAN_ENTRY_MAGIC) or not hmac.compare_digest(signature, self._signature(key, payload)):
+            # stale (older code), foreign or corrupted entry, the plan is compiled again and overwrites it
+            return None
+        try:
+            plan = pickle.loads(payload)
+            # the modification time is the last use of the entry, see `trim`
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return plan
+
+    def put(self, key: str, plan: SimulationPlan):
+        payload = pickle.dumps(plan, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            # written next to the target and renamed so concurrent workers never read a partial file
+            with tempfile.NamedTemporaryFile('wb', dir=self.path, suffix='.tmp', delete=False) as file:
+                file.write(PLAN_ENTRY_MAGIC + self._signature(key, payload) + payload)
+            os.replace(file.name, self._entry_path(key))
+        except OSError:
+            # the cache is an optimisation only, e.g. a full disk
+            pass
+        else:
+            self.trim()
+
+    def _entries(self) -> list:
+        with os.scandir(self.path) as entries:
+            return [entry for entry in entries if entry.name.endswith('.pickle')]
+
+    def size(self) -> int:
+        """Bytes taken by the entries"""
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def trim(self):
+        """Removes the least recently used entries until the directory fits into `max_bytes`"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def open_plan_cache(cache_dir='default') -> PlanCache | None:
+    """
+    :param cache_dir: a `PlanCache`, a directory, `default` for `default_plan_cache_dir` or None for no disk cache
+    """
+    if cache_dir == 'default':
+        cache_dir = default_plan_cache_dir()
+    if cache_dir is None or isinstance(cache_dir, PlanCache):
+        return cache_dir
+    try:
+        return PlanCache(cache_dir)
+    except OSError:
+        # the cache is an optimisation only, e.g. read only home directory
+        return None
+
+
+def load_compiled_plan(config: dict, cache_dir='default') -> SimulationPlan:
+    """
+    Compiled plan of the config, taken from the cache when the same content was compiled before.
+
+    :param cache_dir: on disk cache, see `open_plan_cache`; by default the plans are kept in memory only unless the
+        `SIMCFA_PLAN_CACHE` env variable names a directory
+    """
+    key = config_hash(config)
+    plan = _memory_cache.get(key)
+    if plan is not None:
+        _memory_cache.move_to_end(key)
+        return plan
+    plan_cache = open_plan_cache(cache_dir)
+    plan = None if plan_cache is None else plan_cache.get(key)
+    if plan is None:
+        plan = compile_config(config)
+        if plan_cache is not None:
+            plan_cache.put(key, plan)
+    _memory_cache[key] = plan
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return plan
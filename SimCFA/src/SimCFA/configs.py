@@ -2,10 +2,10 @@ import io
 import json
 from datetime import date
 
-import matplotlib.pyplot as plt
-
+from SimCFA.config_compiler import build_simulation_from_plan, load_compiled_plan
 from SimCFA.functional import identity, pipe
 from SimCFA.LedgerItem import DAYS_YEAR, three_year_bond_builder
+from SimCFA.run_cache import CachedRun, open_run_cache, run_key
 from SimCFA.simulation import Simulation
 from SimCFA.simulation_procedures import (
     append_cash,
@@ -18,13 +18,16 @@ from SimCFA.simulation_procedures import (
     create_debt_with_interest,
     create_draw_simulation_run,
     create_simulate_monthly_cash_move,
-    create_simulation_state_save,
+    create_simulation_state_recorder,
     create_calculate_inflation,
+    attach_run_summary,
     get_final_cash_state,
 )
 
 
 def show_fig(fig):
+    import matplotlib.pyplot as plt
+
     fig.show()
     plt.pause(0.01)
     x = input()
@@ -43,50 +46,82 @@ def create_handle_fig_save_to_buff():
     return save_fig_to_buffer, access_buffer
 
 
-def config1():
-    income_map = [
-        (date(2024, 2, 1), 4125_00),
-        (date(2024, 7, 1), 5500_00),
-        (date(2024, 10, 1), 4125_00),
-        (date(2025, 1, 1), 5500_00),
-        (date(2026, 1, 1), 8000_00),
-        (date(2027, 1, 1), 10000_00),
-    ]
-
-    income_map = income_map[::-1]
+config1_parameters = {
+    'years': 20,
+    'start_date': '2023-06-01',
+    'initial_cash': 200_000_00,
+    'income_map': [
+        ('2024-02-01', 4125_00),
+        ('2024-07-01', 5500_00),
+        ('2024-10-01', 4125_00),
+        ('2025-01-01', 5500_00),
+        ('2026-01-01', 8000_00),
+        ('2027-01-01', 10000_00),
+    ],
+    'life_costs': -800_00,
+    'life_costs_start_date': '2024-01-01',
+    'bond_quantity': 1766,
+    'bond_buy_date': '2023-10-26',
+    'debt_payback_monthly': 3000_00,
+    'house_price': 1_000_000_00,
+    'house_buy_date': '2026-11-01',
+    'inflation_percent': 3,
+    'granularity': 'daily',
+}
+
+
+def parse_date(value: date | str) -> date:
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def build_config1_simulation(parameters: dict | None = None) -> Simulation:
+    """
+    Builds the simulation of `config1` without any reporting attached.
+
+    :param parameters: overrides of `config1_parameters`, JSON compatible (dates as ISO strings) so it can be swept
+    """
+    params = config1_parameters | (parameters or {})
+
+    income_map = [(parse_date(start), income) for start, income in params['income_map']]
     work_income = create_cash_income(income_map)
-    life_costs = create_simulate_monthly_cash_move(-800_00, date(2024, 1, 1))
-    save_state_fn, access_state_fn = create_simulation_state_save()
-    handle_fig = show_fig
-    # handle_fig, access_fig = create_handle_fig_save_to_buff()
-    draw_simulation_run = create_draw_simulation_run(access_state_fn, handle_fig)
-    bonds_buy = create_bond_buy(1766, three_year_bond_builder)
-    bonds_buy_on_date = create_bond_buy_on_date(bonds_buy, date(2023, 10, 26))
+    life_costs = create_simulate_monthly_cash_move(params['life_costs'], parse_date(params['life_costs_start_date']))
+    DAYS = params['years'] * DAYS_YEAR
+    bonds_buy = create_bond_buy(params['bond_quantity'], three_year_bond_builder)
+    bonds_buy_on_date = create_bond_buy_on_date(bonds_buy, parse_date(params['bond_buy_date']))
     bonds_buy_back = create_bond_buy_back_for_cash()
 
     handle_debt_acquisition_strategy = create_debt_with_interest()
-    debt_payback_strategy = create_debt_payback_strategy(3000_00)
+    debt_payback_strategy = create_debt_payback_strategy(params['debt_payback_monthly'])
 
-    house_price = 1_000_000_00
-    house_buy = create_buy_house(house_price, date(2026, 11, 1))
+    house_buy = create_buy_house(params['house_price'], parse_date(params['house_buy_date']))
 
-    YEARS = 20
-    DAYS = YEARS * DAYS_YEAR
-    simulation = Simulation(DAYS, date(2023, 6, 1))
+    simulation = Simulation(DAYS, parse_date(params['start_date']), granularity=params['granularity'])
 
-    simulation.add_event_listener_applied('simulation_started', append_cash(200_000_00, 0))
+    simulation.add_event_listener_applied('simulation_started', append_cash(params['initial_cash'], 0))
 
     simulation.add_event_listener_applied('day_started', work_income)
     simulation.add_event_listener_applied('day_started', life_costs)
     simulation.add_event_listener_applied('day_started', house_buy)
     simulation.add_event_listener_applied('day_started', bonds_buy_on_date)
-    simulation.add_event_listener_applied('day_started', create_calculate_inflation(3))
+    simulation.add_event_listener_applied('day_started', create_calculate_inflation(params['inflation_percent']))
 
     simulation.add_event_listener_applied('day_started', debt_payback_strategy)
 
     simulation.add_event_listener_applied('bond_buy_back', bonds_buy_back)
 
     simulation.add_event_listener_applied('cash_state_negative', handle_debt_acquisition_strategy)
+    return simulation
+
+
+def config1():
+    simulation = build_config1_simulation()
+
+    save_state_fn, access_state_fn = create_simulation_state_recorder(simulation.n_days)
+    handle_fig = show_fig
+    # handle_fig, access_fig = create_handle_fig_save_to_buff()
+    draw_simulation_run = create_draw_simulation_run(access_state_fn, handle_fig)
 
     simulation.add_event_listener_applied('day_ended', save_state_fn)
 
@@ -105,47 +140,93 @@ def load_in_json_config(filename: str):
     return obj
 
 
-def build_simulation_from_config(config):
-    # build simulation obj
-    sim_params = config['simulation_parameters']
-    simulation = Simulation(**sim_params)
-
-    assets_available = config['assests']
-
-    # build events
-    events_to_start_with = config['events_to_start_with']
-    for event in events_to_start_with:
-        name = event['name']
-        method = event['method']
-        value = event['value']
-        if method == 'const':
-            ...  # value is const, build event and continue
-        if method == 'step':
-            for step_date, step_value in value:
-                ...
-
-    return simulation
+def build_simulation_from_config(config, cache_dir='default'):
+    """Builds the simulation described by a JSON config, the compiled config is cached (see `load_compiled_plan`)"""
+    plan = load_compiled_plan(config, cache_dir)
+    return build_simulation_from_plan(plan)
 
 
 def save_states_and_print_run(simulation):
-    save_state_fn, access_state_fn = create_simulation_state_save()
+    save_state_fn, access_state_fn = create_simulation_state_recorder(simulation.n_days)
     draw_simulation_run = create_draw_simulation_run(access_state_fn, show_fig)
     simulation.add_event_listener_applied('day_ended', save_state_fn)
     simulation.add_event_listener_applied('simulation_ended', draw_simulation_run)
 
 
-def execute_loaded_config(config, transform_fn=identity):
-    process = pipe(
-        build_simulation_from_config,
-        transform_fn,
-        lambda simulation: simulation.simulate(),
-    )
-    return process(config)
-
-
-def execute_config_from_file(filepath: str, transform_fn=identity):
+def print_run(run: CachedRun):
+    """Reporting counterpart of `save_states_and_print_run` for the results of `execute_loaded_config`"""
+    from SimCFA.reporting import make_pretty_plot
+
+    show_fig(make_pretty_plot(run.recording))
+
+
+def _transform_variant(transform_fn, variant: str | None) -> str:
+    """
+    Part of the run key naming the transform: the explicit `variant`, else the qualified name of a module level
+    function. Lambdas, closures and callables without a name would share a key between different transforms, they need
+    a `variant`
+    """
+    if variant is not None:
+        return variant
+    if transform_fn is identity:
+        return ''
+    qualname = getattr(transform_fn, '__qualname__', None)
+    if qualname is None or '<lambda>' in qualname or '<locals>' in qualname:
+        raise ValueError(
+            f'The run cache cannot tell {transform_fn!r} from other transforms, pass a `variant` naming it'
+        )
+    return f'{transform_fn.__module__}.{qualname}'
+
+
+def _run_recorded(config, transform_fn) -> tuple:
+    simulation = transform_fn(build_simulation_from_config(config))
+    record_state, access_state = create_simulation_state_recorder(simulation.n_days)
+    simulation.add_event_listener_applied('day_ended', record_state)
+    access_summary = attach_run_summary(simulation)
+    simulation.simulate()
+    return access_state(), access_summary()
+
+
+def execute_loaded_config(config, transform_fn=identity, run_cache=None, refresh=False, variant: str | None = None):
+    """
+    Runs the simulation of the config.
+
+    With a `run_cache` the recorded states and the run summary are returned as a `CachedRun`, read from the cache
+    when the same config (see `run_key`) ran before. Reporting does not belong into `transform_fn` then, the name of
+    the transform is a part of the key: call e.g. `print_run` on the result so runs with and without plots share the
+    cache entry.
+
+    :param run_cache: `RunCache`, its directory or `default` (see `open_run_cache`), None runs without caching
+    :param refresh: bypass the cache: simulate even when the run is cached and overwrite the entry
+    :param variant: names the transform in the run key, required for lambdas and closures (e.g. `'extra cash 1000'`
+        for `extra(1000)`), module level functions are named by their qualified name otherwise
+    """
+    cache = open_run_cache(run_cache)
+    if cache is None:
+        process = pipe(
+            build_simulation_from_config,
+            transform_fn,
+            lambda simulation: simulation.simulate(),
+        )
+        return process(config)
+
+    key = run_key(config, variant=_transform_variant(transform_fn, variant))
+    result = None if refresh else cache.get(key)
+    if result is None:
+        recording, summary = _run_recorded(config, transform_fn)
+        result = cache.put(key, recording, summary)
+    return result
+
+
+def execute_config_from_file(filepath: str, transform_fn=identity, run_cache=None, refresh=False, variant=None):
     process = pipe(
         load_in_json_config,
-        lambda config: execute_loaded_config(config, transform_fn),
+        lambda config: execute_loaded_config(config, transform_fn, run_cache, refresh, variant),
     )
     return process(filepath)
+
+
+def invalidate_cached_run(config, transform_fn=identity, run_cache='default', variant=None) -> bool:
+    """Removes the cached run of the config, returns whether there was one"""
+    cache = open_run_cache(run_cache)
+    return cache is not None and cache.invalidate(run_key(config, variant=_transform_variant(transform_fn, variant)))
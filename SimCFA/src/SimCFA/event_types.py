@@ -0,0 +1,114 @@
+"""
+Integer ids of the event types and the typed data of the events posted many times a day.
+
+`Events` keeps its listeners in tables indexed by the event id, the id of an event type name is resolved once (when
+subscribing or in a module constant like `CASH_STATE_CHANGE`) instead of hashing the name on every post. Ids are
+assigned per process in the order the names are first seen.
+
+Payloads are slotted objects read like the dicts posted before: `data['n_day']`, `data.get(...)` and `fn(**data)` keep
+working. Fields missing on the payload are looked up in its `context`, the data of the event it was posted from (usually
+the simulation state of the day), which is referenced rather than copied into every payload.
+"""
+
+import threading
+from collections.abc import Mapping
+
+EVENT_IDS: dict[str, int] = {}
+EVENT_TYPES: list[str] = []
+_registry_lock = threading.Lock()
+
+
+def event_id(event_type: str | int) -> int:
+    """Id of the event type, assigned on first use"""
+    if isinstance(event_type, int):
+        return event_type
+    event = EVENT_IDS.get(event_type)
+    if event is None:
+        with _registry_lock:
+            event = EVENT_IDS.get(event_type)
+            if event is None:
+                event = EVENT_IDS[event_type] = len(EVENT_TYPES)
+                EVENT_TYPES.append(event_type)
+    return event
+
+
+def event_name(event_type: str | int) -> str:
+    return EVENT_TYPES[event_type] if isinstance(event_type, int) else event_type
+
+
+SIMULATION_STARTED = event_id('simulation_started')
+SIMULATION_ENDED = event_id('simulation_ended')
+DAY_STARTED = event_id('day_started')
+DAY_ENDED = event_id('day_ended')
+CASH_STATE_CHANGE = event_id('cash_state_change')
+CASH_STATE_NEGATIVE = event_id('cash_state_negative')
+
+
+class EventPayload(Mapping):
+    """
+    Base of the typed event data, subclasses list their fields in `__slots__`
+
+    :param context: data the fields missing on the payload are read from
+    """
+
+    __slots__ = ('context',)
+    fields: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = cls.fields | frozenset(cls.__slots__)
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            return getattr(self, key)
+        return self.context[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __contains__(self, key):
+        return key in self.fields or key in self.context
+
+    def to_dict(self) -> dict:
+        """Plain dict of the context updated with the fields, what `fn(**data)` receives"""
+        data = dict(self.context)
+        for field in self.fields:
+            data[field] = getattr(self, field)
+        return data
+
+    def __repr__(self):
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in sorted(self.fields))
+        return f'{type(self).__name__}({fields})'
+
+
+class CashStateChange(EventPayload):
+    """`cash_state_change`, `debit_level` and `new_state` are the cash quantity before it is clamped at 0"""
+
+    __slots__ = ('by_how_much', 'debit_level', 'events', 'index', 'ledger_items', 'n_day', 'new_state')
+
+    def __init__(self, context, ledger_items, index: int, by_how_much: int, new_state: int, events, n_day: int):
+        self.context = context
+        self.ledger_items = ledger_items
+        self.index = index
+        self.by_how_much = by_how_much
+        self.debit_level = new_state
+        self.new_state = new_state
+        self.events = events
+        self.n_day = n_day
+
+
+class CashStateNegative(EventPayload):
+    """`cash_state_negative`, `debit_level` is the (negative) cash quantity which has to be covered"""
+
+    __slots__ = ('debit_level', 'events', 'index', 'ledger_items', 'n_day')
+
+    def __init__(self, context, ledger_items, index: int, debit_level: int, events, n_day: int):
+        self.context = context
+        self.ledger_items = ledger_items
+        self.index = index
+        self.debit_level = debit_level
+        self.events = events
+        self.n_day = n_day
@@ -1,17 +1,166 @@
-from collections import defaultdict
 from dataclasses import dataclass
+from datetime import date
+
+from SimCFA.event_types import EVENT_IDS, event_id, event_name
+from SimCFA.profiling import EventProfiler
+from SimCFA.scheduler import DateRange, combine_schedules
+
+
+class Subscription:
+    """Handle returned by `Events.subscribe`, calling `unsubscribe` stops any further calls of the listener"""
+
+    __slots__ = ('active', 'expires_on', 'fn', 'once')
+
+    def __init__(self, fn, once: bool = False, expires_on: date | None = None):
+        self.fn = fn
+        self.once = once
+        self.expires_on = expires_on
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
 
 
 @dataclass
 class Events:
+    """
+    Listeners by event type. The tables are indexed by the event id (see `SimCFA.event_types`), `post_event` accepts
+    the id or the name of the event type, posting by id skips resolving the name.
+    """
+
     def __init__(self) -> None:
-        self.subscribers = defaultdict(list)
+        # per event id: the subscriptions, or the scheduler the subscriptions are routed through
+        self.subscribers: list[list[Subscription]] = []
+        self.scheduled: list = []
+        self.schedulers = {}
+        self.profiler = None
+        # data of the current day, the context of the payloads posted without one (see `SimCFA.event_types`)
+        self.context = {}
+
+    def _table_index(self, event_type: str | int) -> int:
+        event = event_id(event_type)
+        while len(self.subscribers) <= event:
+            self.subscribers.append([])
+            self.scheduled.append(None)
+        return event
+
+    def attach_scheduler(self, event_type: str, scheduler):
+        """Routes all listeners of the (day based) event type through the calendar scheduler"""
+        event = self._table_index(event_type)
+        for subscription in self.subscribers[event]:
+            scheduler.add(subscription, self._schedule_of(subscription))
+        self.subscribers[event] = []
+        self.scheduled[event] = scheduler
+        self.schedulers[event_name(event_type)] = scheduler
 
-    def subscribe(self, event_type: str, fn):
-        self.subscribers[event_type].append(fn)
+    def subscribe(self, event_type: str | int, fn, once: bool = False, expires_on: date | None = None) -> Subscription:
+        """
+        :param once: the listener is removed after its first call
+        :param expires_on: the listener is removed once the `day_date` of the posted data is past this date
+        :return: handle allowing to unsubscribe the listener
+        """
+        event = self._table_index(event_type)
+        if self.profiler is not None:
+            fn = self.profiler.wrap_listener(event_name(event), fn)
+        subscription = Subscription(fn, once, expires_on)
+        scheduler = self.scheduled[event]
+        if scheduler is not None:
+            scheduler.add(subscription, self._schedule_of(subscription))
+            return subscription
+        self.subscribers[event].append(subscription)
+        return subscription
 
-    def post_event(self, event_type: str, data):
-        if event_type not in self.subscribers:
+    def has_listeners(self, event_type: str | int) -> bool:
+        """Whether posting the event may call a listener, lets the poster skip building the data"""
+        event = event_type if type(event_type) is int else EVENT_IDS.get(event_type)
+        if event is None or event >= len(self.subscribers):
+            return False
+        return self.scheduled[event] is not None or bool(self.subscribers[event])
+
+    def _all_subscriptions(self):
+        for event, subscriptions in enumerate(self.subscribers):
+            for subscription in subscriptions:
+                yield event_name(event), subscription
+        for event_type, scheduler in self.schedulers.items():
+            for subscription in scheduler.subscriptions():
+                yield event_type, subscription
+
+    def enable_profiling(self, profiler: EventProfiler | None = None) -> EventProfiler:
+        """
+        Wraps `post_event` and every listener (current and subscribed later) of this instance with the profiler.
+        Nothing is wrapped while profiling is disabled, so it costs nothing then.
+        """
+        if self.profiler is not None:
+            self.disable_profiling()
+        profiler = EventProfiler() if profiler is None else profiler
+        profiler.start()
+        self.profiler = profiler
+        for event_type, subscription in self._all_subscriptions():
+            subscription.fn = profiler.wrap_listener(event_type, subscription.fn)
+        # instance attribute shadowing the method, removed again by `disable_profiling`
+        self.post_event = profiler.wrap_post_event(Events.post_event.__get__(self))
+        return profiler
+
+    def disable_profiling(self) -> EventProfiler | None:
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        for _, subscription in self._all_subscriptions():
+            subscription.fn = getattr(subscription.fn, 'profiled', subscription.fn)
+        del self.post_event
+        profiler.stop()
+        self.profiler = None
+        return profiler
+
+    def __getstate__(self):
+        # ids are assigned per process, a pickled instance keeps the tables by event type name
+        state = self.__dict__.copy()
+        state['subscribers'] = {event_name(event): list(subs) for event, subs in enumerate(self.subscribers) if subs}
+        del state['scheduled']
+        # rebound by the simulation when it continues
+        state['context'] = {}
+        return state
+
+    def __setstate__(self, state):
+        subscribers = state.pop('subscribers')
+        self.__dict__.update(state)
+        self.subscribers = []
+        self.scheduled = []
+        for event_type, subscriptions in subscribers.items():
+            self.subscribers[self._table_index(event_type)] = subscriptions
+        for event_type, scheduler in self.schedulers.items():
+            self.scheduled[self._table_index(event_type)] = scheduler
+
+    @staticmethod
+    def _schedule_of(subscription: Subscription):
+        if subscription.expires_on is None:
+            return getattr(subscription.fn, 'schedule', None)
+        return combine_schedules(subscription.fn, DateRange(end_date=subscription.expires_on))
+
+    def post_event(self, event_type: str | int, data):
+        event = event_type if type(event_type) is int else EVENT_IDS.get(event_type)
+        if event is None or event >= len(self.subscribers):
             return
-        for fn in self.subscribers[event_type]:
-            fn(data)
+        scheduler = self.scheduled[event]
+        if scheduler is not None:
+            subscriptions = scheduler.due(data['n_day'], data.get('period_last_day'))
+        else:
+            subscriptions = self.subscribers[event]
+            if not subscriptions:
+                return
+
+        stale = False
+        for subscription in subscriptions:
+            if subscription.expires_on is not None and data.get('day_date', date.min) > subscription.expires_on:
+                subscription.active = False
+            if not subscription.active:
+                stale = True
+                continue
+            if subscription.once:
+                subscription.active = False
+                stale = True
+            subscription.fn(data)
+
+        if stale and scheduler is None:
+            # replace rather than mutate, an outer dispatch of the same event may still iterate the old list
+            self.subscribers[event] = [s for s in self.subscribers[event] if s.active]
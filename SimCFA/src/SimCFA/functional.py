@@ -1,4 +1,16 @@
+import inspect
+from functools import wraps
+from operator import itemgetter
+from types import FunctionType
+
+from SimCFA.event_types import EventPayload
+
+# `*args` or `**kwargs` in the code flags of a function
+PLAIN_ARGUMENTS_MASK = inspect.CO_VARARGS | inspect.CO_VARKEYWORDS
+
+
 def apply(fn):
+    @wraps(fn)
     def inner(args):
         return fn(*args)
 
@@ -6,12 +18,91 @@ def apply(fn):
 
 
 def apply_kwarg(fn):
+    @wraps(fn)
     def inner(kwargs):
         return fn(**kwargs)
 
     return inner
 
 
+def field_names(fn) -> list | None:
+    """
+    Names of the fields `fn` takes when it has only plain named parameters (no defaults, no `*args` or `**kwargs`),
+    None for any other function
+    """
+    if isinstance(fn, FunctionType):
+        # read from the code, the guards created per bought item bind their function on every purchase
+        code = fn.__code__
+        if code.co_flags & PLAIN_ARGUMENTS_MASK or code.co_kwonlyargcount or code.co_posonlyargcount or fn.__defaults__:
+            return None
+        return list(code.co_varnames[: code.co_argcount])
+    try:
+        # the own signature, a guard taking `**kwargs` must not be bound to the fields of the function it wraps
+        parameters = inspect.signature(fn, follow_wrapped=False).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(
+        parameter.kind is not parameter.POSITIONAL_OR_KEYWORD or parameter.default is not parameter.empty
+        for parameter in parameters
+    ):
+        return None
+    return [parameter.name for parameter in parameters]
+
+
+def bind_listener(fn):
+    """
+    `apply_kwarg` binding the fields once: a function with only plain named parameters (see `field_names`) is called
+    with just those fields of the data, picked by an `itemgetter`. Any other function gets all of them as keyword
+    arguments, payloads (`SimCFA.event_types`) are turned into a dict for it.
+    """
+    names = field_names(fn)
+    if names is None:
+
+        @wraps(fn)
+        def inner(kwargs):
+            if isinstance(kwargs, EventPayload):
+                return fn(**kwargs.to_dict())
+            return fn(**kwargs)
+
+    elif not names:
+
+        @wraps(fn)
+        def inner(kwargs):
+            return fn()
+
+    elif len(names) == 1:
+        get_field = itemgetter(names[0])
+
+        @wraps(fn)
+        def inner(kwargs):
+            return fn(get_field(kwargs))
+
+    else:
+        get_fields = itemgetter(*names)
+
+        @wraps(fn)
+        def inner(kwargs):
+            return fn(*get_fields(kwargs))
+
+    return inner
+
+
+def bind_keywords(fn):
+    """
+    `fn` callable with any fields as keyword arguments, for wrappers forwarding their `**kwargs` to a listener which
+    names only the fields it uses
+    """
+    names = field_names(fn)
+    if names is None:
+        return fn
+
+    @wraps(fn)
+    def inner(**kwargs):
+        return fn(*[kwargs[name] for name in names])
+
+    return inner
+
+
 def identity(x):
     return x
 
@@ -0,0 +1,264 @@
+"""
+Goal seeking over simulation outcomes: a numeric config parameter is the variable, a run summary metric (see
+`create_run_summary`) the objective or the constraint.
+
+    result = goal_seek(config, 'house_price', 'min_cash', 0, 5_000_000_00, target=0)
+    result = find_limit(config, 'debt_payback_monthly', lambda summary: summary['max_debt'] < 10_000, 0, 10_000_00,
+                        maximize=False, build_fn=build_config1_simulation)
+
+Every probe is a run from day 0 unless a `WarmStart` is given: it states the first day the variable matters and how
+to set the variable on a fork of a checkpoint taken on that day (`Checkpoint.fork` injection). The days before it are
+then simulated once, with the `low` value. The search only trusts the warm started probes after the final bracket
+gets the same outcome from cold runs, otherwise it runs again from scratch.
+"""
+
+import math
+from collections.abc import Callable
+from copy import deepcopy
+from dataclasses import dataclass, field
+
+from SimCFA.configs import build_simulation_from_config
+from SimCFA.simulation_procedures import attach_run_summary
+from SimCFA.sweep import set_in_config
+
+METHOD_BISECTION = 'bisection'
+METHOD_SECANT = 'secant'
+
+
+@dataclass
+class WarmStart:
+    """
+    Explicit warm start of the probes.
+
+    :param n_day: first day the variable can change anything, nothing simulated before it may depend on the variable
+    :param inject: `inject(simulation, value)` sets the variable to `value` on a fork paused on `n_day`, e.g. with
+        `Simulation.replace_listener` on a subscription the build function kept
+    """
+
+    n_day: int
+    inject: Callable
+
+
+@dataclass
+class GoalSeekResult:
+    value: float  # value of the variable found
+    summary: dict  # run summary at `value`, of a run from day 0
+    converged: bool
+    probes: list = field(default_factory=list)  # (value, summary) in the order they were run
+    warm_start_day: int = 0  # day the probes continued from, 0 when they were run from scratch
+
+    @property
+    def iterations(self) -> int:
+        return len(self.probes)
+
+
+class Prober:
+    """
+    Runs the simulation for values of the variable, the summaries are cached per value.
+    After `prepare` with a `warm_start` the probes continue from a checkpoint taken on its `n_day`.
+
+    :param config: base config, not modified
+    :param path: dotted config path of the variable (see `set_in_config`)
+    :param build_fn: builds a `Simulation` from a config
+    """
+
+    def __init__(self, config, path: str, build_fn=build_simulation_from_config, warm_start: WarmStart | None = None):
+        self.config = config
+        self.path = path
+        self.build_fn = build_fn
+        self.warm_start = warm_start
+        self.probes = []
+        self._summaries = {}
+        self._cold_summaries = {}
+        self._checkpoint = None
+
+    @property
+    def warm_start_day(self) -> int:
+        return 0 if self._checkpoint is None else self._checkpoint.n_day
+
+    def _build(self, value):
+        config = deepcopy(self.config)
+        set_in_config(config, self.path, value)
+        simulation = self.build_fn(config)
+        access_summary = attach_run_summary(simulation)
+        return simulation, access_summary
+
+    def _remember(self, value, summary):
+        self._summaries[value] = summary
+        self.probes.append((value, summary))
+        return summary
+
+    def run_cold(self, value) -> dict:
+        if self._checkpoint is None:
+            return self.summary(value)
+        if value not in self._cold_summaries:
+            simulation, access_summary = self._build(value)
+            simulation.simulate()
+            self._cold_summaries[value] = access_summary()
+        return self._cold_summaries[value]
+
+    def prepare(self, low):
+        """With a `warm_start` the days before its `n_day` are simulated once, with the variable at `low`"""
+        if self.warm_start is None or self.warm_start.n_day <= 0:
+            return
+        simulation, access_summary = self._build(low)
+        simulation.simulate_until(self.warm_start.n_day)
+        self._checkpoint = simulation.checkpoint(access_summary)
+
+    def summary(self, value) -> dict:
+        if value in self._summaries:
+            return self._summaries[value]
+        if self._checkpoint is None:
+            simulation, access_summary = self._build(value)
+        else:
+            inject = self.warm_start.inject
+            simulation, access_summary = self._checkpoint.fork(lambda simulation, _: inject(simulation, value))
+        simulation.simulate()
+        return self._remember(value, access_summary())
+
+    def verify(self, values, outcome) -> bool:
+        """Whether runs of `values` from day 0 have the same `outcome` (function of a summary) as the probes had"""
+        return all(outcome(self.run_cold(value)) == outcome(self.summary(value)) for value in values)
+
+
+def _metric_fn(metric):
+    if callable(metric):
+        return metric
+    return lambda summary: summary[metric]
+
+
+def _integral(low, high, tolerance) -> bool:
+    return all(isinstance(value, int) and not isinstance(value, bool) for value in (low, high, tolerance))
+
+
+def _next_point(method, low, f_low, high, f_high, integral):
+    middle = (low + high) / 2
+    if method == METHOD_SECANT and f_high != f_low:
+        secant = high - f_high * (high - low) / (f_high - f_low)
+        # the secant step is kept only while it stays inside the bracket, bisection otherwise
+        if low < secant < high and math.isfinite(secant):
+            middle = secant
+    if integral:
+        middle = min(max(round(middle), low + 1), high - 1)
+    return middle
+
+
+def _seek(prober, metric_fn, target, low, high, method, tolerance, max_iterations):
+    integral = _integral(low, high, tolerance)
+    if integral:
+        tolerance = max(tolerance, 1)
+    f_low = metric_fn(prober.summary(low)) - target
+    f_high = metric_fn(prober.summary(high)) - target
+    if f_low == 0 or f_high == 0:
+        value = low if f_low == 0 else high
+        return value, True, (value,)
+    if (f_low > 0) == (f_high > 0):
+        raise ValueError(f'The metric minus the target has the same sign at {low} ({f_low}) and {high} ({f_high})')
+
+    for _ in range(max_iterations):
+        if high - low <= tolerance:
+            break
+        point = _next_point(method, low, f_low, high, f_high, integral)
+        f_point = metric_fn(prober.summary(point)) - target
+        if f_point == 0:
+            return point, True, (point,)
+        if (f_point > 0) == (f_low > 0):
+            low, f_low = point, f_point
+        else:
+            high, f_high = point, f_point
+    return (low if abs(f_low) <= abs(f_high) else high), high - low <= tolerance, (low, high)
+
+
+def _bisect_limit(prober, constraint, feasible, infeasible, integral, tolerance, max_iterations):
+    for _ in range(max_iterations):
+        if abs(infeasible - feasible) <= tolerance:
+            break
+        point = (feasible + infeasible) / 2
+        if integral:
+            point = round(point)
+            if point in (feasible, infeasible):
+                break
+        if constraint(prober.summary(point)):
+            feasible = point
+        else:
+            infeasible = point
+    return (feasible, infeasible), abs(infeasible - feasible) <= tolerance
+
+
+def goal_seek(
+    config,
+    path: str,
+    metric,
+    low,
+    high,
+    target: float = 0,
+    build_fn=build_simulation_from_config,
+    method: str = METHOD_BISECTION,
+    tolerance=1,
+    max_iterations: int = 60,
+    warm_start: WarmStart | None = None,
+) -> GoalSeekResult:
+    """
+    Finds the value of the config parameter at `path` for which the metric of the run summary equals `target`.
+    The metric has to cross the target between `low` and `high` (their runs are on opposite sides of it).
+
+    :param metric: run summary key (e.g. `final_cash`, `min_cash`, `max_debt`) or function of the summary
+    :param method: `bisection` or `secant` (falls back to bisection steps whenever the secant leaves the bracket)
+    :param tolerance: width of the final bracket, integer bounds and tolerance keep the variable integral (cents)
+    :param warm_start: continue the probes from a checkpoint instead of day 0, see `WarmStart`
+    """
+    if method not in (METHOD_BISECTION, METHOD_SECANT):
+        raise ValueError(f'Unknown method: {method}')
+    metric_fn = _metric_fn(metric)
+    prober = Prober(config, path, build_fn, warm_start)
+    prober.prepare(low)
+    value, converged, bracket = _seek(prober, metric_fn, target, low, high, method, tolerance, max_iterations)
+
+    def side(summary):
+        difference = metric_fn(summary) - target
+        return (difference > 0) - (difference < 0)
+
+    if not prober.verify(bracket, side):
+        return goal_seek(config, path, metric, low, high, target, build_fn, method, tolerance, max_iterations)
+    return GoalSeekResult(value, prober.run_cold(value), converged, prober.probes, prober.warm_start_day)
+
+
+def find_limit(
+    config,
+    path: str,
+    constraint,
+    low,
+    high,
+    maximize: bool = True,
+    build_fn=build_simulation_from_config,
+    tolerance=1,
+    max_iterations: int = 60,
+    warm_start: WarmStart | None = None,
+) -> GoalSeekResult:
+    """
+    Bisection for the largest (`maximize`) or the smallest value of the config parameter at `path` whose run summary
+    satisfies `constraint`, e.g. the most expensive house keeping the cash positive.
+    The constraint has to hold on one side of the limit only: at `low` and not at `high` when maximizing, the other
+    way around when minimizing.
+
+    :param constraint: function of the run summary returning whether the value is acceptable
+    :param warm_start: continue the probes from a checkpoint instead of day 0, see `WarmStart`
+    """
+    prober = Prober(config, path, build_fn, warm_start)
+    prober.prepare(low)
+    integral = _integral(low, high, tolerance)
+    feasible, infeasible = (low, high) if maximize else (high, low)
+    if not constraint(prober.summary(feasible)):
+        raise ValueError(f'The constraint does not hold at {feasible}')
+    if constraint(prober.summary(infeasible)):
+        bracket = (infeasible,)
+        feasible = infeasible
+        converged = True
+    else:
+        bracket, converged = _bisect_limit(
+            prober, constraint, feasible, infeasible, integral, tolerance, max_iterations
+        )
+        feasible = bracket[0]
+    if not prober.verify(bracket, constraint):
+        return find_limit(config, path, constraint, low, high, maximize, build_fn, tolerance, max_iterations)
+    return GoalSeekResult(feasible, prober.run_cold(feasible), converged, prober.probes, prober.warm_start_day)
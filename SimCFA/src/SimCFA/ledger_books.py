@@ -0,0 +1,655 @@
+import heapq
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import islice
+from typing import ClassVar
+
+import numpy as np
+
+from SimCFA.compound_interest_calculator import growth_factor, growth_factors
+from SimCFA.LedgerItem import DAYS_YEAR, LedgerItem, LedgerItemProperties, LedgerItemType
+
+
+class BookItemProperties:
+    """`LedgerItemProperties` of an item kept in a ledger book, reads and writes go straight to the book arrays"""
+
+    __slots__ = ('book', 'item_type', 'slot')
+
+    def __init__(self, book, slot: int, item_type: LedgerItemType):
+        self.book = book
+        self.slot = slot
+        self.item_type = item_type
+
+    @property
+    def quantity(self):
+        return self.book.quantity[self.slot].item()
+
+    @quantity.setter
+    def quantity(self, value):
+        self.book.quantity[self.slot] = value
+        self.book.invalidate()
+
+    @property
+    def acquired_on(self):
+        return self.book.acquired_on[self.slot].item()
+
+    @acquired_on.setter
+    def acquired_on(self, value):
+        self.book.acquired_on[self.slot] = value
+        self.book.invalidate()
+
+    def __repr__(self):
+        return f'BookItemProperties(quantity={self.quantity}, acquired_on={self.acquired_on})'
+
+
+@dataclass
+class BookAggregate:
+    """
+    Value of a whole book as `constant + sum(rate_sums[rate] * growth_factor(rate, n_day))`, the growth of every item
+    is factored out of its acquisition day so advancing to another day costs one multiplication per rate.
+    Holds for the days in `(valid_after, valid_until]`, e.g. until the next bond matures.
+    """
+
+    constant: float = 0.0
+    rate_sums: tuple = ()  # (percent, n_times_during_year, sum) per rate
+    valid_after: float = -np.inf
+    valid_until: float = np.inf
+
+    def covers(self, first_day, last_day) -> bool:
+        return self.valid_after < first_day and last_day <= self.valid_until
+
+    def value(self, n_day: int):
+        total = self.constant
+        for percent, n_times_during_year, rate_sum in self.rate_sums:
+            total += rate_sum * growth_factor(percent, n_day, n_times_during_year, DAYS_YEAR)
+        return total
+
+    def value_over_days(self, n_days: np.ndarray) -> np.ndarray:
+        total = np.full(len(n_days), self.constant)
+        for percent, n_times_during_year, rate_sum in self.rate_sums:
+            total += rate_sum * growth_factors(percent, n_days, n_times_during_year, DAYS_YEAR)
+        return total
+
+
+class LedgerBook(ABC):
+    """
+    Struct-of-arrays container of ledger items of one category.
+
+    Behaves like the list of `LedgerItem` it replaces (append, remove, iteration, indexing) so existing procedures keep
+    working, while the numeric fields of the items live in NumPy arrays and the whole book can be valued at once.
+    Removed items free their slot by zeroing its quantity, the arrays are compacted once half of the slots are free
+    (never while the book is being iterated, items appended during iteration are visited like with a list).
+
+    The total quantity and a `BookAggregate` of the value are kept between changes of the book, valuing an unchanged
+    book on another day costs O(number of rates) instead of O(number of items).
+    """
+
+    # extra per item columns: name -> (dtype, fn extracting the value from the item)
+    columns: ClassVar[dict] = {}
+    # columns making up the interest rate of an item, items sharing a rate share a growth factor table
+    rate_columns: ClassVar[tuple] = ()
+
+    def __init__(self, items=(), capacity: int = 16):
+        self._items = {}
+        self._iterating = 0
+        self.size = 0
+        self.capacity = capacity
+        self.quantity = np.zeros(capacity)
+        self.acquired_on = np.zeros(capacity, dtype=np.int64)
+        self.rate_id = np.zeros(capacity, dtype=np.int64)
+        self.rates = {}
+        self._total_quantity = None
+        self._aggregate = None
+        for name, (dtype, _) in self.columns.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        for item in items:
+            self.append(item)
+
+    def invalidate(self):
+        """Drops the running totals, called on every change of the quantity or acquisition day of an item"""
+        self._total_quantity = None
+        self._aggregate = None
+
+    def _arrays(self):
+        return ('quantity', 'acquired_on', 'rate_id', *self.columns)
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in self._arrays():
+            old = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=old.dtype)
+            grown[: self.size] = old[: self.size]
+            setattr(self, name, grown)
+
+    def _compact(self):
+        slots = np.fromiter(self._items, dtype=np.int64, count=len(self._items))
+        for name in self._arrays():
+            old = getattr(self, name)
+            compacted = np.zeros(self.capacity, dtype=old.dtype)
+            compacted[: len(slots)] = old[slots]
+            setattr(self, name, compacted)
+        items = list(self._items.values())
+        self._items = dict(enumerate(items))
+        for slot, item in self._items.items():
+            item.properties.slot = slot
+        self.size = len(items)
+
+    def append(self, item: LedgerItem):
+        if self.size == self.capacity:
+            self._grow()
+        slot = self.size
+        properties = item.properties
+        self.quantity[slot] = properties.quantity
+        self.acquired_on[slot] = properties.acquired_on
+        for name, (_, extract) in self.columns.items():
+            getattr(self, name)[slot] = extract(item)
+        if self.rate_columns:
+            rate = tuple(getattr(self, name)[slot].item() for name in self.rate_columns)
+            self.rate_id[slot] = self.rates.setdefault(rate, len(self.rates))
+        item.properties = BookItemProperties(self, slot, properties.item_type)
+        self._items[slot] = item
+        self.size += 1
+        self.invalidate()
+
+    def _owns(self, item) -> bool:
+        properties = item.properties
+        return (
+            isinstance(properties, BookItemProperties)
+            and properties.book is self
+            and self._items.get(properties.slot) is item
+        )
+
+    def remove(self, item: LedgerItem):
+        if not self._owns(item):
+            raise ValueError(f'{item} not in {type(self).__name__}')
+        properties = item.properties
+        slot = properties.slot
+        item.properties = LedgerItemProperties(properties.quantity, properties.acquired_on, properties.item_type)
+        self.quantity[slot] = 0
+        del self._items[slot]
+        self.invalidate()
+        if not self._iterating and len(self._items) < self.size // 2:
+            self._compact()
+
+    def __iter__(self):
+        self._iterating += 1
+        try:
+            slot = 0
+            while slot < self.size:
+                item = self._items.get(slot)
+                slot += 1
+                if item is not None:
+                    yield item
+        finally:
+            self._iterating -= 1
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return self._owns(item)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError('ledger book index out of range')
+        return next(islice(self._items.values(), index, None))
+
+    def __setitem__(self, index: int, item: LedgerItem):
+        current = self[index]
+        if current is item:
+            return
+        # rebuild the insertion order so the replacement takes the position of the replaced item
+        items = list(self._items.values())
+        position = items.index(current)
+        for old in items[position:]:
+            self.remove(old)
+        for new in [item, *items[position + 1 :]]:
+            self.append(new)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self._items.values())})'
+
+    def total_quantity(self):
+        if not self._items:
+            return 0
+        if self._total_quantity is None:
+            self._total_quantity = self.quantity[: self.size].sum().item()
+        return self._total_quantity
+
+    def growth_factors(self, days):
+        """Compound interest multiplier of every slot after its number of `days`"""
+        if len(self.rates) == 1:
+            ((percent, *n_times_during_year),) = self.rates
+            return growth_factors(percent, days, *n_times_during_year, days_in_year=DAYS_YEAR)
+        result = np.ones(days.shape)
+        rate_id = self.rate_id[: days.shape[-1]]
+        for (percent, *n_times_during_year), index in self.rates.items():
+            mask = rate_id == index
+            result[..., mask] = growth_factors(percent, days[..., mask], *n_times_during_year, days_in_year=DAYS_YEAR)
+        return result
+
+    @abstractmethod
+    def get_values(self, n_day):
+        """
+        Value of every slot on the day, free slots are valued 0.
+        `n_day` can also be a column of days (shape (n, 1)), the result then has one row per day.
+        """
+
+    def rate_sums(self, weights) -> tuple:
+        """(percent, n_times_during_year, sum of `weights` of the slots with the rate) for every rate of the book"""
+        size = self.size
+        sums = np.bincount(self.rate_id[:size], weights[:size], minlength=len(self.rates))
+        rate_sums = []
+        for (percent, *n_times_during_year), index in self.rates.items():
+            n_times_during_year = n_times_during_year[0] if n_times_during_year else 1
+            rate_sums.append((percent, n_times_during_year, sums[index].item()))
+        return tuple(rate_sums)
+
+    @abstractmethod
+    def build_aggregate(self, first_day: int) -> BookAggregate:
+        """`BookAggregate` of the current items, valid at least on `first_day`"""
+
+    def aggregate(self, first_day: int, last_day: int) -> BookAggregate:
+        """Aggregate of the book built on `first_day` or kept from earlier, might not cover `last_day`"""
+        aggregate = self._aggregate
+        if aggregate is None or not aggregate.covers(first_day, last_day):
+            aggregate = self._aggregate = self.build_aggregate(first_day)
+        return aggregate
+
+    def get_value(self, n_day: int):
+        """
+        Value of the whole book if it was sold on the day, equal to summing `get_value` of the items up to float
+        rounding
+        """
+        if not self._items:
+            return 0
+        return self.aggregate(n_day, n_day).value(n_day)
+
+    def get_value_over_days(self, n_days) -> np.ndarray:
+        """`get_value` for every day of the `n_days` array at once"""
+        n_days = np.asarray(n_days)
+        if not self._items:
+            return np.zeros(len(n_days))
+        if not len(n_days):
+            return np.zeros(0)
+        first_day, last_day = n_days.min().item(), n_days.max().item()
+        aggregate = self.aggregate(first_day, last_day)
+        if not aggregate.covers(first_day, last_day):
+            # the days cross a maturity, the items are valued one by one
+            values = self.get_values(n_days[:, None])
+            return np.broadcast_to(values, (len(n_days), self.size)).sum(axis=-1)
+        return aggregate.value_over_days(n_days)
+
+
+class CashBook(LedgerBook):
+    def get_values(self, n_day):
+        return self.quantity[: self.size]
+
+    def build_aggregate(self, first_day: int) -> BookAggregate:
+        return BookAggregate(constant=self.total_quantity())
+
+
+class BondBook(LedgerBook):
+    columns: ClassVar[dict] = {
+        'percent': (np.float64, lambda item: item.percent),
+        'price': (np.float64, lambda item: item.price),
+        'penalty': (np.float64, lambda item: item.pre_maturity_buy_back_penalty),
+        'capitalisation_periods': (np.float64, lambda item: item.capitalisation_periods),
+        'max_duration_in_days': (np.float64, lambda item: item.max_duration_in_days),
+    }
+    rate_columns: ClassVar[tuple] = ('percent', 'capitalisation_periods')
+
+    def get_values(self, n_day):
+        """Vectorized `Bond.get_value`"""
+        size = self.size
+        days_passed = n_day - self.acquired_on[:size]
+        max_duration_in_days = self.max_duration_in_days[:size]
+        matured = days_passed > max_duration_in_days
+        days_passed = np.where(matured, max_duration_in_days, days_passed)
+        use_penalty = np.where(matured, 0, self.penalty[:size])
+        multiplier = self.growth_factors(days_passed)
+        return (multiplier * self.price[:size] - use_penalty) * self.quantity[:size]
+
+    def build_aggregate(self, first_day: int) -> BookAggregate:
+        """
+        Matured bonds have a constant value, the others grow with their rate and lose the penalty.
+        Valid until the next of the held bonds matures.
+        """
+        size = self.size
+        quantity = self.quantity[:size]
+        matures_after = self.acquired_on[:size] + self.max_duration_in_days[:size]
+        held = quantity != 0
+        # a bond matures the day after `matures_after`, on the day itself its value still grows
+        matured = matures_after < first_day
+        growing = ~matured
+        matured_values = self.growth_factors(self.max_duration_in_days[:size]) * self.price[:size] * quantity
+        constant = np.where(matured, matured_values, -self.penalty[:size] * quantity).sum().item()
+        growing_weights = np.where(
+            growing, self.price[:size] * quantity / self.growth_factors(self.acquired_on[:size]), 0
+        )
+        return BookAggregate(
+            constant=constant,
+            rate_sums=self.rate_sums(growing_weights),
+            valid_after=matures_after[held & matured].max(initial=-np.inf).item(),
+            valid_until=matures_after[held & growing].min(initial=np.inf).item(),
+        )
+
+
+class DebtBook(LedgerBook):
+    columns: ClassVar[dict] = {
+        'percent': (np.float64, lambda item: item.percent),
+    }
+    rate_columns: ClassVar[tuple] = ('percent',)
+
+    def get_values(self, n_day):
+        """Vectorized `Debt.get_value`"""
+        size = self.size
+        multiplier = self.growth_factors(n_day - self.acquired_on[:size])
+        return -(self.quantity[:size] * multiplier)
+
+    def build_aggregate(self, first_day: int) -> BookAggregate:
+        """Debt grows without limit, the aggregate is valid on every day"""
+        size = self.size
+        weights = -self.quantity[:size] / self.growth_factors(self.acquired_on[:size])
+        return BookAggregate(rate_sums=self.rate_sums(weights))
+
+
+class CurveBook(LedgerBook):
+    """
+    Assets valued per unit by their `price_curve` (`CurveAsset`, e.g. a `PriceSeries`). The lots of one curve share
+    its price, the book is valued with one lookup per curve: the quantities summed per curve times the prices.
+    The curve of an item takes the place of the rate, `rate_id` is the index of its curve in `rates`.
+    """
+
+    def __init__(self, items=(), capacity: int = 16):
+        self._curve_quantities = None
+        super().__init__(items, capacity)
+
+    def invalidate(self):
+        super().invalidate()
+        self._curve_quantities = None
+
+    def append(self, item: LedgerItem):
+        curve_id = self.rates.setdefault(item.price_curve, len(self.rates))
+        super().append(item)
+        self.rate_id[item.properties.slot] = curve_id
+
+    def curve_quantities(self) -> np.ndarray:
+        """Units held of every curve"""
+        if self._curve_quantities is None:
+            size = self.size
+            self._curve_quantities = np.bincount(self.rate_id[:size], self.quantity[:size], minlength=len(self.rates))
+        return self._curve_quantities
+
+    def get_values(self, n_day):
+        """Vectorized `CurveAsset.get_value`"""
+        size = self.size
+        rate_id = self.rate_id[:size]
+        prices = np.zeros(np.broadcast_shapes(np.shape(n_day), (size,)))
+        for curve, index in self.rates.items():
+            prices = np.where(rate_id == index, curve.values(n_day), prices)
+        return prices * self.quantity[:size]
+
+    def build_aggregate(self, first_day: int) -> BookAggregate:
+        """The prices follow the curves, the aggregate only holds on `first_day`"""
+        return BookAggregate(constant=self.get_value(first_day), valid_after=first_day - 1, valid_until=first_day)
+
+    def get_value(self, n_day: int):
+        if not self._items:
+            return 0
+        quantities = self.curve_quantities()
+        return sum(
+            quantities[index].item() * curve.value_at(n_day) for curve, index in self.rates.items() if quantities[index]
+        )
+
+    def get_value_over_days(self, n_days) -> np.ndarray:
+        n_days = np.asarray(n_days)
+        values = np.zeros(len(n_days))
+        if not self._items:
+            return values
+        quantities = self.curve_quantities()
+        for curve, index in self.rates.items():
+            if quantities[index]:
+                values += quantities[index] * curve.values(n_days)
+        return values
+
+
+PAYOFF_AVALANCHE = 'avalanche'
+PAYOFF_SNOWBALL = 'snowball'
+PAYOFF_ORDERS = (PAYOFF_AVALANCHE, PAYOFF_SNOWBALL)
+
+
+class Loan:
+    """
+    All the borrowing at one rate merged into one balance. The balance is compounded in closed form from `as_of` when
+    the loan is touched, so accruing over any number of days costs one growth factor.
+    """
+
+    __slots__ = ('as_of', 'balance', 'interest_accrued', 'interest_paid', 'percent', 'principal', 'version')
+
+    def __init__(self, percent, as_of: int):
+        self.percent = percent
+        self.as_of = as_of
+        self.balance = 0.0  # cents owed on `as_of`, interest included
+        self.principal = 0.0  # cents borrowed and not paid back yet
+        self.interest_accrued = 0.0
+        self.interest_paid = 0.0
+        # changed on every borrowing and payment, heap entries of an older version are stale
+        self.version = 0
+
+    def balance_on(self, n_day: int):
+        return self.balance * growth_factor(self.percent, n_day - self.as_of, days_in_year=DAYS_YEAR)
+
+    def accrue(self, n_day: int):
+        if n_day == self.as_of:
+            return
+        balance = self.balance_on(n_day)
+        self.interest_accrued += balance - self.balance
+        self.balance = balance
+        self.as_of = n_day
+
+    def __repr__(self):
+        return f'Loan({self.percent}%, balance={self.balance:.2f} on day {self.as_of})'
+
+
+class LoanBook:
+    """
+    Debt kept as one `Loan` per rate instead of one item per shortfall, paid back in the payoff order:
+    `avalanche` pays the highest rate first, `snowball` the smallest balance first. The loans are ordered by a heap
+    with lazy deletion, a payment costs O(log n) in the number of loans. Snowball balances are compared as of the last
+    change of each loan.
+
+    Valued like the other ledger books (`get_value`, `get_value_over_days`, `total_quantity` is the principal owed),
+    interest accrued and paid is kept in `interest_paid` and `interest_accrued`. `create_run_summary` reports the
+    `interest_paid` of the `loans` book (0 without one).
+    """
+
+    def __init__(self, order: str = PAYOFF_AVALANCHE):
+        if order not in PAYOFF_ORDERS:
+            raise ValueError(f'Unknown payoff order: {order}, expected one of {", ".join(PAYOFF_ORDERS)}')
+        self.order = order
+        self.loans = {}  # percent -> Loan
+        self.interest_paid = 0.0
+        self.principal_paid = 0.0
+        # interest accrued on the loans paid off already
+        self._closed_interest = 0.0
+        self._heap = []
+        self._sequence = 0
+        # (day, value) of the last `get_value`, a run values the book several times a day between changes
+        self._value = None
+
+    def _priority(self, loan: Loan):
+        return -loan.percent if self.order == PAYOFF_AVALANCHE else loan.balance
+
+    def _push(self, loan: Loan):
+        self._value = None
+        loan.version += 1
+        self._sequence += 1
+        heapq.heappush(self._heap, (self._priority(loan), self._sequence, loan.version, loan.percent))
+
+    def _first(self) -> Loan | None:
+        heap = self._heap
+        while heap:
+            _, _, version, percent = heap[0]
+            loan = self.loans.get(percent)
+            if loan is not None and loan.version == version:
+                return loan
+            heapq.heappop(heap)
+        return None
+
+    def set_order(self, order: str):
+        """Changes the payoff order, the heap is rebuilt once"""
+        if order == self.order:
+            return
+        if order not in PAYOFF_ORDERS:
+            raise ValueError(f'Unknown payoff order: {order}, expected one of {", ".join(PAYOFF_ORDERS)}')
+        self.order = order
+        self._heap = []
+        for loan in self.loans.values():
+            self._push(loan)
+
+    def borrow(self, amount, percent, n_day: int) -> Loan:
+        """Adds `amount` cents at `percent` a year, merged into the loan of the same rate"""
+        loan = self.loans.get(percent)
+        if loan is None:
+            loan = self.loans[percent] = Loan(percent, n_day)
+        loan.accrue(n_day)
+        loan.balance += amount
+        loan.principal += amount
+        self._push(loan)
+        return loan
+
+    def pay(self, budget, n_day: int, order: str | None = None):
+        """
+        Pays up to `budget` cents on `n_day`, interest of a loan before its principal
+
+        :param order: payoff order of this payment, the order of the book by default
+        :return: cents paid
+        """
+        if order is not None:
+            self.set_order(order)
+        paid = 0
+        while budget > 0:
+            loan = self._first()
+            if loan is None:
+                break
+            loan.accrue(n_day)
+            payment = min(budget, loan.balance)
+            unpaid_interest = loan.interest_accrued - loan.interest_paid
+            to_interest = min(payment, max(unpaid_interest, 0))
+            loan.interest_paid += to_interest
+            self.interest_paid += to_interest
+            self.principal_paid += payment - to_interest
+            paid += payment
+            budget -= payment
+            if payment == loan.balance:
+                self._closed_interest += loan.interest_accrued
+                self._value = None
+                del self.loans[loan.percent]
+                heapq.heappop(self._heap)
+                continue
+            loan.balance -= payment
+            loan.principal -= payment - to_interest
+            self._push(loan)
+        return paid
+
+    def interest_accrued(self, n_day: int | None = None):
+        """Interest accrued over the life of the book, up to `n_day` when given (without accruing the loans)"""
+        total = self._closed_interest
+        for loan in self.loans.values():
+            total += loan.interest_accrued
+            if n_day is not None:
+                total += loan.balance_on(n_day) - loan.balance
+        return total
+
+    def total_quantity(self):
+        return sum(loan.principal for loan in self.loans.values())
+
+    def get_value(self, n_day: int):
+        cached = self._value
+        if cached is not None and cached[0] == n_day:
+            return cached[1]
+        value = -sum(loan.balance_on(n_day) for loan in self.loans.values())
+        self._value = (n_day, value)
+        return value
+
+    def get_value_over_days(self, n_days) -> np.ndarray:
+        n_days = np.asarray(n_days)
+        total = np.zeros(len(n_days))
+        for loan in self.loans.values():
+            total -= loan.balance * growth_factors(loan.percent, n_days - loan.as_of, days_in_year=DAYS_YEAR)
+        return total
+
+    def __iter__(self):
+        return iter(list(self.loans.values()))
+
+    def __len__(self):
+        return len(self.loans)
+
+    def __repr__(self):
+        return f'LoanBook({self.order}, {list(self.loans.values())})'
+
+
+DEFAULT_BOOK_TYPES = {
+    'cash': CashBook,
+    'bonds': BondBook,
+    'debt': DebtBook,
+    'loans': LoanBook,
+}
+
+
+class LedgerBooks(defaultdict):
+    """
+    `ledger_items` mapping creating a ledger book for the categories that have one and a plain list for the rest.
+    Categories are still created on first access, so the order of categories is the same as with `defaultdict(list)`.
+
+    :param capacities: category -> number of items the book is preallocated for, avoids growing the arrays (ignored
+        for the books without item arrays, e.g. `LoanBook`)
+    """
+
+    def __init__(self, book_types=None, items=(), capacities=None):
+        super().__init__(list, items)
+        self.book_types = DEFAULT_BOOK_TYPES if book_types is None else book_types
+        self.capacities = capacities or {}
+
+    def __missing__(self, key):
+        book_type = self.book_types.get(key)
+        if book_type is None:
+            value = self[key] = []
+        elif key in self.capacities and issubclass(book_type, LedgerBook):
+            value = self[key] = book_type(capacity=max(self.capacities[key], 1))
+        else:
+            value = self[key] = book_type()
+        return value
+
+    def __reduce__(self):
+        return type(self), (self.book_types, (), self.capacities), None, None, iter(self.items())
+
+    def copy(self):
+        return type(self)(self.book_types, self, self.capacities)
+
+    __copy__ = copy
+
+
+BOOK_CLASSES = (LedgerBook, LoanBook)
+
+
+def get_items_value(items, n_day: int):
+    if isinstance(items, BOOK_CLASSES):
+        return items.get_value(n_day)
+    return sum(item.get_value(n_day) for item in items)
+
+
+def get_items_value_over_days(items, n_days) -> np.ndarray:
+    if isinstance(items, BOOK_CLASSES):
+        return items.get_value_over_days(n_days)
+    return np.array([sum(item.get_value(n_day) for item in items) for n_day in n_days], dtype=np.float64)
+
+
+def get_items_quantity(items):
+    if isinstance(items, BOOK_CLASSES):
+        return items.total_quantity()
+    return sum(item.properties.quantity for item in items)
@@ -0,0 +1,204 @@
+"""
+Daily price series replayed from local CSV files, e.g. the historical closes of an ETF or a synthetic index.
+
+A CSV is converted once into a binary array of one float64 price per calendar day (`.npy`, days without a row, like
+weekends, keep the last price, several rows of a day, like ticks, keep the last one) stored in the price cache
+directory next to a small JSON header with the first day. Runs open the array memory-mapped: the lookup of a day is an
+index into the mapping, the pages are shared by every process using the series and only the days a run reads are
+loaded. The converted file is named after the path, size and modification time of the CSV, so an edited CSV is
+converted again.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from SimCFA.timeseries import Curve, to_day_number, to_day_numbers
+
+PRICE_SERIES_FORMAT_VERSION = 1
+PRICE_CACHE_ENV = 'SIMCFA_PRICE_CACHE'
+DEFAULT_DATE_COLUMN = 'date'
+DEFAULT_PRICE_COLUMN = 'close'
+
+# series opened in this process, by fingerprint and cache directory, share one mapping
+_opened = {}
+
+
+def default_price_cache_dir() -> str | None:
+    """Directory of the converted series, `SIMCFA_PRICE_CACHE` env variable (empty disables it) or the user cache"""
+    if PRICE_CACHE_ENV in os.environ:
+        return os.environ[PRICE_CACHE_ENV] or None
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'simcfa', 'prices')
+
+
+def csv_fingerprint(csv_path, date_column: str = DEFAULT_DATE_COLUMN, price_column: str = DEFAULT_PRICE_COLUMN) -> str:
+    """Hash of the location, size and modification time of the CSV and of the columns read from it"""
+    path = os.path.abspath(os.fspath(csv_path))
+    stat = os.stat(path)
+    header = f'{PRICE_SERIES_FORMAT_VERSION}:{path}:{stat.st_size}:{stat.st_mtime_ns}:{date_column}:{price_column}'
+    return hashlib.sha256(header.encode()).hexdigest()
+
+
+def read_daily_prices(csv_path, date_column: str = DEFAULT_DATE_COLUMN, price_column: str = DEFAULT_PRICE_COLUMN):
+    """
+    Parses the CSV into one price per calendar day from its first to its last date
+
+    :return: (day number of the first price, float64 array of the prices)
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(csv_path, usecols=[date_column, price_column])
+    try:
+        days = pd.to_datetime(frame[date_column])
+    except ValueError:
+        # the format is inferred from the first row, e.g. dates mixed with the timestamps of intraday ticks
+        days = pd.to_datetime(frame[date_column], format='mixed')
+    days = days.dt.normalize()
+    prices = pd.to_numeric(frame[price_column], errors='coerce')
+    daily = prices.groupby(days.to_numpy()).last().dropna()
+    if daily.empty:
+        raise ValueError(f'{csv_path}: no prices in column {price_column!r}')
+    day_numbers = to_day_numbers(daily.index.to_numpy())
+    first_day = day_numbers[0].item()
+    # index of the latest price on or before every calendar day
+    latest = np.searchsorted(day_numbers, np.arange(first_day, day_numbers[-1] + 1), side='right') - 1
+    return first_day, daily.to_numpy(dtype=np.float64)[latest]
+
+
+def convert_csv(csv_path, directory, key: str, date_column=DEFAULT_DATE_COLUMN, price_column=DEFAULT_PRICE_COLUMN):
+    """Writes the daily prices of the CSV as `{key}.npy` and its header as `{key}.json` into `directory`"""
+    first_day, prices = read_daily_prices(csv_path, date_column, price_column)
+    os.makedirs(directory, exist_ok=True)
+    # the array first and the header last, a header is only found next to a complete array
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False) as file:
+        np.save(file, prices)
+    os.replace(file.name, os.path.join(directory, f'{key}.npy'))
+    header = {'first_day': first_day, 'days': len(prices), 'source': os.path.abspath(os.fspath(csv_path))}
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as file:
+        json.dump(header, file)
+    os.replace(file.name, os.path.join(directory, f'{key}.json'))
+
+
+def _load(csv_path, date_column: str, price_column: str, cache_dir) -> tuple:
+    key = csv_fingerprint(csv_path, date_column, price_column)
+    opened = _opened.get((key, cache_dir))
+    if opened is not None:
+        return opened
+    if cache_dir is None:
+        loaded = read_daily_prices(csv_path, date_column, price_column)
+    else:
+        header_path = os.path.join(cache_dir, f'{key}.json')
+        if not os.path.exists(header_path):
+            convert_csv(csv_path, cache_dir, key, date_column, price_column)
+        with open(header_path) as file:
+            header = json.load(file)
+        loaded = header['first_day'], np.load(os.path.join(cache_dir, f'{key}.npy'), mmap_mode='r')
+    _opened[(key, cache_dir)] = loaded
+    return loaded
+
+
+def open_price_series(
+    csv_path,
+    date_column: str = DEFAULT_DATE_COLUMN,
+    price_column: str = DEFAULT_PRICE_COLUMN,
+    scale: float = 1,
+    cache_dir='default',
+) -> 'PriceSeries':
+    """
+    Series of the CSV, converted on first use (see the module docstring)
+
+    :param scale: factor applied to the prices of the CSV, e.g. 100 for prices in currency units to cents
+    :param cache_dir: directory of the converted series, `default` for `default_price_cache_dir`, None reads the CSV
+        into memory without converting it
+    """
+    if cache_dir == 'default':
+        cache_dir = default_price_cache_dir()
+    source = (os.path.abspath(os.fspath(csv_path)), date_column, price_column, cache_dir)
+    first_day, prices = _load(*source)
+    return PriceSeries(prices, first_day, scale, source)
+
+
+class PriceSeries(Curve):
+    """
+    Curve of one price per day, constant before the first and after the last day of the data.
+
+    :param prices: price of every day from `first_day` on, usually a read only memory-mapped array
+    :param first_day: position of `prices[0]` on the time axis (see `SimCFA.timeseries`)
+    :param scale: factor applied to every price
+    :param source: (CSV path, date column, price column, cache directory) the series is opened again from when
+        unpickled, so a pickled series does not carry the prices
+    :param shift: days `first_day` was moved by `shifted`, kept to move the data of the source opened again
+    """
+
+    def __init__(self, prices: np.ndarray, first_day: int, scale: float = 1, source: tuple | None = None, shift=0):
+        self.prices = prices
+        self.first_day = first_day
+        self.last_index = len(prices) - 1
+        self.scale = scale
+        self.source = source
+        self.shift = shift
+
+    def value_at(self, day):
+        index = (day if type(day) is int else to_day_number(day)) - self.first_day
+        if index < 0:
+            index = 0
+        elif index > self.last_index:
+            index = self.last_index
+        return self.prices[index].item() * self.scale
+
+    def values(self, days) -> np.ndarray:
+        indexes = np.clip(to_day_numbers(days) - self.first_day, 0, self.last_index)
+        return self.prices[indexes] * self.scale
+
+    def shifted(self, origin) -> 'PriceSeries':
+        offset = to_day_number(origin)
+        return PriceSeries(self.prices, self.first_day - offset, self.scale, self.source, self.shift + offset)
+
+    def scaled(self, factor: float) -> 'PriceSeries':
+        """Same series with every price multiplied by `factor`, e.g. to normalize an index to a price"""
+        return PriceSeries(self.prices, self.first_day, self.scale * factor, self.source, self.shift)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.source is not None:
+            del state['prices'], state['first_day'], state['last_index']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'prices' not in state:
+            first_day, self.prices = _load(*self.source)
+            self.first_day = first_day - self.shift
+            self.last_index = len(self.prices) - 1
+
+    def __deepcopy__(self, memo):
+        # read only, the forks of a simulation share the series
+        return self
+
+    def __repr__(self):
+        source = '' if self.source is None else f', {self.source[0]}'
+        return f'PriceSeries({len(self.prices)} days{source})'
+
+
+def series_fingerprints(config: dict) -> list:
+    """Fingerprints of the CSVs read by the `series` assets of a config, part of the cached plan and run keys"""
+    fingerprints = []
+    for asset in config.get('assets') or []:
+        calc = asset.get('value_calc_method') if isinstance(asset, dict) else None
+        if not isinstance(calc, dict) or calc.get('method') != 'series' or 'path' not in calc:
+            continue
+        try:
+            fingerprint = csv_fingerprint(
+                calc['path'],
+                calc.get('date_column', DEFAULT_DATE_COLUMN),
+                calc.get('price_column', DEFAULT_PRICE_COLUMN),
+            )
+        except OSError:
+            # reported by the compiler with the path of the asset
+            fingerprint = None
+        fingerprints.append(fingerprint)
+    return fingerprints
@@ -0,0 +1,167 @@
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+
+from SimCFA.event_types import event_name
+
+# factories wrapping another listener, the profiler names the listener after the wrapped one
+GUARD_PREFIXES = ('add_',)
+
+
+def listener_name(fn) -> str:
+    """
+    Readable name of a listener: the `create_*` factory it was made by (`create_cash_income`), followed by the name of
+    the closure when it is not the usual `inner` (`create_simulation_state_recorder.record_state`).
+    Guards and `apply_kwarg` wrappers are looked through.
+    """
+    while True:
+        qualname = getattr(fn, '__qualname__', None)
+        if qualname is None:
+            return repr(fn)
+        factory, _, closure = qualname.partition('.<locals>.')
+        wrapped = getattr(fn, '__wrapped__', None)
+        if wrapped is not None and factory.startswith(GUARD_PREFIXES):
+            fn = wrapped
+            continue
+        if not closure:
+            return factory
+        closure = closure.replace('.<locals>', '')
+        return factory if closure == 'inner' else f'{factory}.{closure}'
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    total: float = 0.0  # seconds, including the listeners of the events posted from within
+    max: float = 0.0
+    allocated: int = 0  # net bytes allocated, only with `trace_memory`
+
+    def add(self, elapsed: float, allocated: int):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.allocated += allocated
+
+
+class _Frame:
+    __slots__ = ('children', 'memory', 'path', 'start')
+
+    def __init__(self, path: tuple, memory: int):
+        self.path = path
+        self.children = 0.0
+        self.memory = memory
+        self.start = perf_counter()
+
+
+class EventProfiler:
+    """
+    Instrumentation of `Events`: call count, cumulative and max wall time per event type and per listener, events
+    posted per simulated day and optionally the memory allocated (tracemalloc).
+
+    Installed with `Events.enable_profiling` (or `Simulation.enable_profiling`) which wraps the listeners and
+    `post_event` of that instance only, nothing is measured and nothing is wrapped while profiling is disabled.
+
+    :param trace_memory: also record net allocations with `tracemalloc`, slows the run down considerably
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.events = defaultdict(CallStats)
+        self.listeners = defaultdict(CallStats)
+        self.events_per_day = defaultdict(int)
+        self.folded = defaultdict(float)
+        self._stack = []
+        # events posted before the first day (`simulation_started`) are counted under day -1
+        self._day = -1
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _memory(self) -> int:
+        return tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+
+    def _enter(self, name: str) -> _Frame:
+        parent_path = self._stack[-1].path if self._stack else ()
+        frame = _Frame((*parent_path, name), self._memory())
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame: _Frame, stats: CallStats):
+        elapsed = perf_counter() - frame.start
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1].children += elapsed
+        self.folded[frame.path] += elapsed - frame.children
+        stats.add(elapsed, self._memory() - frame.memory if self.trace_memory else 0)
+
+    def wrap_post_event(self, post_event):
+        def profiled_post_event(event_type, data):
+            event_type = event_name(event_type)
+            if isinstance(data, Mapping) and 'n_day' in data:
+                self._day = data['n_day']
+            self.events_per_day[self._day] += 1
+            frame = self._enter(event_type)
+            try:
+                return post_event(event_type, data)
+            finally:
+                self._exit(frame, self.events[event_type])
+
+        return profiled_post_event
+
+    def wrap_listener(self, event_type: str, fn):
+        name = listener_name(fn)
+        stats = self.listeners[(event_type, name)]
+
+        @wraps(fn)
+        def profiled_listener(data):
+            frame = self._enter(name)
+            try:
+                return fn(data)
+            finally:
+                self._exit(frame, stats)
+
+        profiled_listener.profiled = fn
+        return profiled_listener
+
+    def table(self, sort_by: str = 'total') -> list:
+        """One row per (event type, listener), sorted by the `CallStats` field, times in seconds"""
+        rows = [
+            {'event_type': event_type, 'listener': name, **vars(stats)}
+            for (event_type, name), stats in self.listeners.items()
+        ]
+        return sorted(rows, key=lambda row: row[sort_by], reverse=True)
+
+    def format_table(self, sort_by: str = 'total', limit: int | None = 20) -> str:
+        header = f'{"event type":<24} {"listener":<56} {"calls":>9} {"total ms":>10} {"mean us":>9} {"max us":>9}'
+        if self.trace_memory:
+            header += f' {"alloc kB":>9}'
+        lines = [header]
+        for row in self.table(sort_by)[:limit]:
+            mean = row['total'] / row['calls'] * 1e6 if row['calls'] else 0
+            line = (
+                f'{row["event_type"]:<24} {row["listener"]:<56} {row["calls"]:>9} {row["total"] * 1e3:>10.2f} '
+                f'{mean:>9.1f} {row["max"] * 1e6:>9.1f}'
+            )
+            if self.trace_memory:
+                line += f' {row["allocated"] / 1024:>9.1f}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def folded_stacks(self) -> list:
+        """Flamegraph input (`flamegraph.pl`, speedscope): `event;listener;nested event;... self time in us` lines"""
+        return [f'{";".join(path)} {round(seconds * 1e6)}' for path, seconds in self.folded.items() if seconds > 0]
+
+    def write_folded_stacks(self, path):
+        with open(path, 'w') as file:
+            file.write('\n'.join(self.folded_stacks()) + '\n')
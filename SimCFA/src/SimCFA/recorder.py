@@ -0,0 +1,146 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+SAMPLING_DAILY = 'daily'
+SAMPLING_MONTH_END = 'month_end'
+SAMPLING_ON_CHANGE = 'on_change'
+
+
+class StateRecording:
+    """
+    Columnar record of the simulation state: one preallocated NumPy column per recorded quantity, one row per sample.
+    Columns of categories that show up only later in the simulation are zero for the rows recorded before.
+    """
+
+    def __init__(self, capacity: int, curve_names=()):
+        self.capacity = max(capacity, 1)
+        self.size = 0
+        self.n_day = np.zeros(self.capacity, dtype=np.int64)
+        self.day_date = np.zeros(self.capacity, dtype='datetime64[D]')
+        self._columns = {}
+        self._taken_last_values = None
+        self._curves = {name: np.full(self.capacity, np.nan) for name in curve_names}
+
+    @classmethod
+    def from_columns(cls, n_day: np.ndarray, dates: np.ndarray, columns: dict, curves: dict):
+        """Read only recording wrapping existing arrays (e.g. memory mapped ones) without copying them"""
+        recording = cls(0)
+        recording.size = recording.capacity = len(n_day)
+        recording.n_day = n_day
+        recording.day_date = dates
+        recording._columns = dict(columns)
+        recording._curves = dict(curves)
+        return recording
+
+    def _grow(self):
+        self.capacity *= 2
+        self.n_day = np.resize(self.n_day, self.capacity)
+        self.day_date = np.resize(self.day_date, self.capacity)
+        for store in (self._columns, self._curves):
+            for name, column in store.items():
+                grown = np.zeros(self.capacity) if store is self._columns else np.full(self.capacity, np.nan)
+                grown[: self.size] = column[: self.size]
+                store[name] = grown
+
+    def append(self, n_day: int, day_date: date, values: dict, curves: dict):
+        if self.size == self.capacity:
+            self._grow()
+        row = self.size
+        self.n_day[row] = n_day
+        self.day_date[row] = day_date
+        for name, value in values.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = np.zeros(self.capacity)
+            column[row] = value
+        for name, column in self._curves.items():
+            curve = curves.get(name)
+            if curve:
+                column[row] = curve[-1]
+        self.size += 1
+
+    def append_rows(self, n_days: np.ndarray, dates: np.ndarray, values: dict, curves: dict):
+        """Bulk `append`: `values` and `curves` map names to arrays with one entry per row"""
+        count = len(n_days)
+        while self.size + count > self.capacity:
+            self._grow()
+        rows = slice(self.size, self.size + count)
+        self.n_day[rows] = n_days
+        self.day_date[rows] = dates
+        for name, column_values in values.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = np.zeros(self.capacity)
+            column[rows] = column_values
+        for name, column in self._curves.items():
+            if name in curves:
+                column[rows] = curves[name]
+        self.size += count
+
+    def last_values(self) -> dict | None:
+        if not self.size:
+            return self._taken_last_values
+        row = self.size - 1
+        return {name: column[row] for name, column in self._columns.items()}
+
+    def take_rows(self) -> list:
+        """
+        Removes all recorded rows and returns them as one dict per row (`n_day`, `date`, columns and curves),
+        the capacity is kept so a recording drained regularly stays at a constant size
+        """
+        if not self.size:
+            return []
+        self._taken_last_values = self.last_values()
+        named = {'n_day': self.n_day[: self.size], 'date': self.dates} | self.columns | self.curves
+        rows = [dict(zip(named, row)) for row in zip(*(column.tolist() for column in named.values()))]
+        self.size = 0
+        return rows
+
+    @property
+    def columns(self) -> dict:
+        return {name: column[: self.size] for name, column in self._columns.items()}
+
+    @property
+    def curves(self) -> dict:
+        return {name: column[: self.size] for name, column in self._curves.items()}
+
+    @property
+    def dates(self):
+        return self.day_date[: self.size]
+
+    def __len__(self):
+        return self.size
+
+
+def is_month_end(n_day: int, day_date: date, n_days: int) -> bool:
+    return (day_date + timedelta(days=1)).month != day_date.month or n_day == n_days - 1
+
+
+def is_sampled_day(sampling: str, n_day: int, day_date: date, n_days: int) -> bool:
+    """Time based part of the sampling, `on_change` sampling is decided only after the values are known"""
+    if sampling in (SAMPLING_DAILY, SAMPLING_ON_CHANGE):
+        return True
+    if sampling == SAMPLING_MONTH_END:
+        return is_month_end(n_day, day_date, n_days)
+    raise ValueError(f'Unknown sampling: {sampling}')
+
+
+def sampled_days_between(sampling: str, first_day: int, last_day: int, start_date: date, n_days: int) -> list:
+    """Days from `first_day` to `last_day` (inclusive) which `is_sampled_day` would record"""
+    if sampling in (SAMPLING_DAILY, SAMPLING_ON_CHANGE):
+        return list(range(first_day, last_day + 1))
+    if sampling != SAMPLING_MONTH_END:
+        raise ValueError(f'Unknown sampling: {sampling}')
+    days = []
+    day_date = start_date + timedelta(days=first_day)
+    while True:
+        first_of_next_month = date(day_date.year + day_date.month // 12, day_date.month % 12 + 1, 1)
+        n_day = (first_of_next_month - start_date).days - 1
+        if n_day > last_day:
+            break
+        days.append(n_day)
+        day_date = first_of_next_month
+    if last_day == n_days - 1 and (not days or days[-1] != last_day):
+        days.append(last_day)
+    return days
@@ -0,0 +1,232 @@
+"""
+Reporting layer: data frames and plots of the recorded simulation states.
+Imports pandas and matplotlib, so it is only imported when a report is made, batch runs never load it.
+"""
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.ticker import MaxNLocator
+
+from SimCFA.functional import apply
+from SimCFA.monte_carlo import MonteCarloResult
+from SimCFA.recorder import StateRecording
+from SimCFA.simulation_procedures import process_ledger_items_on_sim_step
+
+DECIMATION_MIN_MAX = 'min_max'
+DECIMATION_LTTB = 'lttb'
+# a 10 inch wide figure cannot show more distinct points than this even at the dpi of the PNG exports
+DEFAULT_MAX_POINTS = 2500
+
+
+def _as_numbers(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def min_max_indices(y, n_buckets: int) -> np.ndarray:
+    """
+    Indices keeping the shape of the series: the first and the last point and the minimum and maximum of each of
+    `n_buckets` equal buckets in between, so no spike is lost however much the series is reduced
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets + 2:
+        return np.arange(n)
+    inner = y[1:-1]
+    size = -(-len(inner) // n_buckets)
+    n_buckets = -(-len(inner) // size)
+    nan = np.isnan(inner)
+    lows = np.full(size * n_buckets, np.inf)
+    lows[: len(inner)] = np.where(nan, np.inf, inner)
+    highs = np.full(size * n_buckets, -np.inf)
+    highs[: len(inner)] = np.where(nan, -np.inf, inner)
+    offsets = np.arange(n_buckets) * size + 1
+    mins = offsets + lows.reshape(n_buckets, size).argmin(axis=1)
+    maxs = offsets + highs.reshape(n_buckets, size).argmax(axis=1)
+    return np.unique(np.concatenate(([0], np.minimum(mins, n - 2), np.minimum(maxs, n - 2), [n - 1])))
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: keeps the point of each bucket making the largest triangle with its neighbours"""
+    x = _as_numbers(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        indices[bucket + 1] = previous
+    return indices
+
+
+def decimation_indices(x, y, max_points: int | None, method: str = DECIMATION_MIN_MAX) -> np.ndarray:
+    """Indices of the points of the series to draw, all of them when there are not more than `max_points`"""
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    if method == DECIMATION_MIN_MAX:
+        return min_max_indices(y, max(1, (max_points - 2) // 2))
+    if method == DECIMATION_LTTB:
+        return lttb_indices(x, y, max_points)
+    raise ValueError(f'Unknown decimation: {method}')
+
+
+def decimate(x, y, max_points: int | None = DEFAULT_MAX_POINTS, method: str = DECIMATION_MIN_MAX):
+    """
+    Reduces a long series to about `max_points` points before drawing it, rendering (and PNG export) time then does
+    not grow with the length of the simulation
+
+    :param method: `min_max` keeps the extremes of every bucket (exact envelope, good for step like series),
+        `lttb` keeps the visually most significant point of every bucket (smoother lines, fewer points)
+    :return: decimated x and y arrays
+    """
+    indices = decimation_indices(x, y, max_points, method)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
+
+
+def make_df_from_state_list(simulation_states: list | StateRecording):
+    if isinstance(simulation_states, StateRecording):
+        df = pd.DataFrame(simulation_states.columns)
+        dates = simulation_states.dates
+    else:
+        n_days = list(map(lambda state: state['n_day'], simulation_states))
+        dates = list(map(lambda state: state['day_date'], simulation_states))
+        ledger_items_list = list(map(lambda state: state['ledger_items'], simulation_states))
+        zipped = zip(n_days, ledger_items_list)
+
+        applied_process = apply(process_ledger_items_on_sim_step)
+        results = map(applied_process, zipped)
+        df = pd.DataFrame.from_records(results)
+    value_columns = tuple(col for col in df.columns if 'value' in col)
+    for column in df.columns:
+        if column in value_columns:
+            df[column] /= 100
+    df['cash - count'] /= 100
+    df.fillna(0, inplace=True)
+    df['date'] = dates
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def get_curve_from_state_list(simulation_states: list | StateRecording, curve_name: str):
+    if isinstance(simulation_states, StateRecording):
+        return simulation_states.curves[curve_name]
+    return simulation_states[-1]['curves'][curve_name]
+
+
+def make_percentile_band_plot(result: MonteCarloResult, max_points=DEFAULT_MAX_POINTS, decimation=DECIMATION_MIN_MAX):
+    """
+    Plots the median net worth of the Monte Carlo scenarios with the other percentiles as shaded bands around it,
+    nominal on the upper plot and inflation adjusted below.
+
+    :param result: result of `simulate_monte_carlo`
+    :param max_points: points drawn per band at most, see `decimate`
+    :return:
+    """
+    dates = pd.to_datetime(result.dates)
+    percentiles = result.percentiles
+    n_bands = len(percentiles) // 2
+    titles = {'net_worth': 'Net worth', 'net_worth_real': 'Net worth (inflation adjusted)'}
+
+    fig, axs = plt.subplots(len(titles), sharex=True)
+    for ax, (name, title) in zip(axs, titles.items()):
+        band = result.bands[name] / 100
+        indices = np.unique(
+            np.concatenate([decimation_indices(dates, column, max_points, decimation) for column in band.T])
+        )
+        dates_drawn, band = dates[indices], band[indices]
+        for index in range(n_bands):
+            low, high = percentiles[index], percentiles[-index - 1]
+            alpha = 0.15 + 0.2 * index / max(n_bands, 1)
+            ax.fill_between(
+                dates_drawn, band[:, index], band[:, -index - 1], alpha=alpha, color='tab:blue', label=f'p{low}-p{high}'
+            )
+        if len(percentiles) % 2:
+            ax.plot(dates_drawn, band[:, n_bands], color='tab:blue', label=f'p{percentiles[n_bands]}')
+        ax.set_title(title)
+        ax.yaxis.set_major_locator(MaxNLocator(integer=True, nbins=6 * 2))
+        ax.legend()
+
+    fig.tight_layout(h_pad=0)
+    fig.set_figheight(4 * len(titles))
+    fig.set_figwidth(10)
+    return fig
+
+
+def make_pretty_plot(
+    simulation_states: list | StateRecording | MonteCarloResult,
+    max_points=DEFAULT_MAX_POINTS,
+    decimation=DECIMATION_MIN_MAX,
+):
+    """
+    Makes a pretty plot that will show the value of the ledger items on the main plot
+    and count of each below on smaller scale plots.
+    Current plot aspect ratio is full size for value and 1/n_types for each type of ledger item
+
+    :param simulation_states: list of states saved with `create_simulation_state_save` or the recording made with
+        `create_simulation_state_recorder`, a Monte Carlo result is drawn with `make_percentile_band_plot`
+    :param max_points: points drawn per line at most, longer series are decimated (see `decimate`), None draws all
+    :param decimation: `min_max` or `lttb`
+    :return:
+    """
+    if isinstance(simulation_states, MonteCarloResult):
+        return make_percentile_band_plot(simulation_states, max_points, decimation)
+    df = make_df_from_state_list(simulation_states)
+    inflation_curve = get_curve_from_state_list(simulation_states, 'inflation')
+    value_columns = tuple(col for col in df.columns if 'value' in col)
+    count_columns = tuple(col for col in df.columns if 'count' in col)
+
+    count = len(count_columns)
+    height_ratios = [count] + [count] + ([1] * (count))
+
+    inflation_progress = 2 - pd.Series(inflation_curve)
+    df['inflation_progress'] = inflation_progress
+
+    x = df.loc[:, value_columns].sum(axis=1)
+    df['net_worth'] = x
+    df['net_worth_inflation_adjusted'] = df['net_worth'] * df['inflation_progress']
+
+    extra_plots = 2
+    fig, axs = plt.subplots(count + extra_plots, gridspec_kw={'height_ratios': height_ratios})
+    for column in df.columns:
+        if column == 'date':
+            continue
+        if column in ('net_worth', 'net_worth_inflation_adjusted'):
+            axs[0].plot(*decimate(df['date'], df[column], max_points, decimation), label=column)
+            axs[0].set_title('Net worth')
+            axs[0].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=6 * 2))
+        if column in value_columns:
+            axs[1].plot(*decimate(df['date'], df[column], max_points, decimation), label=column)
+            axs[1].set_title('value of ledger items')
+            axs[1].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=6 * 2))
+        if column in count_columns:
+            indx = count_columns.index(column) + extra_plots
+            axs[indx].plot(*decimate(df['date'], df[column], max_points, decimation), label='_nolegend_')
+            axs[indx].set_title(column)
+            axs[indx].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=3))
+
+    fig.tight_layout(h_pad=0)
+    axs[0].legend()
+    axs[1].legend()
+    CONST_H_MUL = 2
+    height = sum(height_ratios) * CONST_H_MUL
+    fig.set_figheight(height)
+    width = 10
+    fig.set_figwidth(width)
+    return fig
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from SimCFA.recorder import StateRecording
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+INDEX_FILENAME = 'index.sqlite'
+RUNS_DIRNAME = 'runs'
+# column names of a stored recording, everything else is a ledger or curve column
+N_DAY_COLUMN = 'n_day'
+DATE_COLUMN = 'date'
+CURVE_PREFIX = 'curve: '
+
+
+class ResultStore:
+    """
+    Directory of simulation results which can be read without loading them: every run is a set of `.npy` columns
+    (one value per recorded day) opened with `np.memmap`, the parameters of the runs are kept in a SQLite index.
+
+    Appending is safe from many processes at once: the run id is reserved in the index first, the columns are written
+    to the run directory and only then the run is marked complete, readers see complete runs only.
+
+    :param path: directory of the store, created when missing
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        os.makedirs(os.path.join(self.path, RUNS_DIRNAME), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS runs ('
+                'run_id INTEGER PRIMARY KEY AUTOINCREMENT, params TEXT NOT NULL, columns TEXT NOT NULL, '
+                'n_rows INTEGER NOT NULL, complete INTEGER NOT NULL DEFAULT 0)'
+            )
+
+    def _connect(self):
+        connection = sqlite3.connect(os.path.join(self.path, INDEX_FILENAME), timeout=60)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return closing(connection)
+
+    def _run_dir(self, run_id: int) -> str:
+        return os.path.join(self.path, RUNS_DIRNAME, str(run_id))
+
+    def append_run(self, params: dict, columns: dict) -> int:
+        """
+        :param params: JSON serializable parameters of the run, used to find it later
+        :param columns: name -> 1D array, all of the same length
+        :return: id of the stored run
+        """
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'Columns of a run have to be of the same length, got {sorted(lengths)}')
+        n_rows = lengths.pop() if lengths else 0
+
+        with self._connect() as connection, connection:
+            cursor = connection.execute(
+                'INSERT INTO runs (params, columns, n_rows) VALUES (?, ?, ?)',
+                (json.dumps(params, default=str), json.dumps(list(arrays)), n_rows),
+            )
+            run_id = cursor.lastrowid
+        run_dir = self._run_dir(run_id)
+        os.makedirs(run_dir)
+        for position, values in enumerate(arrays.values()):
+            np.save(os.path.join(run_dir, f'{position}.npy'), values)
+        with self._connect() as connection, connection:
+            connection.execute('UPDATE runs SET complete = 1 WHERE run_id = ?', (run_id,))
+        return run_id
+
+    def append_recording(self, params: dict, recording: StateRecording) -> int:
+        """Stores a recording made with `create_simulation_state_recorder`"""
+        columns = {N_DAY_COLUMN: recording.n_day[: len(recording)], DATE_COLUMN: recording.dates}
+        columns |= recording.columns
+        columns |= {f'{CURVE_PREFIX}{name}': curve for name, curve in recording.curves.items()}
+        return self.append_run(params, columns)
+
+    def _rows(self, run_id=None):
+        query = 'SELECT run_id, params, columns, n_rows FROM runs WHERE complete = 1'
+        args = ()
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            args = (run_id,)
+        with self._connect() as connection:
+            rows = connection.execute(query + ' ORDER BY run_id', args).fetchall()
+        if run_id is not None and not rows:
+            raise KeyError(f'No complete run {run_id} in {self.path}')
+        return rows
+
+    def runs(self, **where) -> 'pd.DataFrame':
+        """
+        Index of the complete runs: `run_id`, `n_rows` and one column per parameter.
+
+        :param where: parameter values the runs have to match, e.g. `runs(years=20)`
+        """
+        import pandas as pd
+
+        records = []
+        for run_id, params, _, n_rows in self._rows():
+            params = json.loads(params)
+            if all(params.get(key) == value for key, value in where.items()):
+                records.append({'run_id': run_id, 'n_rows': n_rows} | params)
+        return pd.DataFrame.from_records(records, columns=None if records else ['run_id', 'n_rows'])
+
+    def column_names(self, run_id: int) -> list:
+        ((_, _, columns, _),) = self._rows(run_id)
+        return json.loads(columns)
+
+    def params(self, run_id: int) -> dict:
+        ((_, params, _, _),) = self._rows(run_id)
+        return json.loads(params)
+
+    def column(self, run_id: int, name: str) -> np.ndarray:
+        """One column of one run, memory mapped read only"""
+        position = self.column_names(run_id).index(name)
+        return np.load(os.path.join(self._run_dir(run_id), f'{position}.npy'), mmap_mode='r')
+
+    def run(self, run_id: int) -> dict:
+        """All the columns of the run, memory mapped read only"""
+        run_dir = self._run_dir(run_id)
+        return {
+            name: np.load(os.path.join(run_dir, f'{position}.npy'), mmap_mode='r')
+            for position, name in enumerate(self.column_names(run_id))
+        }
+
+    def recording(self, run_id: int) -> StateRecording:
+        """Run stored with `append_recording`, accepted by `make_df_from_state_list`/`make_pretty_plot`"""
+        columns = self.run(run_id)
+        n_day = columns.pop(N_DAY_COLUMN)
+        dates = columns.pop(DATE_COLUMN)
+        curves = {
+            name.removeprefix(CURVE_PREFIX): columns.pop(name)
+            for name in list(columns)
+            if name.startswith(CURVE_PREFIX)
+        }
+        return StateRecording.from_columns(n_day, dates, columns, curves)
+
+    def column_across_runs(self, name: str, run_ids=None) -> np.ndarray:
+        """
+        The column of many runs (all by default) stacked into (n_runs, n_rows), only this column is read.
+        Shorter runs are padded with NaN at the end, runs without the column (e.g. a category the run never had items
+        of) are a row of NaN.
+        """
+        # one index query for all the runs
+        column_names = {run_id: json.loads(names) for run_id, _, names, _ in self._rows()}
+        if run_ids is None:
+            run_ids = list(column_names)
+        missing = [run_id for run_id in run_ids if run_id not in column_names]
+        if missing:
+            raise KeyError(f'No complete runs {missing} in {self.path}')
+        if run_ids and not any(name in column_names[run_id] for run_id in run_ids):
+            raise KeyError(f'None of the runs has a column {name!r}')
+        columns = [
+            np.load(os.path.join(self._run_dir(run_id), f'{column_names[run_id].index(name)}.npy'), mmap_mode='r')
+            if name in column_names[run_id]
+            else np.zeros(0)
+            for run_id in run_ids
+        ]
+        n_rows = max((len(column) for column in columns), default=0)
+        result = np.full((len(columns), n_rows), np.nan)
+        for row, column in enumerate(columns):
+            result[row, : len(column)] = column
+        return result
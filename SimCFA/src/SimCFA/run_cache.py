@@ -0,0 +1,208 @@
+"""
+On disk cache of finished runs: the recorded states (the columns of `create_simulation_state_recorder`) and the run
+summary of a config are stored in one `.npz` file named after the run key. The key hashes the config (key order and
+formatting do not matter, reporting options are left out) together with the SimCFA version, so an upgrade never
+returns results of older code. The directory is kept under `max_bytes`, the least recently used runs are removed first.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date
+from functools import cache
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+
+from SimCFA.price_series import series_fingerprints
+from SimCFA.recorder import SAMPLING_DAILY, StateRecording
+from SimCFA.result_store import CURVE_PREFIX, DATE_COLUMN, N_DAY_COLUMN
+
+RUN_CACHE_FORMAT_VERSION = 1
+RUN_CACHE_ENV = 'SIMCFA_RUN_CACHE'
+DEFAULT_MAX_BYTES = 512 * 2**20
+# top level config keys which only change how a run is reported, runs differing in them share a cache entry
+REPORTING_KEYS = ('reporting', 'plot')
+SUMMARY_ENTRY = '__summary__'
+# run summary values stored as ISO strings, turned back into dates when read
+SUMMARY_DATE_KEYS = ('first_negative_cash_date',)
+
+
+@cache
+def code_version() -> str:
+    """
+    Version of the installed SimCFA, for a source checkout (no package metadata) a hash of the source files so that
+    edits of the code invalidate the cached runs
+    """
+    try:
+        return metadata.version('simcfa')
+    except metadata.PackageNotFoundError:
+        pass
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return f'source-{digest.hexdigest()[:16]}'
+
+
+def normalize_config(config: dict) -> dict:
+    """Config without the `REPORTING_KEYS`"""
+    return {key: value for key, value in config.items() if key not in REPORTING_KEYS}
+
+
+def run_key(config: dict, sampling: str = SAMPLING_DAILY, variant: str = '') -> str:
+    """
+    :param sampling: sampling of the recorded states, see `create_simulation_state_recorder`
+    :param variant: anything else changing the result of the run, e.g. the name of a transform applied to the
+        simulation before it runs
+    """
+    canonical = json.dumps(normalize_config(config), sort_keys=True, separators=(',', ':'), default=str)
+    # an edited price series CSV changes the result without changing the config
+    fingerprints = ','.join(map(str, series_fingerprints(config)))
+    header = f'{RUN_CACHE_FORMAT_VERSION}:{code_version()}:{sampling}:{variant}:{fingerprints}'
+    return hashlib.sha256(f'{header}:{canonical}'.encode()).hexdigest()
+
+
+def default_run_cache_dir() -> str | None:
+    """Directory of the cached runs, `SIMCFA_RUN_CACHE` env variable (empty disables it) or the user cache directory"""
+    if RUN_CACHE_ENV in os.environ:
+        return os.environ[RUN_CACHE_ENV] or None
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'simcfa', 'runs')
+
+
+class CachedRun:
+    """
+    Result of a run as kept in the cache.
+
+    :param recording: recorded states, accepted by `make_df_from_state_list`/`make_pretty_plot`
+    :param summary: run summary, see `create_run_summary`
+    :param cached: whether the result was read from the cache instead of simulated
+    """
+
+    def __init__(self, key: str, recording: StateRecording, summary: dict, cached: bool = False):
+        self.key = key
+        self.recording = recording
+        self.summary = summary
+        self.cached = cached
+
+    def __repr__(self):
+        return f'CachedRun(key={self.key[:12]}, rows={len(self.recording)}, cached={self.cached})'
+
+
+class RunCache:
+    """
+    Directory of finished runs, see the module docstring. Safe to share between processes: entries are written to a
+    temporary file and renamed, a reader never sees a partial entry.
+
+    :param path: directory of the cache, created when missing
+    :param max_bytes: size the directory is trimmed to after every write
+    """
+
+    def __init__(self, path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.npz')
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def get(self, key: str) -> CachedRun | None:
+        path = self._entry_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                columns = {name: entry[name] for name in entry.files}
+            # the modification time is the last use of the entry, see `trim`
+            os.utime(path)
+        except (OSError, ValueError):
+            # missing, evicted meanwhile or a corrupted file, the run is simulated again
+            return None
+        summary = json.loads(str(columns.pop(SUMMARY_ENTRY)))
+        for name in SUMMARY_DATE_KEYS:
+            if summary.get(name) is not None:
+                summary[name] = date.fromisoformat(summary[name])
+        n_day = columns.pop(N_DAY_COLUMN)
+        dates = columns.pop(DATE_COLUMN)
+        curves = {
+            name.removeprefix(CURVE_PREFIX): columns.pop(name)
+            for name in list(columns)
+            if name.startswith(CURVE_PREFIX)
+        }
+        return CachedRun(key, StateRecording.from_columns(n_day, dates, columns, curves), summary, cached=True)
+
+    def put(self, key: str, recording: StateRecording, summary: dict) -> CachedRun:
+        columns = {N_DAY_COLUMN: recording.n_day[: len(recording)], DATE_COLUMN: recording.dates}
+        columns |= recording.columns
+        columns |= {f'{CURVE_PREFIX}{name}': curve for name, curve in recording.curves.items()}
+        columns[SUMMARY_ENTRY] = np.array(json.dumps(summary, default=str))
+        try:
+            with tempfile.NamedTemporaryFile('wb', dir=self.path, suffix='.tmp', delete=False) as file:
+                np.savez(file, **columns)
+            os.replace(file.name, self._entry_path(key))
+        except OSError:
+            # the cache is an optimisation only, e.g. a full disk
+            pass
+        else:
+            self.trim()
+        return CachedRun(key, recording, summary)
+
+    def invalidate(self, key: str) -> bool:
+        """Removes one entry, returns whether there was one"""
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def clear(self):
+        for entry in self._entries():
+            self.invalidate(entry.name.removesuffix('.npz'))
+
+    def _entries(self) -> list:
+        with os.scandir(self.path) as entries:
+            return [entry for entry in entries if entry.name.endswith('.npz')]
+
+    def size(self) -> int:
+        """Bytes taken by the entries"""
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def trim(self):
+        """Removes the least recently used entries until the directory fits into `max_bytes`"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def open_run_cache(run_cache='default') -> RunCache | None:
+    """
+    :param run_cache: a `RunCache`, a directory, `default` for `default_run_cache_dir` or None for no caching
+    """
+    if run_cache == 'default':
+        run_cache = default_run_cache_dir()
+    if run_cache is None or isinstance(run_cache, RunCache):
+        return run_cache
+    return RunCache(run_cache)
@@ -0,0 +1,181 @@
+import heapq
+from datetime import date, timedelta
+
+
+class EveryDay:
+    def next_date(self, day_date: date) -> date | None:
+        return day_date
+
+
+class OnDate:
+    def __init__(self, date_trigger: date):
+        self.date_trigger = date_trigger
+
+    def next_date(self, day_date: date) -> date | None:
+        if day_date > self.date_trigger:
+            return None
+        return self.date_trigger
+
+
+class DateRange:
+    def __init__(self, start_date: date | None = None, end_date: date | None = None):
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def next_date(self, day_date: date) -> date | None:
+        if self.start_date is not None and day_date < self.start_date:
+            day_date = self.start_date
+        if self.end_date is not None and day_date > self.end_date:
+            return None
+        return day_date
+
+
+class MonthDay:
+    def __init__(self, day_trigger: int):
+        self.day_trigger = day_trigger
+
+    def next_date(self, day_date: date) -> date | None:
+        if not 1 <= self.day_trigger <= 31:
+            return None
+        year, month = day_date.year, day_date.month
+        if day_date.day > self.day_trigger:
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        while True:
+            try:
+                return date(year, month, self.day_trigger)
+            except ValueError:
+                # month too short for the trigger day (e.g. 31st of April), the guard never passes in it
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class AllOf:
+    def __init__(self, *rules):
+        self.rules = rules
+
+    def next_date(self, day_date: date) -> date | None:
+        # leapfrog: every rule moves the candidate forward until all of them agree on the same date
+        candidate = day_date
+        while True:
+            settled = True
+            for rule in self.rules:
+                found = rule.next_date(candidate)
+                if found is None:
+                    return None
+                if found != candidate:
+                    candidate = found
+                    settled = False
+            if settled:
+                return candidate
+
+
+def combine_schedules(fn, rule):
+    """Returns the rule restricted further by the schedule already attached to `fn` (if any)"""
+    existing = getattr(fn, 'schedule', None)
+    if existing is None:
+        return rule
+    return AllOf(existing, rule)
+
+
+class Scheduler:
+    """
+    Calendar index of listeners of a single day-based event (like `day_started`).
+
+    Listeners without a `schedule` attribute are called every day. Listeners with one are kept in a priority queue
+    keyed by the next simulation day their schedule allows and are only called on that day. All listeners due on a day
+    are called in the order they subscribed in, exactly as a plain `Events` list would call them.
+    The schedule only prunes days: the guards wrapped around the listener still run on the days it is called.
+    """
+
+    def __init__(self, start_date: date):
+        self.start_date = start_date
+        self.always = []
+        self.queue = []
+        self.today = []
+        self.cursor = 0
+        self.dispatching = False
+        self._order = 0
+
+    def convert_date_to_int(self, day_date: date) -> int:
+        return (day_date - self.start_date).days
+
+    def next_day(self, rule, n_day: int) -> int | None:
+        day_date = self.start_date + timedelta(days=max(n_day, 0))
+        found = rule.next_date(day_date)
+        if found is None:
+            return None
+        return self.convert_date_to_int(found)
+
+    def add(self, fn, rule=None):
+        order = self._order
+        self._order += 1
+        if rule is None:
+            self.always.append((order, fn))
+            return
+        self._push(self.cursor, order, fn, rule)
+
+    def _push(self, n_day, order, fn, rule):
+        due_on = self.next_day(rule, n_day)
+        if due_on is None:
+            return
+        if self.dispatching and due_on == self.cursor:
+            heapq.heappush(self.today, (order, fn, rule))
+            return
+        heapq.heappush(self.queue, (due_on, order, fn, rule))
+
+    def subscriptions(self):
+        """All the listeners held by the scheduler, in no particular order"""
+        yield from (fn for _, fn in self.always)
+        yield from (fn for _, _, fn, _ in self.queue)
+        yield from (fn for _, fn, _ in self.today)
+
+    def peek(self) -> int | None:
+        """Returns the first day any scheduled listener is due on or None when the queue is empty"""
+        if not self.queue:
+            return None
+        return self.queue[0][0]
+
+    def due(self, n_day: int, period_last_day: int | None = None):
+        """
+        Yields the listeners due on `n_day` in subscription order, including ones added while iterating
+
+        :param period_last_day: last day of the period simulated at once (see `Simulation` granularity), on the days
+            before it only the scheduled listeners due on the day are yielded, the unscheduled ones run on its last day
+        """
+        self.cursor = n_day
+        self.dispatching = True
+        today = self.today = []
+        while self.queue and self.queue[0][0] <= n_day:
+            due_on, order, fn, rule = heapq.heappop(self.queue)
+            if due_on < n_day:
+                # subscribed after its day was already dispatched, look for the next allowed day
+                self._push(n_day, order, fn, rule)
+                continue
+            heapq.heappush(today, (order, fn, rule))
+
+        always = self.always if period_last_day is None or n_day >= period_last_day else ()
+        index = 0
+        stale = 0
+        try:
+            while True:
+                has_always = index < len(always)
+                if today and (not has_always or today[0][0] < always[index][0]):
+                    order, fn, rule = heapq.heappop(today)
+                    if not getattr(fn, 'active', True):
+                        continue
+                    yield fn
+                    if getattr(fn, 'active', True):
+                        self._push(n_day + 1, order, fn, rule)
+                    continue
+                if not has_always:
+                    break
+                fn = always[index][1]
+                index += 1
+                if not getattr(fn, 'active', True):
+                    stale += 1
+                    continue
+                yield fn
+        finally:
+            self.dispatching = False
+            self.cursor = n_day + 1
+            if stale:
+                self.always = [(order, fn) for order, fn in self.always if getattr(fn, 'active', True)]
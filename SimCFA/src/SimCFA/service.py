@@ -0,0 +1,356 @@
+"""
+Local HTTP/JSON service running simulations of JSON configs (the format of `data/`) on a process pool:
+
+    simcfa-serve --port 8765
+    curl -X POST localhost:8765/simulate --data @data/example_simulation_config01.json
+    curl -X POST 'localhost:8765/simulate?stream=1' --data @data/example_simulation_config01.json
+
+`POST /simulate` answers with the run summary (see `create_run_summary`). With `stream=1` the answer is chunked
+newline delimited JSON: `{"progress": 0.25}` lines while the simulation runs and the result as the last line.
+Identical configs (same `config_hash`) in flight at the same time share one run, finished results are kept in an LRU
+cache. `GET /health` reports the cache and the runs in flight.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+from SimCFA.config_compiler import ConfigError, config_hash, load_compiled_plan
+from SimCFA.configs import build_simulation_from_config
+from SimCFA.simulation_procedures import attach_run_summary
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+# fraction of the simulated days between two progress messages
+DEFAULT_PROGRESS_STEP = 0.05
+MAX_BODY_BYTES = 16 * 2**20
+
+logger = logging.getLogger(__name__)
+
+# queue of (config hash, fraction done) set in every worker process by `_init_worker`
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def create_progress_reporter(key: str, n_days: int, progress_step: float):
+    """`day_ended` listener putting (key, fraction of the days done) to the progress queue every `progress_step`"""
+    next_report = progress_step
+
+    def report_progress(n_day, **kwargs):
+        nonlocal next_report
+        done = (n_day + 1) / n_days
+        if done < next_report or _progress_queue is None:
+            return
+        _progress_queue.put((key, done))
+        while next_report <= done:
+            next_report += progress_step
+
+    def report_skipped_days(last_day, **kwargs):
+        report_progress(last_day)
+
+    report_progress.fill_skipped_days = report_skipped_days
+    return report_progress
+
+
+def run_config_with_progress(key: str, config: dict, progress_step: float = DEFAULT_PROGRESS_STEP) -> dict:
+    """Worker side of the service: runs the config and returns its run summary"""
+    simulation = build_simulation_from_config(config)
+    access_summary = attach_run_summary(simulation)
+    simulation.add_event_listener_applied('day_ended', create_progress_reporter(key, simulation.n_days, progress_step))
+    simulation.simulate()
+    return access_summary()
+
+
+class SimulationJob:
+    """Run of one config shared by all the requests of the same config while it is in flight"""
+
+    def __init__(self, key: str, future: asyncio.Future):
+        self.key = key
+        self.future = future
+        self.progress = 0.0
+        self.requests = 1
+        self._listeners = []
+
+    def listen(self) -> asyncio.Queue:
+        """Queue receiving the progress of the run, None once it finished"""
+        queue = asyncio.Queue()
+        queue.put_nowait(self.progress)
+        self._listeners.append(queue)
+        return queue
+
+    def notify(self, progress):
+        if progress is not None:
+            self.progress = progress
+        for queue in self._listeners:
+            queue.put_nowait(progress)
+
+
+class SimulationService:
+    """
+    Runs simulations of JSON configs on a process pool, coalescing identical requests in flight and caching the
+    results by config hash.
+
+    :param max_workers: size of the process pool, the number of CPUs by default
+    :param cache_size: number of results kept, the least recently used result is dropped first
+    :param progress_step: fraction of the simulated days between two progress updates
+    """
+
+    def __init__(self, max_workers=None, cache_size=DEFAULT_CACHE_SIZE, progress_step=DEFAULT_PROGRESS_STEP):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.progress_step = progress_step
+        self.cache = OrderedDict()
+        self.jobs = {}
+        self.stats = {'requests': 0, 'runs': 0, 'cache_hits': 0, 'coalesced': 0}
+        self._executor = None
+        self._progress_queue = None
+        self._progress_reader = None
+        self._server = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Starts the pool and listens on `host`:`port` (port 0 picks a free one, see `port`)"""
+        loop = asyncio.get_running_loop()
+        # forked workers would inherit the sockets of the open connections and keep them from closing
+        context = multiprocessing.get_context('spawn')
+        self._progress_queue = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            self.max_workers, mp_context=context, initializer=_init_worker, initargs=(self._progress_queue,)
+        )
+        self._progress_reader = loop.run_in_executor(None, self._read_progress, loop)
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            await self._progress_reader
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await self.start(host, port)
+        logger.info('Serving on http://%s:%d', host, self.port)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+    def _read_progress(self, loop):
+        # runs in a thread, the queue is filled by the worker processes
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            loop.call_soon_threadsafe(self._on_progress, *message)
+
+    def _on_progress(self, key: str, progress: float):
+        job = self.jobs.get(key)
+        if job is not None:
+            job.notify(progress)
+
+    def submit(self, config: dict) -> tuple:
+        """
+        Result of the config from the cache or the job running it, a new run is started only when neither exists.
+        Raises `ConfigError` for invalid configs before anything is submitted to the pool.
+
+        :return: (config hash, cached result or None, job or None)
+        """
+        self.stats['requests'] += 1
+        key = config_hash(config)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return key, self.cache[key], None
+        job = self.jobs.get(key)
+        if job is not None:
+            job.requests += 1
+            self.stats['coalesced'] += 1
+            return key, None, job
+
+        load_compiled_plan(config)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, run_config_with_progress, key, config, self.progress_step)
+        job = self.jobs[key] = SimulationJob(key, future)
+        self.stats['runs'] += 1
+        future.add_done_callback(lambda _: self._finish(job))
+        return key, None, job
+
+    def _finish(self, job: SimulationJob):
+        del self.jobs[job.key]
+        if not job.future.cancelled() and job.future.exception() is None:
+            self.cache[job.key] = job.future.result()
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        job.notify(None)
+
+    async def simulate(self, config: dict) -> dict:
+        """Run summary of the config, as returned by `POST /simulate`"""
+        key, result, job = self.submit(config)
+        cached = result is not None
+        if job is not None:
+            result = await asyncio.shield(job.future)
+        return {'config_hash': key, 'cached': cached, 'result': result}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, query, body = await _read_request(reader)
+            await self._route(writer, method, path, query, body)
+        except HttpError as error:
+            await _write_json(writer, error.status, {'error': error.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, writer, method: str, path: str, query: dict, body: bytes):
+        if path == '/health':
+            if method != 'GET':
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'use GET')
+            health = {'status': 'ok', 'cached': len(self.cache), 'in_flight': len(self.jobs), **self.stats}
+            await _write_json(writer, HTTPStatus.OK, health)
+            return
+        if path != '/simulate':
+            raise HttpError(HTTPStatus.NOT_FOUND, f'unknown path {path}')
+        if method != 'POST':
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, 'use POST')
+        try:
+            config = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f'invalid JSON: {error}') from error
+        if not isinstance(config, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'the config has to be a JSON object')
+        try:
+            key, result, job = self.submit(config)
+        except ConfigError as error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(error)) from error
+
+        if query.get('stream', ['0'])[-1] not in ('0', 'false', ''):
+            await self._stream(writer, key, result, job)
+            return
+        try:
+            if job is not None:
+                result = await asyncio.shield(job.future)
+        except Exception as error:  # noqa: BLE001 - any failure of the run is reported to the client
+            await _write_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'config_hash': key, 'error': repr(error)})
+            return
+        await _write_json(writer, HTTPStatus.OK, {'config_hash': key, 'cached': job is None, 'result': result})
+
+    async def _stream(self, writer, key: str, result, job):
+        writer.write(
+            b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n'
+            b'Connection: close\r\n\r\n'
+        )
+        if job is not None:
+            progress = job.listen()
+            while not job.future.done():
+                update = await progress.get()
+                if update is None:
+                    break
+                await _write_chunk(writer, {'progress': update})
+            try:
+                result = job.future.result()
+            except Exception as error:  # noqa: BLE001 - any failure of the run is reported to the client
+                await _write_chunk(writer, {'config_hash': key, 'error': repr(error)})
+                await _end_chunks(writer)
+                return
+        await _write_chunk(writer, {'config_hash': key, 'cached': job is None, 'result': result})
+        await _end_chunks(writer)
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple:
+    request_line = await reader.readline()
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError as error:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'malformed request line') from error
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError as error:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length') from error
+    if length > MAX_BODY_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'body over {MAX_BODY_BYTES} bytes')
+    body = await reader.readexactly(length) if length else b''
+    path, _, query = target.partition('?')
+    return method.upper(), path, parse_qs(query, keep_blank_values=True), body
+
+
+def _to_json(payload) -> bytes:
+    return json.dumps(payload, default=str).encode()
+
+
+async def _write_json(writer: asyncio.StreamWriter, status: HTTPStatus, payload):
+    body = _to_json(payload)
+    writer.write(
+        f'HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1')
+        + body
+    )
+    await writer.drain()
+
+
+async def _write_chunk(writer: asyncio.StreamWriter, payload):
+    line = _to_json(payload) + b'\n'
+    writer.write(f'{len(line):x}\r\n'.encode('latin-1') + line + b'\r\n')
+    await writer.drain()
+
+
+async def _end_chunks(writer: asyncio.StreamWriter):
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve simulations of JSON configs over local HTTP')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help='size of the process pool, CPU count by default')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='number of results cached')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    service = SimulationService(args.workers, args.cache_size)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
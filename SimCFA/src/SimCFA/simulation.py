@@ -2,41 +2,263 @@ from collections import defaultdict
 from datetime import date, timedelta
 from typing import List
 
+from SimCFA.checkpoint import Checkpoint, StateCopier, copy_simulation
+from SimCFA.event_types import DAY_ENDED, DAY_STARTED, SIMULATION_ENDED, SIMULATION_STARTED
 from SimCFA.events import Events
-from SimCFA.functional import apply_kwarg
+from SimCFA.functional import bind_listener, identity
+from SimCFA.ledger_books import LedgerBooks
 from SimCFA.LedgerItem import LedgerItem
+from SimCFA.profiling import EventProfiler
+from SimCFA.recorder import SAMPLING_DAILY
+from SimCFA.scheduler import Scheduler
 
 ledger_items_type = defaultdict[str, List[LedgerItem]]
 
+STEPPING_DAILY = 'daily'
+STEPPING_NEXT_EVENT = 'next_event'
+# events posted for the days skipped in `next_event` stepping, in place of the per day events
+SKIPPED_DAYS_EVENTS = {'day_started': 'skipped_days_started', 'day_ended': 'skipped_days_ended'}
+
+GRANULARITY_DAILY = 'daily'
+GRANULARITY_WEEKLY = 'weekly'
+GRANULARITY_MONTHLY = 'monthly'
+GRANULARITIES = (GRANULARITY_DAILY, GRANULARITY_WEEKLY, GRANULARITY_MONTHLY)
+DAYS_WEEK = 7
+
 
 def convert_int_to_date(n_day: int, start_date) -> date:
+    """Date of the simulation day, `n_day` counts days in every granularity (see `period_last_day`)"""
     return start_date + timedelta(days=n_day)
 
 
+def period_last_day(n_day: int, start_date: date, granularity: str) -> int:
+    """
+    Last day of the period `n_day` belongs to: the day itself for `daily`, weeks are counted from the start of the
+    simulation, months are calendar months (the first and last ones are cut by the start and end of the simulation)
+    """
+    if granularity == GRANULARITY_DAILY:
+        return n_day
+    if granularity == GRANULARITY_WEEKLY:
+        return n_day - n_day % DAYS_WEEK + DAYS_WEEK - 1
+    if granularity == GRANULARITY_MONTHLY:
+        day_date = convert_int_to_date(n_day, start_date)
+        first_of_next_month = date(day_date.year + day_date.month // 12, day_date.month % 12 + 1, 1)
+        return (first_of_next_month - start_date).days - 1
+    raise ValueError(f'Unknown granularity: {granularity}, expected one of {", ".join(GRANULARITIES)}')
+
+
 class Simulation:
-    def __init__(self, n_days=None, start_date=None, end_date=None, **kwargs):
-        self.ledger_items = defaultdict(list)
+    """
+    :param stepping: `daily` posts `day_started`/`day_ended` for every day. `next_event` posts them only on the days
+        a scheduled `day_started` listener is due (and on the last day); the days in between are reported once with
+        `skipped_days_started`/`skipped_days_ended` (data has `first_day` and `last_day`). Listeners which have to
+        observe every day (e.g. recorders) provide a `fill_skipped_days` function attribute, it is subscribed to the
+        skipped days event automatically. Listeners without a schedule are only called on the dispatched days.
+    :param granularity: `weekly` and `monthly` simulate a whole period in one step. The scheduled `day_started`
+        listeners (date guards, monthly moves, ...) still run on the day they are due with its `n_day` and `day_date`,
+        in date order, so purchases, sales and maturities keep their exact days. The unscheduled `day_started`
+        listeners and `day_ended` run once per period, on its last day, with `period_first_day`, `period_start_date`
+        and `period_last_day` added to the data. Days are still counted in days, `stepping` only applies to `daily`
+        granularity.
+
+    A simulation can be paused with `simulate_until` and continued by `simulate`, `checkpoint` and `fork` copy the
+    paused state (ledger, curves, pending scheduled events and the state of the listeners) so several continuations
+    can start from the same day without simulating the days before it again.
+    """
+
+    def __init__(
+        self,
+        n_days=None,
+        start_date=None,
+        end_date=None,
+        stepping=STEPPING_DAILY,
+        granularity=GRANULARITY_DAILY,
+        **kwargs,
+    ):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unknown granularity: {granularity}, expected one of {", ".join(GRANULARITIES)}')
+        self.ledger_items = LedgerBooks()
         self.events = Events()
         self.n_days = n_days
         self.start_date = start_date
         self.end_date = end_date
         self.curves = defaultdict(list)
+        self.stepping = stepping
+        self.granularity = granularity
+        # first day not simulated yet, None until `simulation_started` is posted
+        self.next_day = None
+        if start_date is not None:
+            self.events.attach_scheduler('day_started', Scheduler(start_date))
 
     def simulate(self):
+        """Simulates all the days, a paused or forked simulation continues from the first day not simulated yet"""
         kwargs = vars(self)
-        self.post_event('simulation_started', kwargs)
-        for day in range(self.n_days):
-            kwargs['n_day'] = day
-            kwargs['day_date'] = convert_int_to_date(day, self.start_date)
-            self.post_event('day_started', kwargs)
-            self.post_event('day_ended', kwargs)
-        self.post_event('simulation_ended', kwargs)
+        self._start(kwargs)
+        for _ in self._steps(kwargs, self.n_days):
+            pass
+        self.post_event(SIMULATION_ENDED, kwargs)
+
+    def simulate_until(self, n_day: int):
+        """
+        Simulates the days before `n_day` and pauses, e.g. to take a `checkpoint` on `n_day`. With a coarse
+        `granularity` it pauses at the start of the period `n_day` belongs to.
+        """
+        kwargs = vars(self)
+        self._start(kwargs)
+        for _ in self._steps(kwargs, min(n_day, self.n_days)):
+            pass
+
+    def checkpoint(self, *carried) -> Checkpoint:
+        """
+        Copies the state of the paused simulation, every `Checkpoint.fork` of it continues independently.
+        Listeners are copied together with their closures, objects sharing state with them (like the access function
+        of `create_simulation_state_recorder`) have to be `carried` along to be bound to the copies.
+
+        :param carried: objects to copy along, the forks return their copies after the simulation
+        """
+        copier = StateCopier()
+        return Checkpoint(copier.copy(self), tuple(copier.copy(obj) for obj in carried))
+
+    def fork(self, *carried):
+        """
+        Independent copy of the paused simulation, see `checkpoint`.
+
+        :return: the copy, followed by the copies of the `carried` objects when there are any
+        """
+        return copy_simulation(self, *carried)
+
+    def _start(self, kwargs):
+        # the payloads posted by the listeners (e.g. `cash_state_change`) read the state of the day from it
+        self.events.context = kwargs
+        if self.next_day is None:
+            self.next_day = 0
+            self.post_event(SIMULATION_STARTED, kwargs)
 
-    def add_event_listener_applied(self, event_type, fn):
-        self.events.subscribe(event_type, apply_kwarg(fn))
+    def simulate_iter(self, sampling: str = SAMPLING_DAILY, curve_names=('inflation',)):
+        """
+        Runs the simulation lazily, yielding one record per sampled day as soon as the day is simulated.
+        Records are dicts with `n_day`, `date`, the count and value of each ledger item category, `net_worth` and
+        the chosen curves (see `SimCFA.streaming`). Closing the generator early (e.g. `break` or `stop_when`) stops
+        the simulation, `simulation_ended` is then not posted.
 
-    def add_event_listener_raw(self, event_type, fn):
-        self.events.subscribe(event_type, fn)
+        :param sampling: one of `daily`, `month_end` or `on_change` (from `SimCFA.recorder`)
+        """
+        from SimCFA.streaming import create_record_buffer
+
+        record_day, take_records = create_record_buffer(self.n_days, sampling, curve_names)
+        subscriptions = [
+            self.events.subscribe('day_ended', bind_listener(record_day)),
+            self.events.subscribe(SKIPPED_DAYS_EVENTS['day_ended'], bind_listener(record_day.fill_skipped_days)),
+        ]
+        try:
+            kwargs = vars(self)
+            self._start(kwargs)
+            for _ in self._steps(kwargs, self.n_days):
+                yield from take_records()
+            self.post_event(SIMULATION_ENDED, kwargs)
+        finally:
+            for subscription in subscriptions:
+                subscription.unsubscribe()
+
+    def _steps(self, kwargs, stop_day: int):
+        """
+        Simulates the days from `next_day` up to `stop_day` (excluded) one step at a time, yields after every
+        simulated day or skipped span of days
+        """
+        if self.granularity != GRANULARITY_DAILY:
+            yield from self._simulate_periods(kwargs, stop_day)
+            return
+        if self.stepping == STEPPING_NEXT_EVENT:
+            yield from self._simulate_next_event(kwargs, stop_day)
+            return
+        for day in range(self.next_day, stop_day):
+            self._simulate_day(day, kwargs)
+            self.next_day = day + 1
+            yield day
+
+    def _simulate_day(self, day, kwargs):
+        kwargs['n_day'] = day
+        kwargs['day_date'] = convert_int_to_date(day, self.start_date)
+        self.events.post_event(DAY_STARTED, kwargs)
+        self.events.post_event(DAY_ENDED, kwargs)
+
+    def _simulate_periods(self, kwargs, stop_day: int):
+        # a pause within a period stops before it, periods are never split
+        scheduler = self.events.schedulers.get('day_started')
+        day = self.next_day
+        while day < stop_day:
+            last_day = min(period_last_day(day, self.start_date, self.granularity), self.n_days - 1)
+            if last_day >= stop_day:
+                return
+            kwargs['period_first_day'] = day
+            kwargs['period_start_date'] = convert_int_to_date(day, self.start_date)
+            kwargs['period_last_day'] = last_day
+            # the scheduled listeners due before the last day of the period run on their own day
+            due_on = None if scheduler is None else scheduler.peek()
+            while due_on is not None and due_on < last_day:
+                kwargs['n_day'] = max(due_on, day)
+                kwargs['day_date'] = convert_int_to_date(kwargs['n_day'], self.start_date)
+                self.events.post_event(DAY_STARTED, kwargs)
+                due_on = scheduler.peek()
+            self._simulate_day(last_day, kwargs)
+            day = self.next_day = last_day + 1
+            yield last_day
+
+    def _simulate_next_event(self, kwargs, stop_day: int):
+        scheduler = self.events.schedulers['day_started']
+        last_day = self.n_days - 1
+        day = self.next_day
+        while day < stop_day:
+            due_on = scheduler.peek()
+            if day == 0 or day == last_day or (due_on is not None and due_on <= day):
+                self._simulate_day(day, kwargs)
+                day = self.next_day = day + 1
+                yield day - 1
+                continue
+            # skip up to the next due day or the last day, a pause splits the skipped span
+            skip_to = min(last_day if due_on is None else due_on, last_day, stop_day)
+            skipped = {**kwargs, 'first_day': day, 'last_day': skip_to - 1}
+            for event_type in SKIPPED_DAYS_EVENTS.values():
+                self.post_event(event_type, skipped)
+            day = self.next_day = skip_to
+            yield day - 1
+
+    def _subscribe_skipped_days_fill(self, event_type, fn, wrap):
+        skipped_event_type = SKIPPED_DAYS_EVENTS.get(event_type)
+        fill = getattr(fn, 'fill_skipped_days', None)
+        if skipped_event_type is not None and fill is not None:
+            self.events.subscribe(skipped_event_type, wrap(fill))
+
+    def add_event_listener_applied(self, event_type, fn, **subscribe_kwargs):
+        """
+        Subscribes a keyword style listener, called with the fields of the event data as keyword arguments. A listener
+        naming only the fields it uses (no `**kwargs`) gets just those, see `bind_listener`.
+        """
+        self._subscribe_skipped_days_fill(event_type, fn, bind_listener)
+        return self.events.subscribe(event_type, bind_listener(fn), **subscribe_kwargs)
+
+    def replace_listener(self, subscription, fn):
+        """
+        Swaps the keyword style listener of `subscription` (returned by `add_event_listener_applied`) for `fn`, keeping
+        its place in the order the listeners are called in, e.g. in the `inject` of `Checkpoint.fork`
+        """
+        subscription.fn = bind_listener(fn)
+
+    def add_event_listener_raw(self, event_type, fn, **subscribe_kwargs):
+        self._subscribe_skipped_days_fill(event_type, fn, identity)
+        return self.events.subscribe(event_type, fn, **subscribe_kwargs)
 
     def post_event(self, event_type, data):
         self.events.post_event(event_type, data)
+
+    def enable_profiling(self, trace_memory: bool = False) -> EventProfiler:
+        """
+        Starts recording the time spent per event type and listener (see `SimCFA.profiling`)
+
+        :param trace_memory: record the allocations of the listeners too (tracemalloc)
+        :return: profiler holding the report, e.g. `print(profiler.format_table())`
+        """
+        return self.events.enable_profiling(EventProfiler(trace_memory))
+
+    def disable_profiling(self) -> EventProfiler | None:
+        return self.events.disable_profiling()
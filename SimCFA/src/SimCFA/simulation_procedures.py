@@ -1,42 +1,83 @@
+import math
 from copy import deepcopy
 from datetime import date
 from operator import eq, ge, le
 
-import matplotlib.pyplot as plt
-import pandas as pd
-from matplotlib.ticker import MaxNLocator
+import numpy as np
 
-from SimCFA.compound_interest_calculator import compound_interest_calc
+from SimCFA.event_types import CASH_STATE_CHANGE, CASH_STATE_NEGATIVE, CashStateChange, CashStateNegative
 from SimCFA.events import Events
-from SimCFA.functional import apply, apply_kwarg, identity
+from SimCFA.functional import apply_kwarg, bind_keywords, identity
+from SimCFA.ledger_books import PAYOFF_AVALANCHE, get_items_quantity, get_items_value, get_items_value_over_days
 from SimCFA.LedgerItem import Bond, Cash, Debt, GenericBuilder, House, LedgerItemProperties, LedgerItemType
-from SimCFA.simulation import ledger_items_type
-
+from SimCFA.recorder import (
+    SAMPLING_DAILY,
+    SAMPLING_ON_CHANGE,
+    StateRecording,
+    is_sampled_day,
+    sampled_days_between,
+)
+from SimCFA.scheduler import DateRange, MonthDay, OnDate, combine_schedules
+from SimCFA.simulation import convert_int_to_date, ledger_items_type
+from SimCFA.timeseries import CompoundCurve, Curve, as_curve
+
+# ledger categories holding liabilities, valued negative
+DEBT_CATEGORIES = ('debt', 'loans')
+
+# plots and data frames moved to the lazily imported `SimCFA.reporting`, still reachable from here
+_REPORTING_NAMES = (
+    'make_df_from_state_list',
+    'get_curve_from_state_list',
+    'make_percentile_band_plot',
+    'make_pretty_plot',
+)
+
+
+def __getattr__(name):
+    if name in _REPORTING_NAMES:
+        from SimCFA import reporting
+
+        return getattr(reporting, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def add_date_guard(fn, comparison_target: date | int, comparison_fn, transform_fn=identity, schedule=None):
+    """
+    Calls `fn` only on the days where `comparison_fn(transform_fn(day_date), comparison_target)` holds.
+    Passing `schedule` (a rule from `SimCFA.scheduler`) lets the simulation skip calling the guard on the days the rule
+    excludes, it has to allow at least all the days the comparison passes on. In weekly or monthly granularity only a
+    guard with a schedule is called on its own day, one without is called on the last day of every period.
+    """
+    call = bind_keywords(fn)
 
-def add_date_guard(fn, comparison_target: date | int, comparison_fn, transform_fn=identity):
     def inner(day_date, **kwargs):
-        transformed = transform_fn(day_date)
-        if not comparison_fn(transformed, comparison_target):
+        if not comparison_fn(transform_fn(day_date), comparison_target):
             return
-        fn(day_date=day_date, **kwargs)
+        call(day_date=day_date, **kwargs)
 
+    # lets the profiler name the guarded listener after its factory
+    inner.__wrapped__ = fn
+    if schedule is not None:
+        inner.schedule = schedule
     return inner
 
 
 def add_date_guard_exact_date(fn, date_trigger: date):
     assert date_trigger, 'Cannot create exact date guard with date_trigger as None'
-    return add_date_guard(fn, date_trigger, eq)
+    return add_date_guard(fn, date_trigger, eq, schedule=combine_schedules(fn, OnDate(date_trigger)))
 
 
 def add_date_guard_starts_on(fn, start_date: date):
     assert start_date, 'Cannot create an starts on date guard with start_date_date as None'
-    guarded_start = add_date_guard(fn, start_date, ge)
+    schedule = combine_schedules(fn, DateRange(start_date=start_date))
+    guarded_start = add_date_guard(fn, start_date, ge, schedule=schedule)
     return guarded_start
 
 
 def add_date_guard_ends_on(fn, end_date: date):
     assert end_date, 'Cannot create an ends on date guard with end_date as None'
-    guarded_start = add_date_guard(fn, end_date, le)
+    schedule = combine_schedules(fn, DateRange(end_date=end_date))
+    guarded_start = add_date_guard(fn, end_date, le, schedule=schedule)
     return guarded_start
 
 
@@ -50,7 +91,29 @@ def add_date_guard_date_between(fn, start_date: date, end_date: date):
 
 def add_month_day_date_guard(fn, day_trigger: int):
     transform_fn = lambda x: x.day
-    return add_date_guard(fn, day_trigger, eq, transform_fn)
+    return add_date_guard(fn, day_trigger, eq, transform_fn, schedule=combine_schedules(fn, MonthDay(day_trigger)))
+
+
+def add_net_worth_guard(fn, min_net_worth=None, max_net_worth=None):
+    """
+    Calls `fn` only while the net worth (in cents) is above `min_net_worth` and not above `max_net_worth`, e.g. to buy
+    bonds only while the net worth is over a threshold. Keeps the schedule of `fn`, the guard only excludes more days.
+    """
+    call = bind_keywords(fn)
+
+    def inner(ledger_items, n_day, **kwargs):
+        net_worth = get_net_worth(ledger_items, n_day)
+        if min_net_worth is not None and net_worth <= min_net_worth:
+            return
+        if max_net_worth is not None and net_worth > max_net_worth:
+            return
+        call(ledger_items=ledger_items, n_day=n_day, **kwargs)
+
+    inner.__wrapped__ = fn
+    schedule = getattr(fn, 'schedule', None)
+    if schedule is not None:
+        inner.schedule = schedule
+    return inner
 
 
 def create_simulate_monthly_cash_move(quantity: int, start_apply_date=None, end_apply_date=None, day_apply=10):
@@ -79,16 +142,19 @@ def create_simulate_monthly_cash_move(quantity: int, start_apply_date=None, end_
 
 
 def create_cash_income(zipped_day_start_income, day_apply=10):
-    def inner(ledger_items, day_date, events: Events, n_day: int, **kwargs):
-        def predicate(el):
-            day, _ = el
-            return day_date >= day
+    """
+    Each month on `day_apply` the cash changes by the income of the latest step started on or before the day.
+
+    :param zipped_day_start_income: (start date, cents) pairs in any order or a date indexed `Curve`
+    """
+    income_curve = as_curve(zipped_day_start_income)
 
-        el = next(filter(predicate, zipped_day_start_income), None)
-        if el is None:
+    def inner(ledger_items, day_date, events: Events, n_day: int):
+        income = income_curve.value_at(day_date)
+        if math.isnan(income):
+            # before the first step
             return
-        _, income = el
-        change_cash_in_place(ledger_items, income, events, n_day, **kwargs)
+        change_cash_in_place(ledger_items, income, events, n_day)
 
     inner = add_month_day_date_guard(inner, day_apply)
     return inner
@@ -104,37 +170,36 @@ def create_delayed_event_on_date(event_type: str, date_trigger: date, data: dict
     return apply_kwarg(inner)
 
 
+def subscribe_delayed_event_on_date(events: Events, event_type: str, date_trigger: date, data: dict):
+    """
+    Posts `event_type` with `data` on the `date_trigger`. The trigger expires right after that date so it does not stay
+    on the `day_started` listeners list for the rest of the simulation.
+
+    :return: subscription handle, allows to cancel the delayed event
+    """
+    trigger = create_delayed_event_on_date(event_type, date_trigger, data)
+    return events.subscribe('day_started', trigger, expires_on=date_trigger)
+
+
 def change_cash_in_place(
     ledger_items: ledger_items_type, by_how_much: int, events: Events, n_day=0, index: int = 0, **kwargs
 ):
+    """
+    Changes the cash (never below 0) and posts `cash_state_change`, and `cash_state_negative` when the cash would have
+    gone negative. The payloads read their other fields from `kwargs` when given, otherwise from the data of the day
+    (`Events.context`), a payload nobody listens to is not built at all.
+    """
     cash_item = ledger_items['cash'][index]
     original_quantity = cash_item.properties.quantity
     quantity = original_quantity + by_how_much
     cash_item.properties.quantity = max(quantity, 0)
     ledger_items['cash'][index] = cash_item
-    events.post_event(
-        'cash_state_change',
-        {
-            'index': index,
-            'debit_level': quantity,
-            'ledger_items': ledger_items,
-            'by_how_much': by_how_much,
-            'new_state': quantity,
-            **kwargs,
-        },
-    )
+    context = kwargs or events.context
+    if events.has_listeners(CASH_STATE_CHANGE):
+        change = CashStateChange(context, ledger_items, index, by_how_much, quantity, events, n_day)
+        events.post_event(CASH_STATE_CHANGE, change)
     if by_how_much < 0 and quantity < 0:
-        events.post_event(
-            'cash_state_negative',
-            {
-                'index': index,
-                'debit_level': quantity,
-                'ledger_items': ledger_items,
-                'events': events,
-                'n_day': n_day,
-                **kwargs,
-            },
-        )
+        events.post_event(CASH_STATE_NEGATIVE, CashStateNegative(context, ledger_items, index, quantity, events, n_day))
 
 
 def create_bond_buy(quantity: int, bond_builder: GenericBuilder):
@@ -162,8 +227,150 @@ def create_bond_buy(quantity: int, bond_builder: GenericBuilder):
             'events': events,
             'ledger_items': ledger_items,
         }
-        bond_buy_back_trigger = create_delayed_event_on_date('bond_buy_back', expiry_date, data)
-        events.subscribe('day_started', bond_buy_back_trigger)
+        subscribe_delayed_event_on_date(events, 'bond_buy_back', expiry_date, data)
+
+    return inner
+
+
+def get_available_cash(ledger_items: ledger_items_type) -> int:
+    return get_items_quantity(ledger_items['cash'])
+
+
+def create_cash_change_on_date(quantity: int, date_trigger: date):
+    def inner(ledger_items, events, n_day, **kwargs):
+        change_cash_in_place(ledger_items, quantity, events, n_day, **kwargs)
+
+    inner = add_date_guard_exact_date(inner, date_trigger)
+    return inner
+
+
+def create_asset_buy(asset_builder: GenericBuilder, category: str, reference: str = 'count', amount=None):
+    """
+    Buys whole units of the asset built by `asset_builder`, bonds go through `create_bond_buy`.
+
+    :param reference: `count` buys `amount` units, `cash` spends up to `amount` (all the available cash when None)
+    """
+    probe = asset_builder.set('properties', LedgerItemProperties(0, 0)).build()
+    price = probe.price
+    # assets valued by a curve are bought at the value of the day
+    price_curve = getattr(probe, 'price_curve', None)
+
+    def inner(ledger_items, events, n_day, day_date, **kwargs):
+        unit_price = price if price_curve is None else round(price_curve.value_at(n_day))
+        if reference == 'count':
+            quantity = amount
+        else:
+            budget = get_available_cash(ledger_items) if amount is None else amount
+            quantity = int(budget // unit_price)
+        if quantity <= 0:
+            return
+        if isinstance(probe, Bond):
+            bond_buy = create_bond_buy(quantity, asset_builder)
+            bond_buy(ledger_items=ledger_items, events=events, n_day=n_day, day_date=day_date, **kwargs)
+            return
+        properties = LedgerItemProperties(quantity, n_day)
+        item = asset_builder.set('properties', properties).build()
+        change_cash_in_place(ledger_items, -quantity * unit_price, events, n_day, **kwargs)
+        ledger_items[category].append(item)
+        events.post_event('ledger_item_acquired', {'item': item})
+
+    return inner
+
+
+def create_asset_sell(category: str, reference: str = 'count', amount=None):
+    """
+    Sells the items of the category oldest first, at their value of the day.
+
+    :param reference: `count` sells `amount` units, `cash` sells units worth at least `amount`; all units when None
+    """
+
+    def inner(ledger_items, events, n_day, **kwargs):
+        if category not in ledger_items:
+            return
+        remaining = amount
+        cash_received = 0
+        for item in list(ledger_items[category]):
+            if remaining is not None and remaining <= 0:
+                break
+            quantity = item.properties.quantity
+            if quantity <= 0:
+                continue
+            unit_value = item.get_value(n_day) / quantity
+            if remaining is None:
+                units = quantity
+            elif reference == 'count':
+                units = min(quantity, remaining)
+                remaining -= units
+            else:
+                units = min(quantity, math.ceil(remaining / unit_value)) if unit_value > 0 else quantity
+                remaining -= units * unit_value
+            cash_received += units * unit_value
+            if units == quantity:
+                ledger_items[category].remove(item)
+                events.post_event('ledger_item_sold', {'item': item})
+            else:
+                item.properties.quantity = quantity - units
+        if cash_received:
+            change_cash_in_place(ledger_items, cash_received, events, n_day, **kwargs)
+
+    return inner
+
+
+def create_debt_payback(amount=None):
+    """
+    Pays the debt back oldest first, `amount` per call or all the available cash when None. Like
+    `create_debt_payback_strategy` the payment reduces the debt at its face value.
+    """
+
+    def inner(ledger_items, events, n_day, **kwargs):
+        if 'debt' not in ledger_items:
+            return
+        budget = get_available_cash(ledger_items) if amount is None else amount
+        paid = 0
+        for item in list(ledger_items['debt']):
+            if budget <= 0:
+                break
+            debt_value = item.properties.quantity
+            payment = min(debt_value, budget)
+            budget -= payment
+            paid += payment
+            if payment == debt_value:
+                ledger_items['debt'].remove(item)
+            else:
+                item.properties.quantity = debt_value - payment
+        if paid:
+            change_cash_in_place(ledger_items, -paid, events, n_day, **kwargs)
+
+    return inner
+
+
+def create_loan_on_negative_cash(percent=18):
+    """
+    `cash_state_negative` counterpart of `create_debt_with_interest` borrowing the missing cash in the loan book
+    (`ledger_items['loans']`), repeated shortfalls are merged into one loan per rate instead of piling up items
+    """
+
+    def inner(ledger_items, debit_level, n_day, **kwargs):
+        ledger_items['loans'].borrow(-debit_level, percent, n_day)
+
+    return inner
+
+
+def create_loan_payback(amount=None, order=PAYOFF_AVALANCHE):
+    """
+    Pays the loan book back, `amount` per call or all the available cash when None. Unlike `create_debt_payback`
+    the payment covers the accrued interest first, the interest paid is kept by the book.
+
+    :param order: `avalanche` pays the highest rate first, `snowball` the smallest balance
+    """
+
+    def inner(ledger_items, events, n_day, **kwargs):
+        if 'loans' not in ledger_items:
+            return
+        budget = get_available_cash(ledger_items) if amount is None else amount
+        paid = ledger_items['loans'].pay(budget, n_day, order)
+        if paid:
+            change_cash_in_place(ledger_items, -paid, events, n_day, **kwargs)
 
     return inner
 
@@ -181,6 +388,9 @@ def create_bond_buy_back_for_cash():
         events: Events,
         **kwargs,
     ):
+        if item not in ledger_items['bonds']:
+            # already sold before its maturity
+            return
         # calculate how much do we get from the bonds
         cash_received = item.get_value(n_day)
 
@@ -199,12 +409,75 @@ def create_simulation_state_save():
         nonlocal states
         states.append(deepcopy(kwargs))
 
+    def save_skipped_days(first_day, last_day, **kwargs) -> None:
+        # the state does not change on skipped days, one copy is shared by all of them
+        state = deepcopy(kwargs)
+        for n_day in range(first_day, last_day + 1):
+            states.append(state | {'n_day': n_day, 'day_date': convert_int_to_date(n_day, state['start_date'])})
+
+    save_state.fill_skipped_days = save_skipped_days
+
     def access_state():
         return states
 
     return save_state, access_state
 
 
+def create_simulation_state_recorder(
+    n_days: int, sampling: str = SAMPLING_DAILY, curve_names=('inflation',), capacity: int | None = None
+):
+    """
+    Cheap alternative to `create_simulation_state_save`: instead of copying the whole simulation every day it records
+    the count and value of each ledger item category (and the last value of the chosen curves) into NumPy columns.
+
+    :param n_days: number of days simulated, used to preallocate the columns
+    :param sampling: one of `daily`, `month_end` or `on_change` (from `SimCFA.recorder`)
+    :param curve_names: curves (from `simulation.curves`) to record next to the ledger items
+    :param capacity: initial number of preallocated rows, `n_days` by default
+    """
+    recording = StateRecording(n_days if capacity is None else capacity, curve_names)
+
+    def record_state(n_day, day_date, ledger_items, curves) -> None:
+        if not is_sampled_day(sampling, n_day, day_date, n_days):
+            return
+        values = process_ledger_items_on_sim_step(n_day, ledger_items)
+        if sampling == SAMPLING_ON_CHANGE and n_day != n_days - 1 and values == recording.last_values():
+            return
+        recording.append(n_day, day_date, values, curves)
+
+    def record_skipped_days(first_day, last_day, start_date, ledger_items, curves) -> None:
+        # the ledger does not change on skipped days, only the time dependent values have to be evaluated
+        n_days_sampled = np.array(sampled_days_between(sampling, first_day, last_day, start_date, n_days))
+        if not len(n_days_sampled):
+            return
+        values = process_ledger_items_over_days(n_days_sampled, ledger_items)
+        if sampling == SAMPLING_ON_CHANGE:
+            previous = recording.last_values()
+            changed = np.zeros(len(n_days_sampled), dtype=bool)
+            for name, column in values.items():
+                before = np.nan if previous is None else previous.get(name, np.nan)
+                changed |= column != np.concatenate(([before], column[:-1]))
+            n_days_sampled = n_days_sampled[changed]
+            values = {name: column[changed] for name, column in values.items()}
+            if not len(n_days_sampled):
+                return
+        # curves filled for the skipped days end with the value of `last_day`
+        recorded_curves = {}
+        offsets = (last_day - n_days_sampled).tolist()
+        for name, curve in curves.items():
+            if len(curve) > offsets[0]:
+                recorded_curves[name] = [curve[len(curve) - 1 - offset] for offset in offsets]
+        dates_sampled = np.datetime64(start_date, 'D') + n_days_sampled
+        recording.append_rows(n_days_sampled, dates_sampled, values, recorded_curves)
+
+    record_state.fill_skipped_days = record_skipped_days
+
+    def access_state():
+        return recording
+
+    return record_state, access_state
+
+
 def get_final_cash_state(ledger_items: ledger_items_type, **kwargs):
     total = 0
     for item in ledger_items['cash']:
@@ -213,8 +486,74 @@ def get_final_cash_state(ledger_items: ledger_items_type, **kwargs):
     print(f'Total amount of cash: {total:.2f}')
 
 
+def create_run_summary():
+    """
+    Compact summary of a run, cheap to send between processes: final net worth and cash, maximal debt, minimal cash
+    (at the end of a day) and the first day the cash went negative. Values are in the same units as the data frames
+    (cents divided by 100).
+
+    :return: listeners to subscribe (`cash_state_negative`, `day_ended` and `simulation_ended`) and access function
+    """
+    summary = {
+        'final_net_worth': None,
+        'final_cash': None,
+        'max_debt': 0,
+        'min_cash': None,
+        'first_negative_cash_day': None,
+        'first_negative_cash_date': None,
+        'interest_paid': 0,
+    }
+
+    def track_negative_cash(n_day):
+        if summary['first_negative_cash_day'] is None:
+            summary['first_negative_cash_day'] = n_day
+
+    def track_balances(n_day, ledger_items):
+        if 'cash' in ledger_items:
+            cash = get_available_cash(ledger_items) / 100
+            if summary['min_cash'] is None or cash < summary['min_cash']:
+                summary['min_cash'] = cash
+        debt = 0
+        for category in DEBT_CATEGORIES:
+            if category in ledger_items:
+                debt -= get_items_value(ledger_items[category], n_day)
+        summary['max_debt'] = max(summary['max_debt'], debt / 100)
+
+    def track_balances_skipped_days(last_day, ledger_items):
+        # cash does not change and debt is only growing with interest on days where nothing happens
+        track_balances(last_day, ledger_items)
+
+    track_balances.fill_skipped_days = track_balances_skipped_days
+
+    def finish(n_day, ledger_items, start_date):
+        summed = sum_all_ledger_items(n_day, ledger_items)
+        summary['final_net_worth'] = summed['net_worth'] / 100
+        summary['final_cash'] = summed.get('cash', 0) / 100
+        if 'loans' in ledger_items:
+            summary['interest_paid'] = ledger_items['loans'].interest_paid / 100
+        first_negative = summary['first_negative_cash_day']
+        if first_negative is not None:
+            summary['first_negative_cash_date'] = convert_int_to_date(first_negative, start_date)
+
+    def access_summary():
+        return summary
+
+    listeners = {'cash_state_negative': track_negative_cash, 'day_ended': track_balances, 'simulation_ended': finish}
+    return listeners, access_summary
+
+
+def attach_run_summary(simulation):
+    """Subscribes `create_run_summary` listeners to the simulation, returns the access function of the summary"""
+    listeners, access_summary = create_run_summary()
+    for event_type, listener in listeners.items():
+        simulation.add_event_listener_applied(event_type, listener)
+    return access_summary
+
+
 def create_draw_simulation_run(access_state_fn, handle_fig):
     def inner(**kwargs):
+        from SimCFA.reporting import make_pretty_plot
+
         states = access_state_fn()
         fig = make_pretty_plot(states)
         handle_fig(fig)
@@ -222,8 +561,13 @@ def create_draw_simulation_run(access_state_fn, handle_fig):
     return inner
 
 
+def get_net_worth(ledger_items: ledger_items_type, n_day: int):
+    """Net worth on the day, the ledger books value themselves from running aggregates instead of item by item"""
+    return sum(get_items_value(items, n_day) for items in ledger_items.values())
+
+
 def sum_all_ledger_items(n_day, ledger_items: ledger_items_type):
-    result = {key: sum(item.get_value(n_day) for item in ledger_items[key]) for key in ledger_items}
+    result = {key: get_items_value(ledger_items[key], n_day) for key in ledger_items}
     sum_all = sum(result[key] for key in result)
     result['net_worth'] = sum_all
     return result
@@ -235,93 +579,38 @@ def process_ledger_items_on_sim_step(n_day: int, ledger_items: ledger_items_type
         count_key = f'{key} - count'
         value_key = f'{key} - value'
         items_of_type = ledger_items[key]
-        result[count_key] = sum(item.properties.quantity for item in items_of_type)
-        result[value_key] = sum(item.get_value(n_day) for item in items_of_type)
+        result[count_key] = get_items_quantity(items_of_type)
+        result[value_key] = get_items_value(items_of_type, n_day)
     return result
 
 
-def make_df_from_state_list(simulation_states: list):
-    n_days = list(map(lambda state: state['n_day'], simulation_states))
-    dates = list(map(lambda state: state['day_date'], simulation_states))
-    ledger_items_list = list(map(lambda state: state['ledger_items'], simulation_states))
-    zipped = zip(n_days, ledger_items_list)
-
-    applied_process = apply(process_ledger_items_on_sim_step)
-    results = map(applied_process, zipped)
-    df = pd.DataFrame.from_records(results)
-    value_columns = tuple(col for col in df.columns if 'value' in col)
-    for column in df.columns:
-        if column in value_columns:
-            df[column] /= 100
-    df['cash - count'] /= 100
-    df.fillna(0, inplace=True)
-    df['date'] = dates
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+def process_ledger_items_over_days(n_days: np.ndarray, ledger_items: ledger_items_type):
+    """`process_ledger_items_on_sim_step` for many days of the same ledger, each key maps to an array (one per day)"""
+    result = {}
+    for key in ledger_items:
+        items_of_type = ledger_items[key]
+        result[f'{key} - count'] = np.full(len(n_days), get_items_quantity(items_of_type), dtype=np.float64)
+        result[f'{key} - value'] = get_items_value_over_days(items_of_type, n_days)
+    return result
 
 
 def create_calculate_inflation(percent):
-    def inner(curves: dict, start_date: date, day_date: date, **kwargs):
-        diff = day_date - start_date
-        years = diff.days / 365
-        x = compound_interest_calc(percent, years)
-        curves['inflation'].append(x)
+    """
+    Appends the price level of the day to the `inflation` curve.
 
-    return inner
+    :param percent: yearly inflation compounded from the start of the simulation, or a `Curve` indexed by simulation
+        day (see `Curve.shifted`)
+    """
+    curve = percent if isinstance(percent, Curve) else CompoundCurve(percent)
 
+    def inner(curves: dict, n_day: int):
+        curves['inflation'].append(curve.value_at(n_day))
 
-def make_pretty_plot(simulation_states: list):
-    """
-    Makes a pretty plot that will show the value of the ledger items on the main plot
-    and count of each below on smaller scale plots.
-    Current plot aspect ratio is full size for value and 1/n_types for each type of ledger item
+    def fill_skipped_days(curves: dict, first_day: int, last_day: int):
+        curves['inflation'].extend(curve.values_between(first_day, last_day).tolist())
 
-    :param simulation_states:
-    :return:
-    """
-    df = make_df_from_state_list(simulation_states)
-    inflation_curve = simulation_states[-1]['curves']['inflation']
-    value_columns = tuple(col for col in df.columns if 'value' in col)
-    count_columns = tuple(col for col in df.columns if 'count' in col)
-
-    count = len(count_columns)
-    height_ratios = [count] + [count] + ([1] * (count))
-
-    inflation_progress = 2 - pd.Series(inflation_curve)
-    df['inflation_progress'] = inflation_progress
-
-    x = df.loc[:, value_columns].sum(axis=1)
-    df['net_worth'] = x
-    df['net_worth_inflation_adjusted'] = df['net_worth'] * df['inflation_progress']
-
-    extra_plots = 2
-    fig, axs = plt.subplots(count + extra_plots, gridspec_kw={'height_ratios': height_ratios})
-    for column in df.columns:
-        if column == 'date':
-            continue
-        if column in ('net_worth', 'net_worth_inflation_adjusted'):
-            axs[0].plot(df['date'], df[column], label=column)
-            axs[0].set_title('Net worth')
-            axs[0].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=6 * 2))
-        if column in value_columns:
-            axs[1].plot(df['date'], df[column], label=column)
-            axs[1].set_title('value of ledger items')
-            axs[1].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=6 * 2))
-        if column in count_columns:
-            indx = count_columns.index(column) + extra_plots
-            axs[indx].plot(df['date'], df[column], label='_nolegend_')
-            axs[indx].set_title(column)
-            axs[indx].yaxis.set_major_locator(MaxNLocator(integer=True, nbins=3))
-
-    fig.tight_layout(h_pad=0)
-    axs[0].legend()
-    axs[1].legend()
-    CONST_H_MUL = 2
-    height = sum(height_ratios) * CONST_H_MUL
-    fig.set_figheight(height)
-    width = 10
-    fig.set_figwidth(width)
-    return fig
+    inner.fill_skipped_days = fill_skipped_days
+    return inner
 
 
 def create_append_ledger_item(quantity=0, acquired_on=0, ledger_item_name='cash', ledger_item=Cash(None)):
@@ -367,12 +656,11 @@ def ignore_debt():
     return inner
 
 
-def create_debt_with_interest():
+def create_debt_with_interest(percent=18):
     def inner(ledger_items, events, debit_level, n_day, **kwargs):
         # define debt and add it to ledger_items
-        DEBT_PERCENT = 18
         debt_properties = LedgerItemProperties(-debit_level, n_day, LedgerItemType.Liability)
-        debt_item = Debt(debt_properties, DEBT_PERCENT)
+        debt_item = Debt(debt_properties, percent)
         ledger_items['debt'].append(debt_item)
         data = {
             'ledger_items': ledger_items,
@@ -414,8 +702,13 @@ def create_debt_payback_strategy(quantity_month):
                 change_cash_in_place(ledger_items, -quantity_month, **kwargs)
                 # still, the debt is there, we just paid of some of it
                 item.properties.quantity = diff
+        if isinstance(debt_item_list, list) and items_to_remove:
+            # one pass instead of a `list.remove` scan per settled item, ledger books remove an item in O(1)
+            settled = set(map(id, items_to_remove))
+            debt_item_list[:] = [item for item in debt_item_list if id(item) not in settled]
+            return
         for item in items_to_remove:
-            ledger_items['debt'].remove(item)
+            debt_item_list.remove(item)
 
     inner = add_month_day_date_guard(inner, 10)
     return inner
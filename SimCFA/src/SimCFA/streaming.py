@@ -0,0 +1,247 @@
+import csv
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+from SimCFA.recorder import SAMPLING_DAILY
+from SimCFA.simulation_procedures import create_simulation_state_recorder
+
+
+def create_record_buffer(n_days: int, sampling: str = SAMPLING_DAILY, curve_names=('inflation',), capacity=64):
+    """
+    State recorder which is drained after every simulation step, backs `Simulation.simulate_iter`.
+
+    :return: `day_ended` listener (with its `fill_skipped_days`) and function taking the records buffered so far
+    """
+    record_state, access_state = create_simulation_state_recorder(n_days, sampling, curve_names, capacity)
+
+    def take_records():
+        records = access_state().take_rows()
+        for record in records:
+            record['net_worth'] = sum(value for name, value in record.items() if name.endswith(' - value'))
+        return records
+
+    return record_state, take_records
+
+
+def stop_when(records, predicate):
+    """
+    Passes the records through until `predicate` is true for one of them (that record is still yielded),
+    the source generator is closed then, e.g. `stop_when(simulation.simulate_iter(), lambda r: r['net_worth'] < 0)`
+    """
+    try:
+        for record in records:
+            yield record
+            if predicate(record):
+                return
+    finally:
+        close = getattr(records, 'close', None)
+        if close is not None:
+            close()
+
+
+class RecordSink(ABC):
+    """
+    Writes records to a file in batches of `batch_size`, so the memory used does not grow with the number of records.
+    Use as a context manager or call `close`.
+
+    :param columns: columns written, missing values are written as 0 (categories with no items yet), records with
+        other columns are rejected. By default the columns of the records are written: a column first seen after the
+        first batch (e.g. a category acquired later in the simulation) is added after the others and the rows written
+        before get 0 in it, the file written so far is rewritten once for every batch bringing new columns.
+    """
+
+    def __init__(self, path, columns=None, batch_size: int = 4096):
+        self.path = path
+        self.fixed_columns = columns is not None
+        self.columns = list(columns or ())
+        self.batch_size = batch_size
+        self.batch = []
+        self.n_written = 0
+
+    def write(self, record: dict):
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if not self.batch:
+            return
+        known = set(self.columns)
+        new = [name for name in dict.fromkeys(name for record in self.batch for name in record) if name not in known]
+        if new:
+            if self.fixed_columns:
+                raise ValueError(f'Columns {sorted(new)} are not written by the sink, pass them in `columns`')
+            if self.n_written:
+                self._add_columns(new)
+            self.columns.extend(new)
+        self._write_batch(self.batch)
+        self.n_written += len(self.batch)
+        self.batch = []
+
+    @abstractmethod
+    def _write_batch(self, batch: list):
+        """Appends the records of the batch to the file, `columns` are set"""
+
+    @abstractmethod
+    def _add_columns(self, names: list):
+        """Adds the columns after `columns` to the rows written so far, with 0 in every row"""
+
+    def _close(self):
+        pass
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvSink(RecordSink):
+    def __init__(self, path, columns=None, batch_size: int = 4096):
+        super().__init__(path, columns, batch_size)
+        # kept open for the lifetime of the sink, closed by `close`
+        self.file = open(path, 'w', newline='')  # noqa: SIM115
+        self.writer = None
+
+    def _write_batch(self, batch: list):
+        if self.writer is None:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.columns)
+        self.writer.writerows([record.get(name, 0) for name in self.columns] for record in batch)
+
+    def _add_columns(self, names: list):
+        self.file.close()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with (
+            open(self.path, newline='') as written,
+            tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', newline='', delete=False) as widened,
+        ):
+            rows = csv.reader(written)
+            next(rows)
+            writer = csv.writer(widened)
+            writer.writerow(self.columns + names)
+            padding = [0] * len(names)
+            writer.writerows(row + padding for row in rows)
+        os.replace(widened.name, self.path)
+        self.file = open(self.path, 'a', newline='')  # noqa: SIM115
+        self.writer = csv.writer(self.file)
+
+    def _close(self):
+        self.file.close()
+
+
+class _ArrowSink(RecordSink):
+    def __init__(self, path, columns=None, batch_size: int = 4096):
+        # imported here so that streaming records does not load pyarrow unless an Arrow based sink is used
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(
+                f'{type(self).__name__} requires pyarrow, install SimCFA with the `arrow` extra'
+            ) from None
+        super().__init__(path, columns, batch_size)
+        self.pa = pyarrow
+        self.schema = None
+        self.writer = None
+        # file written to, a temporary one next to `path` once columns were added, moved to `path` by `close`
+        self.writing_path = path
+
+    def _schema(self, data: dict):
+        pa = self.pa
+        # counts and values of categories missing in the first batch are ints there, floats later on
+        return pa.schema(
+            [
+                field.with_type(pa.float64()) if pa.types.is_integer(field.type) and field.name != 'n_day' else field
+                for field in pa.Table.from_pydict(data).schema
+            ]
+        )
+
+    def _table(self, batch: list):
+        data = {name: [record.get(name, 0) for record in batch] for name in self.columns}
+        if self.schema is None:
+            self.schema = self._schema(data)
+        return self.pa.Table.from_pydict(data, schema=self.schema)
+
+    def _write_batch(self, batch: list):
+        table = self._table(batch)
+        if self.writer is None:
+            self.writer = self._open_writer()
+        self.writer.write_table(table)
+
+    def _add_columns(self, names: list):
+        pa = self.pa
+        self.writer.close()
+        written_path = self.writing_path
+        added = self._schema({name: [record.get(name, 0) for record in self.batch] for name in names})
+        for field in added:
+            self.schema = self.schema.append(field)
+        descriptor, self.writing_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(self.path)))
+        os.close(descriptor)
+        self.writer = self._open_writer()
+        for batch in self._read_batches(written_path):
+            table = pa.Table.from_batches([batch])
+            for field in added:
+                table = table.append_column(field, pa.array([0] * len(table), field.type))
+            self.writer.write_table(table)
+        if written_path != self.path:
+            os.remove(written_path)
+
+    @abstractmethod
+    def _open_writer(self):
+        """Writer of `schema` into the file at `writing_path`"""
+
+    @abstractmethod
+    def _read_batches(self, path):
+        """Record batches of a file written by the sink"""
+
+    def _close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.writing_path != self.path:
+            os.replace(self.writing_path, self.path)
+
+
+class ParquetSink(_ArrowSink):
+    """Every batch becomes one row group of the Parquet file"""
+
+    def _open_writer(self):
+        import pyarrow.parquet
+
+        return pyarrow.parquet.ParquetWriter(self.writing_path, self.schema)
+
+    def _read_batches(self, path):
+        import pyarrow.parquet
+
+        with pyarrow.parquet.ParquetFile(path) as file:
+            yield from file.iter_batches()
+
+
+class ArrowIpcSink(_ArrowSink):
+    """Arrow IPC (Feather v2) file, can be memory mapped with `pyarrow.ipc.open_file`"""
+
+    def _open_writer(self):
+        return self.pa.ipc.new_file(self.writing_path, self.schema)
+
+    def _read_batches(self, path):
+        with self.pa.memory_map(os.fspath(path)) as source:
+            reader = self.pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
+
+
+def write_records(records, sink: RecordSink) -> int:
+    """Streams all the records into the sink and closes it, returns the number of records written"""
+    with sink:
+        sink.write_all(records)
+    return sink.n_written
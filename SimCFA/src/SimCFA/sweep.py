@@ -0,0 +1,158 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from importlib import import_module
+from itertools import product
+
+from SimCFA.configs import build_simulation_from_config, load_in_json_config
+from SimCFA.recorder import SAMPLING_DAILY
+from SimCFA.result_store import ResultStore
+from SimCFA.simulation_procedures import attach_run_summary, create_simulation_state_recorder
+
+
+def set_in_config(config, path: str, value):
+    """Sets the value under dotted `path` (list indexes as numbers, e.g. `assets.0.price`) in place"""
+    *parents, last = path.split('.')
+    node = config
+    for key in parents:
+        node = node[int(key)] if isinstance(node, list) else node[key]
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+def expand_axes(base_config: dict, axes: dict) -> list:
+    """
+    Cartesian product of the parameter axes applied to copies of the base config
+
+    :param axes: dotted config path -> list of values
+    :return: list of (params, config) pairs, params maps the path to the value used in the run
+    """
+    paths = list(axes)
+    runs = []
+    for values in product(*(axes[path] for path in paths)):
+        config = deepcopy(base_config)
+        params = dict(zip(paths, values))
+        for path, value in params.items():
+            set_in_config(config, path, value)
+        runs.append((params, config))
+    return runs
+
+
+def run_config_summary(
+    config, build_fn=build_simulation_from_config, store_path=None, params=None, sampling=SAMPLING_DAILY
+) -> dict:
+    """
+    Builds and runs one simulation, only its compact summary is returned (no states cross process boundaries)
+
+    :param store_path: `ResultStore` the recorded states of the run are appended to (with `params`), the summary then
+        has the `run_id` of the stored run
+    """
+    simulation = build_fn(config)
+    access_summary = attach_run_summary(simulation)
+    if store_path is not None:
+        record_state, access_state = create_simulation_state_recorder(simulation.n_days, sampling)
+        simulation.add_event_listener_applied('day_ended', record_state)
+    simulation.simulate()
+    summary = access_summary()
+    if store_path is not None:
+        summary['run_id'] = ResultStore(store_path).append_recording(params or {}, access_state())
+    return summary
+
+
+def _run_summary_args(args):
+    return run_config_summary(*args)
+
+
+def run_sweep(
+    base_config: dict,
+    axes: dict,
+    build_fn=build_simulation_from_config,
+    max_workers=None,
+    chunksize=None,
+    store_path=None,
+    store_sampling=SAMPLING_DAILY,
+):
+    """
+    Runs the simulation for every combination of the axes over a process pool.
+
+    :param build_fn: picklable (module level) function building a `Simulation` from a config
+    :param max_workers: size of the pool, 1 runs everything in the current process
+    :param chunksize: runs sent to a worker at once, by default the runs are split into ~4 chunks per worker
+    :param store_path: directory of a `ResultStore`, the workers append the states of every run to it
+    :param store_sampling: sampling of the stored states, see `create_simulation_state_recorder`
+    :return: data frame with one row per run: the swept params followed by the run summary
+    """
+    import pandas as pd
+
+    runs = expand_axes(base_config, axes)
+    tasks = [(config, build_fn, store_path, params, store_sampling) for params, config in runs]
+    if max_workers == 1:
+        summaries = list(map(_run_summary_args, tasks))
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = chunksize or max(1, math.ceil(len(tasks) / (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            summaries = list(executor.map(_run_summary_args, tasks, chunksize=chunksize))
+    return pd.DataFrame.from_records([params | summary for (params, _), summary in zip(runs, summaries)])
+
+
+def execute_sweep_from_file(filepath: str, axes: dict, build_fn=build_simulation_from_config, **kwargs):
+    """Sweep counterpart of `execute_config_from_file`"""
+    return run_sweep(load_in_json_config(filepath), axes, build_fn, **kwargs)
+
+
+def import_build_fn(spec: str):
+    module_name, _, fn_name = spec.partition(':')
+    return getattr(import_module(module_name), fn_name)
+
+
+def parse_axis(spec: str):
+    """`path=v1,v2,...`, values are read as JSON and fall back to plain strings"""
+    path, _, values = spec.partition('=')
+
+    def parse_value(value):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+
+    return path, [parse_value(value) for value in values.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a simulation for every combination of parameter values')
+    parser.add_argument('config', nargs='?', help='base JSON config, empty config when omitted')
+    parser.add_argument('--axis', action='append', default=[], help='path=v1,v2,... can be repeated')
+    parser.add_argument('--builder', default='SimCFA.configs:build_simulation_from_config', help='module:function')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--output', help='CSV file to write the summaries to, printed when omitted')
+    parser.add_argument('--store', help='result store directory to append the recorded states of every run to')
+    parser.add_argument('--store-sampling', default=SAMPLING_DAILY, help='daily, month_end or on_change')
+    args = parser.parse_args(argv)
+
+    base_config = load_in_json_config(args.config) if args.config else {}
+    axes = dict(map(parse_axis, args.axis))
+    build_fn = import_build_fn(args.builder)
+    df = run_sweep(
+        base_config,
+        axes,
+        build_fn,
+        max_workers=args.workers,
+        chunksize=args.chunksize,
+        store_path=args.store,
+        store_sampling=args.store_sampling,
+    )
+    if args.output:
+        df.to_csv(args.output, index=False)
+        return
+    print(df.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
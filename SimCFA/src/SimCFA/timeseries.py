@@ -0,0 +1,192 @@
+"""
+Curves of a value over time: constant, step function, compound growth and piecewise linear.
+
+The time axis is a whole day number: curves built from dates (`datetime.date`) are queried with dates, curves built
+from ints with ints (e.g. simulation days). `Curve.shifted(start_date)` turns a date curve into a simulation day curve.
+Breakpoints are kept in sorted arrays: `value_at` is a `bisect` in O(log n), `values` evaluates many days at once with
+`np.searchsorted`.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import date
+from numbers import Real
+
+import numpy as np
+
+from SimCFA.compound_interest_calculator import growth_factor, growth_factors
+
+# date(1970, 1, 1).toordinal(), `datetime64[D]` counts the days from it
+EPOCH_ORDINAL = 719163
+
+
+def to_day_number(day) -> int:
+    """Position of a `date`, `np.datetime64` or int on the time axis"""
+    if isinstance(day, date):
+        return day.toordinal()
+    if isinstance(day, np.datetime64):
+        return int(day.astype('datetime64[D]').astype(np.int64)) + EPOCH_ORDINAL
+    return int(day)
+
+
+def to_day_numbers(days) -> np.ndarray:
+    """Vectorized `to_day_number`: array of `datetime64`, of ints or a list of dates"""
+    days = np.asarray(days)
+    if days.dtype.kind == 'M':
+        return days.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+    if days.dtype == object:
+        return np.fromiter((to_day_number(day) for day in days.ravel()), dtype=np.int64, count=days.size)
+    return days.astype(np.int64, copy=False)
+
+
+class Curve(ABC):
+    @abstractmethod
+    def value_at(self, day):
+        """Value on the day (`date` or int, see the module docstring)"""
+
+    @abstractmethod
+    def values(self, days) -> np.ndarray:
+        """Vectorized `value_at`, one float per day"""
+
+    @abstractmethod
+    def shifted(self, origin) -> 'Curve':
+        """Same curve with `origin` as day 0, e.g. `curve.shifted(start_date)` is indexed by simulation day"""
+
+    def values_between(self, first_day, last_day) -> np.ndarray:
+        """Values of every day from `first_day` to `last_day` (inclusive)"""
+        return self.values(np.arange(to_day_number(first_day), to_day_number(last_day) + 1))
+
+
+class ConstantCurve(Curve):
+    def __init__(self, value):
+        self.value = value
+
+    def value_at(self, day):
+        return self.value
+
+    def values(self, days) -> np.ndarray:
+        return np.full(np.shape(days), self.value, dtype=np.float64)
+
+    def shifted(self, origin) -> 'ConstantCurve':
+        return self
+
+    def __repr__(self):
+        return f'ConstantCurve({self.value!r})'
+
+
+class StepCurve(Curve):
+    """
+    Value of the latest step started on or before the day, `default` before the first step.
+
+    :param starts: first day of every step, sorted
+    :param values: value of every step, returned as given (ints stay ints)
+    :param default: number, NaN (no value yet) by default, `value_at` and `values` return the same one
+    """
+
+    def __init__(self, starts, values, default=math.nan):
+        self.starts = [to_day_number(start) for start in starts]
+        self.step_values = list(values)
+        self.default = default
+        if not isinstance(default, Real):
+            raise TypeError(f'The default of a step curve has to be a number, not {default!r}')
+        if len(self.starts) != len(self.step_values):
+            raise ValueError(f'{len(self.starts)} step starts for {len(self.step_values)} values')
+        if any(later < earlier for earlier, later in zip(self.starts, self.starts[1:])):
+            raise ValueError('Step starts have to be sorted, use `StepCurve.from_pairs` for unsorted steps')
+        self._starts_array = np.array(self.starts, dtype=np.int64)
+        # index 0 is the value before the first step, `searchsorted` gives the number of steps started
+        self._values_array = np.array([default, *self.step_values], dtype=np.float64)
+
+    @classmethod
+    def from_pairs(cls, pairs, default=math.nan) -> 'StepCurve':
+        """Steps given as (start, value) pairs in any order, e.g. the newest first lists of `create_cash_income`"""
+        ordered = sorted(pairs, key=lambda pair: to_day_number(pair[0]))
+        return cls([start for start, _ in ordered], [value for _, value in ordered], default)
+
+    def value_at(self, day):
+        index = bisect_right(self.starts, to_day_number(day))
+        return self.default if index == 0 else self.step_values[index - 1]
+
+    def values(self, days) -> np.ndarray:
+        return self._values_array[np.searchsorted(self._starts_array, to_day_numbers(days), side='right')]
+
+    def shifted(self, origin) -> 'StepCurve':
+        offset = to_day_number(origin)
+        return StepCurve([start - offset for start in self.starts], self.step_values, self.default)
+
+    def __repr__(self):
+        return f'StepCurve({len(self.starts)} steps)'
+
+
+class CompoundCurve(Curve):
+    """
+    `initial` compounded at `percent` a year from `origin` on, computed with the cached growth factors.
+    Days before `origin` discount the value.
+    """
+
+    def __init__(self, percent, origin=0, initial=1, n_times_during_year=1):
+        self.percent = percent
+        self.origin = to_day_number(origin)
+        self.initial = initial
+        self.n_times_during_year = n_times_during_year
+
+    def value_at(self, day):
+        return self.initial * growth_factor(self.percent, to_day_number(day) - self.origin, self.n_times_during_year)
+
+    def values(self, days) -> np.ndarray:
+        return self.initial * growth_factors(self.percent, to_day_numbers(days) - self.origin, self.n_times_during_year)
+
+    def shifted(self, origin) -> 'CompoundCurve':
+        return CompoundCurve(self.percent, self.origin - to_day_number(origin), self.initial, self.n_times_during_year)
+
+    def __repr__(self):
+        return f'CompoundCurve({self.percent}%, origin={self.origin})'
+
+
+class PiecewiseLinearCurve(Curve):
+    """
+    Linear interpolation between (day, value) points, constant before the first and after the last point.
+
+    :param points: (day, value) pairs in any order
+    """
+
+    def __init__(self, points):
+        ordered = sorted(points, key=lambda point: to_day_number(point[0]))
+        if not ordered:
+            raise ValueError('A piecewise linear curve needs at least one point')
+        self.knots = [to_day_number(day) for day, _ in ordered]
+        self.knot_values = [float(value) for _, value in ordered]
+        self._knots_array = np.array(self.knots, dtype=np.float64)
+        self._values_array = np.array(self.knot_values, dtype=np.float64)
+
+    def value_at(self, day):
+        day = to_day_number(day)
+        index = bisect_right(self.knots, day)
+        if index == 0:
+            return self.knot_values[0]
+        if index == len(self.knots):
+            return self.knot_values[-1]
+        start, end = self.knots[index - 1], self.knots[index]
+        start_value, end_value = self.knot_values[index - 1], self.knot_values[index]
+        # same operations as `np.interp`, so `value_at` and `values` agree exactly
+        return (end_value - start_value) / (end - start) * (day - start) + start_value
+
+    def values(self, days) -> np.ndarray:
+        return np.interp(to_day_numbers(days), self._knots_array, self._values_array)
+
+    def shifted(self, origin) -> 'PiecewiseLinearCurve':
+        offset = to_day_number(origin)
+        return PiecewiseLinearCurve([(knot - offset, value) for knot, value in zip(self.knots, self.knot_values)])
+
+    def __repr__(self):
+        return f'PiecewiseLinearCurve({len(self.knots)} points)'
+
+
+def as_curve(value, default=math.nan) -> Curve:
+    """A curve as is, (start, value) pairs as a `StepCurve`, a number as a `ConstantCurve`"""
+    if isinstance(value, Curve):
+        return value
+    if isinstance(value, (int, float)):
+        return ConstantCurve(value)
+    return StepCurve.from_pairs(value, default)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from SimCFA.configs import build_config1_simulation, config1_parameters, parse_date
+from SimCFA.recorder import SAMPLING_DAILY, SAMPLING_ON_CHANGE
+from SimCFA.simulation import STEPPING_DAILY, STEPPING_NEXT_EVENT
+from SimCFA.simulation_procedures import attach_run_summary, create_simulation_state_recorder, make_df_from_state_list
+
+HOUSE_BUY_DAY = (parse_date(config1_parameters['house_buy_date']) - parse_date(config1_parameters['start_date'])).days
+
+
+def build(stepping=STEPPING_DAILY, sampling=SAMPLING_DAILY):
+    simulation = build_config1_simulation({'years': 10})
+    simulation.stepping = stepping
+    record_state, access_state = create_simulation_state_recorder(simulation.n_days, sampling)
+    simulation.add_event_listener_applied('day_ended', record_state)
+    access_summary = attach_run_summary(simulation)
+    return simulation, access_state, access_summary
+
+
+def assert_same_run(run, expected):
+    (recording, summary), (expected_recording, expected_summary) = run, expected
+    assert summary == expected_summary
+    pd.testing.assert_frame_equal(make_df_from_state_list(recording), make_df_from_state_list(expected_recording))
+    assert recording.curves['inflation'].tolist() == expected_recording.curves['inflation'].tolist()
+
+
+@pytest.mark.parametrize(
+    'stepping, sampling', [(STEPPING_DAILY, SAMPLING_DAILY), (STEPPING_NEXT_EVENT, SAMPLING_ON_CHANGE)]
+)
+@pytest.mark.parametrize('n_day', [1, HOUSE_BUY_DAY, HOUSE_BUY_DAY + 1, 2000])
+def test_fork_matches_uninterrupted_run(stepping, sampling, n_day):
+    simulation, access_state, access_summary = build(stepping, sampling)
+    simulation.simulate()
+    expected = access_state(), access_summary()
+
+    simulation, access_state, access_summary = build(stepping, sampling)
+    simulation.simulate_until(n_day)
+    checkpoint = simulation.checkpoint(access_state, access_summary)
+    assert checkpoint.n_day == n_day
+
+    first, first_state, first_summary = checkpoint.fork()
+    second, second_state, second_summary = checkpoint.fork()
+    first.simulate()
+    assert_same_run((first_state(), first_summary()), expected)
+    # neither the other fork nor the paused original were touched by the run of the first fork
+    second.simulate()
+    assert_same_run((second_state(), second_summary()), expected)
+    simulation.simulate()
+    assert_same_run((access_state(), access_summary()), expected)
+
+
+def test_forks_are_full_copies():
+    simulation, access_state, _ = build()
+    simulation.simulate_until(HOUSE_BUY_DAY + 1)
+    fork, fork_state = simulation.fork(access_state)
+    assert fork.ledger_items is not simulation.ledger_items
+    assert fork.ledger_items['house'][0] is not simulation.ledger_items['house'][0]
+    # the days recorded before the fork are copied as well
+    for name, column in access_state().columns.items():
+        assert not np.shares_memory(fork_state().columns[name], column)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from SimCFA.cohort import CohortPlan, simulate_cohort
+from SimCFA.configs import build_config1_simulation, config1_parameters, parse_date
+from SimCFA.LedgerItem import three_year_bond_builder
+from SimCFA.simulation_procedures import attach_run_summary
+
+
+def config1_household(parameters):
+    """Household of the cohort doing what `build_config1_simulation` does"""
+    params = config1_parameters | parameters
+    return {
+        'initial_cash': params['initial_cash'],
+        'income_steps': [(parse_date(start), income) for start, income in params['income_map']],
+        'expense_steps': [(parse_date(params['life_costs_start_date']), -params['life_costs'])],
+        # `create_simulate_monthly_cash_move` applies on the 10th
+        'expense_day_apply': 10,
+        'bond_purchases': [(parse_date(params['bond_buy_date']), params['bond_quantity'])],
+        'house_purchases': [(parse_date(params['house_buy_date']), params['house_price'])],
+        'debt_payback_monthly': params['debt_payback_monthly'],
+    }
+
+
+def run_cohort(households, years=20):
+    plan = CohortPlan(years * 365, parse_date(config1_parameters['start_date']), households, three_year_bond_builder)
+    return simulate_cohort(plan, sampling='daily', keep_paths=True)
+
+
+# the house is bought on credit, paid back monthly or left to grow, the household owes one debt at a time
+@pytest.mark.parametrize('debt_payback_monthly', [0, 3000_00])
+def test_one_household_matches_simulation(debt_payback_monthly):
+    parameters = {'debt_payback_monthly': debt_payback_monthly}
+    simulation = build_config1_simulation(parameters)
+    access_summary = attach_run_summary(simulation)
+    net_worth = [record['net_worth'] for record in simulation.simulate_iter()]
+    summary = access_summary()
+
+    result = run_cohort([config1_household(parameters)])
+    np.testing.assert_allclose(result.paths[:, 0], net_worth, rtol=1e-9, atol=1e-3)
+    # the run summary is in currency units, the cohort in cents
+    assert result.final['cash'][0] == pytest.approx(summary['final_cash'] * 100, rel=1e-9)
+    assert result.summary['max_debt'][0] == pytest.approx(summary['max_debt'] * 100, rel=1e-9)
+    assert result.summary['min_cash'][0] == pytest.approx(summary['min_cash'] * 100, abs=1e-6)
+    assert result.summary['first_negative_cash_day'][0] == summary['first_negative_cash_day']
+
+
+def test_households_are_independent():
+    households = [
+        config1_household({}),
+        config1_household({'debt_payback_monthly': 0, 'house_price': 400_000_00}),
+        config1_household({'initial_cash': 0, 'bond_quantity': 0}),
+    ]
+    together = run_cohort(households, years=10)
+    for n, household in enumerate(households):
+        alone = run_cohort([household], years=10)
+        np.testing.assert_allclose(together.paths[:, n], alone.paths[:, 0], rtol=1e-12)
+
+
+def test_empty_table():
+    with pytest.raises(ValueError, match='No households'):
+        run_cohort([])
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from SimCFA.compound_interest_calculator import GrowthFactorCache, GrowthFactorTable, compound_interest_calc
+
+RATES = [(2, 1), (2.5, 1), (7, 12), (18, 1), (0, 1), (-3, 4)]
+
+
+@pytest.mark.parametrize('percent, n_times_during_year', RATES)
+@pytest.mark.parametrize('days_in_year', [365, 365.25])
+def test_table_matches_scalar(percent, n_times_during_year, days_in_year):
+    table = GrowthFactorTable(percent, n_times_during_year, days_in_year, max_days=3000)
+    # out of order lookups extend the table several times, around the extension sizes and past `max_days`
+    days = [5, 0, 365, 366, 367, 731, 732, 1500, 2999, 3000, 3001, 4000, -1, -400, 10.5, 400.0]
+    for day in days:
+        expected = compound_interest_calc(percent, day / days_in_year, n_times_during_year)
+        assert table.get(day) == expected
+    assert len(table.factors) == 3001
+
+
+@pytest.mark.parametrize('percent, n_times_during_year', RATES)
+def test_take_matches_get(percent, n_times_during_year):
+    table = GrowthFactorTable(percent, n_times_during_year, max_days=2000)
+    days = np.array([0, 1, 364, 365, 1999, 2000, 2001, 5000, -7])
+    expected = [compound_interest_calc(percent, day / 365, n_times_during_year) for day in days.tolist()]
+    assert table.take(days).tolist() == expected
+    assert table.take(days.astype(float) + 0.25).tolist() == [
+        compound_interest_calc(percent, day / 365, n_times_during_year) for day in (days + 0.25).tolist()
+    ]
+    assert table.take(days[:4]).tolist() == expected[:4]
+    assert table.take(np.array([], dtype=np.int64)).shape == (0,)
+
+
+def test_cache_evicts_least_recently_used_table():
+    cache = GrowthFactorCache(max_tables=3)
+    first, second, third = (cache.get_table(percent) for percent in (1, 2, 3))
+    assert cache.get_table(1) is first
+    cache.get_table(4)
+    assert list(cache.tables) == [(3, 1, 365), (1, 1, 365), (4, 1, 365)]
+    assert cache.get_table(3) is third
+    assert cache.get_table(1) is first
+
+    # a table evicted and built again gives the same factors
+    rebuilt = cache.get_table(2)
+    assert rebuilt is not second
+    assert len(cache.tables) == 3
+    assert rebuilt.get(1000) == second.get(1000) == compound_interest_calc(2, 1000 / 365)
@@ -0,0 +1,101 @@
+from SimCFA.configs import config1_parameters, parse_date
+from SimCFA.goal_seek import Prober, WarmStart, find_limit, goal_seek
+from SimCFA.LedgerItem import DAYS_YEAR, three_year_bond_builder
+from SimCFA.simulation import Simulation
+from SimCFA.simulation_procedures import (
+    append_cash,
+    create_bond_buy,
+    create_bond_buy_back_for_cash,
+    create_bond_buy_on_date,
+    create_buy_house,
+    create_calculate_inflation,
+    create_cash_income,
+    create_debt_payback_strategy,
+    create_debt_with_interest,
+    create_simulate_monthly_cash_move,
+)
+
+CONFIG = {'years': 8}
+HOUSE_BUY_DAY = (parse_date(config1_parameters['house_buy_date']) - parse_date(config1_parameters['start_date'])).days
+
+
+def build_with_handles(parameters):
+    """`build_config1_simulation` keeping the subscriptions of the house purchase and of the debt payback"""
+    params = config1_parameters | parameters
+    simulation = Simulation(params['years'] * DAYS_YEAR, parse_date(params['start_date']))
+    income_map = [(parse_date(start), income) for start, income in params['income_map']]
+    bonds_buy = create_bond_buy(params['bond_quantity'], three_year_bond_builder)
+
+    simulation.add_event_listener_applied('simulation_started', append_cash(params['initial_cash'], 0))
+    simulation.add_event_listener_applied('day_started', create_cash_income(income_map))
+    simulation.add_event_listener_applied(
+        'day_started',
+        create_simulate_monthly_cash_move(params['life_costs'], parse_date(params['life_costs_start_date'])),
+    )
+    simulation.house_buy = simulation.add_event_listener_applied('day_started', buy_house(params['house_price']))
+    simulation.add_event_listener_applied(
+        'day_started', create_bond_buy_on_date(bonds_buy, parse_date(params['bond_buy_date']))
+    )
+    simulation.add_event_listener_applied('day_started', create_calculate_inflation(params['inflation_percent']))
+    simulation.debt_payback = simulation.add_event_listener_applied(
+        'day_started', create_debt_payback_strategy(params['debt_payback_monthly'])
+    )
+    simulation.add_event_listener_applied('bond_buy_back', create_bond_buy_back_for_cash())
+    simulation.add_event_listener_applied('cash_state_negative', create_debt_with_interest())
+    return simulation
+
+
+def buy_house(price):
+    return create_buy_house(price, parse_date(config1_parameters['house_buy_date']))
+
+
+def inject_house_price(simulation, value):
+    simulation.replace_listener(simulation.house_buy, buy_house(value))
+
+
+def inject_debt_payback(simulation, value):
+    simulation.replace_listener(simulation.debt_payback, create_debt_payback_strategy(value))
+
+
+def test_goal_seek_warm_and_cold_agree():
+    kwargs = {'target': 500_000, 'build_fn': build_with_handles, 'tolerance': 100_00}
+    cold = goal_seek(CONFIG, 'house_price', 'max_debt', 0, 2_000_000_00, **kwargs)
+    warm_start = WarmStart(HOUSE_BUY_DAY, inject_house_price)
+    warm = goal_seek(CONFIG, 'house_price', 'max_debt', 0, 2_000_000_00, warm_start=warm_start, **kwargs)
+    assert cold.warm_start_day == 0
+    assert warm.warm_start_day == HOUSE_BUY_DAY
+    assert (warm.value, warm.summary, warm.converged) == (cold.value, cold.summary, cold.converged)
+    assert warm.probes == cold.probes
+
+
+def net_worth_constraint(summary):
+    return summary['final_net_worth'] >= 350_000
+
+
+def test_find_limit_warm_and_cold_agree():
+    kwargs = {'maximize': False, 'build_fn': build_with_handles, 'tolerance': 10_00}
+    cold = find_limit(CONFIG, 'debt_payback_monthly', net_worth_constraint, 0, 3000_00, **kwargs)
+    # no debt is taken before the house is bought, the payback has not changed its state yet
+    warm_start = WarmStart(HOUSE_BUY_DAY, inject_debt_payback)
+    warm = find_limit(CONFIG, 'debt_payback_monthly', net_worth_constraint, 0, 3000_00, warm_start=warm_start, **kwargs)
+    assert warm.warm_start_day == HOUSE_BUY_DAY
+    assert (warm.value, warm.summary, warm.converged) == (cold.value, cold.summary, cold.converged)
+    assert warm.probes == cold.probes
+
+
+def test_warm_start_after_the_state_changed_falls_back_to_cold_runs():
+    # by then the payback of the `low` run has lowered the monthly amount held in its closure, the injected fresh
+    # listener does not continue that state
+    warm_start = WarmStart(HOUSE_BUY_DAY + DAYS_YEAR, inject_debt_payback)
+    prober = Prober(CONFIG, 'debt_payback_monthly', build_with_handles, warm_start)
+    prober.prepare(1000_00)
+    assert prober.summary(2000_00) != prober.run_cold(2000_00)
+
+    kwargs = {'maximize': False, 'build_fn': build_with_handles, 'tolerance': 10_00}
+    cold = find_limit(CONFIG, 'debt_payback_monthly', net_worth_constraint, 1000_00, 3000_00, **kwargs)
+    warm = find_limit(
+        CONFIG, 'debt_payback_monthly', net_worth_constraint, 1000_00, 3000_00, warm_start=warm_start, **kwargs
+    )
+    # the final bracket did not hold up in cold runs, the search ran again from scratch
+    assert warm.warm_start_day == 0
+    assert (warm.value, warm.summary, warm.converged) == (cold.value, cold.summary, cold.converged)
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+from SimCFA.config_compiler import build_simulation_from_plan, compile_config
+from SimCFA.configs import build_config1_simulation
+from SimCFA.simulation_procedures import attach_run_summary
+
+DATA = Path(__file__).parents[1] / 'data'
+COARSE = ('weekly', 'monthly')
+
+
+def run_config1(granularity, years=20):
+    simulation = build_config1_simulation({'granularity': granularity, 'years': years})
+    acquired = []
+    simulation.add_event_listener_applied('ledger_item_acquired', lambda item: acquired.append(item))
+    access_summary = attach_run_summary(simulation)
+    simulation.simulate()
+    return access_summary(), acquired
+
+
+def run_config02(granularity):
+    config = json.loads((DATA / 'example_simulation_config02.json').read_text())
+    config['simulation_parameters']['granularity'] = granularity
+    simulation = build_simulation_from_plan(compile_config(config))
+    access_summary = attach_run_summary(simulation)
+    simulation.simulate()
+    return access_summary(), simulation.ledger_items
+
+
+@pytest.mark.parametrize('granularity', COARSE)
+def test_scheduled_events_keep_their_day(granularity):
+    daily, daily_acquired = run_config1('daily')
+    coarse, coarse_acquired = run_config1(granularity)
+    # the bond of 2023-10-26 is bought on its day, not at the end of the period
+    assert [item.properties.acquired_on for item in coarse_acquired] == [
+        item.properties.acquired_on for item in daily_acquired
+    ]
+    assert coarse['final_net_worth'] == pytest.approx(daily['final_net_worth'], rel=1e-12)
+    assert coarse['first_negative_cash_day'] == daily['first_negative_cash_day']
+
+
+@pytest.mark.parametrize('granularity, tolerance', [('weekly', 1e-3), ('monthly', 1e-2)])
+def test_coarse_run_stays_close_to_daily(granularity, tolerance):
+    # the ETF is bought with the cash of the period end instead of every day, the sale on 2027-01-01 still comes
+    # after the last purchase of 2026-12-31
+    daily, _ = run_config02('daily')
+    coarse, ledger_items = run_config02(granularity)
+    assert len(ledger_items['ETF']) == 0
+    assert coarse['final_net_worth'] == pytest.approx(daily['final_net_worth'], rel=tolerance)
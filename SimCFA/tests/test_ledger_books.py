@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from SimCFA.ledger_books import BondBook, CashBook, CurveBook, DebtBook, LedgerBook
+from SimCFA.LedgerItem import (
+    Cash,
+    Debt,
+    LedgerItemProperties,
+    LedgerItemType,
+    curve_asset_builder,
+    three_year_bond_builder,
+    year_bond_builder,
+)
+from SimCFA.timeseries import CompoundCurve, PiecewiseLinearCurve
+
+DAYS = np.arange(0, 2000, 7)
+
+
+def make_bonds(rng, n=40):
+    builders = (year_bond_builder, three_year_bond_builder)
+    return [
+        builders[i % 2]
+        .set('properties', LedgerItemProperties(int(rng.integers(1, 50)), int(rng.integers(0, 900))))
+        .build()
+        for i in range(n)
+    ]
+
+
+def make_debts(rng, n=40):
+    return [
+        Debt(
+            LedgerItemProperties(int(rng.integers(1, 10_000_00)), int(rng.integers(0, 900)), LedgerItemType.Liability),
+            p,
+        )
+        for p in rng.choice([0, 5, 18], n)
+    ]
+
+
+def make_curve_assets(rng, n=40):
+    curves = (CompoundCurve(7), PiecewiseLinearCurve([(0, 100_00), (500, 80_00), (1500, 150_00)]))
+    return [
+        curve_asset_builder.set('properties', LedgerItemProperties(int(rng.integers(1, 20)), 0))
+        .set('price', 100_00)
+        .set('price_curve', curves[i % 2])
+        .build()
+        for i in range(n)
+    ]
+
+
+def make_cash(rng, n=3):
+    return [Cash(LedgerItemProperties(int(rng.integers(0, 10_000_00)), 0)) for _ in range(n)]
+
+
+def items_value(items, n_day):
+    return sum(item.get_value(n_day) for item in items)
+
+
+BOOKS = [(BondBook, make_bonds), (DebtBook, make_debts), (CurveBook, make_curve_assets), (CashBook, make_cash)]
+
+
+@pytest.mark.parametrize('book_type, make_items', BOOKS)
+def test_book_value_matches_items(book_type, make_items):
+    rng = np.random.default_rng(4)
+    items = make_items(rng)
+    book = book_type(items[: len(items) // 2])
+    for item in items[len(items) // 2 :]:
+        book.append(item)
+    # removing items frees slots, half of them compacts the arrays
+    for item in items[::3]:
+        book.remove(item)
+    kept = [item for i, item in enumerate(items) if i % 3]
+
+    for n_day in DAYS.tolist():
+        assert book.get_value(n_day) == pytest.approx(items_value(kept, n_day), rel=1e-9, abs=1e-6)
+    expected = [items_value(kept, n_day) for n_day in DAYS.tolist()]
+    np.testing.assert_allclose(book.get_value_over_days(DAYS), expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(book.get_values(700).sum(), items_value(kept, 700), rtol=1e-9)
+    assert book.total_quantity() == sum(item.properties.quantity for item in kept)
+
+
+def test_book_value_follows_item_changes():
+    # procedures change the quantity of held items in place, e.g. a partial debt payback
+    rng = np.random.default_rng(5)
+    items = make_debts(rng, 10)
+    book = DebtBook(items)
+    assert book.get_value(300) == pytest.approx(items_value(items, 300), rel=1e-9)
+    items[3].properties.quantity = 1
+    assert book.get_value(300) == pytest.approx(items_value(items, 300), rel=1e-9)
+
+
+def test_ledger_book_is_abstract():
+    with pytest.raises(TypeError):
+        LedgerBook()
@@ -0,0 +1,119 @@
+import json
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pytest
+from SimCFA.benchmarks import build_loan_churn
+from SimCFA.config_compiler import ConfigError, compile_config
+from SimCFA.events import Events
+from SimCFA.ledger_books import PAYOFF_AVALANCHE, PAYOFF_SNOWBALL, DebtBook, LedgerBooks, LoanBook
+from SimCFA.LedgerItem import Cash, Debt, LedgerItemProperties, LedgerItemType
+from SimCFA.simulation_procedures import attach_run_summary, create_debt_payback_strategy
+
+DATA = Path(__file__).parents[1] / 'data'
+
+
+def test_capacities_skip_the_loan_book():
+    books = LedgerBooks(capacities={'loans': 16, 'bonds': 16})
+    assert isinstance(books['loans'], LoanBook)
+    assert len(books['bonds']) == 0
+
+
+@pytest.mark.parametrize('category', ['loans', 'cash', 'debt'])
+def test_reserved_categories_are_rejected(category):
+    config = json.loads((DATA / 'example_simulation_config02.json').read_text())
+    config['assets'][-1]['category'] = category
+    with pytest.raises(ConfigError, match=f'`{category}` is not an asset category'):
+        compile_config(config)
+
+
+def test_loan_value_matches_debt_items():
+    rng = np.random.default_rng(7)
+    book = LoanBook()
+    debts = []
+    for n_day in sorted(rng.integers(0, 1500, 60).tolist()):
+        percent = int(rng.choice([5, 18]))
+        amount = int(rng.integers(1, 1000_00))
+        # valued before the borrowing on the same day, the book must not keep that value
+        book.get_value(n_day)
+        book.borrow(amount, percent, n_day)
+        debts.append(Debt(LedgerItemProperties(amount, n_day, LedgerItemType.Liability), percent))
+        assert book.get_value(n_day) == pytest.approx(sum(debt.get_value(n_day) for debt in debts), rel=1e-9)
+    assert len(book) == 2
+    days = np.arange(1500, 4000, 11)
+    expected = [sum(debt.get_value(n_day) for debt in debts) for n_day in days.tolist()]
+    np.testing.assert_allclose(book.get_value_over_days(days), expected, rtol=1e-9)
+    assert book.total_quantity() == sum(debt.properties.quantity for debt in debts)
+
+
+def test_payment_covers_interest_before_principal():
+    book = LoanBook()
+    book.borrow(1000_00, 18, 0)
+    # a year at 18 % accrues 180_00 of interest
+    assert book.pay(100_00, 365) == 100_00
+    assert book.interest_paid == pytest.approx(100_00)
+    assert book.total_quantity() == pytest.approx(1000_00)
+    assert book.pay(200_00, 365) == 200_00
+    assert book.interest_paid == pytest.approx(180_00)
+    assert book.principal_paid == pytest.approx(120_00)
+    assert book.total_quantity() == pytest.approx(880_00)
+    assert book.get_value(365) == pytest.approx(-880_00)
+
+
+@pytest.mark.parametrize(
+    'order, expected',
+    [(PAYOFF_AVALANCHE, {5: 500_00, 10: 200_00, 18: 700_00}), (PAYOFF_SNOWBALL, {5: 400_00, 18: 1000_00})],
+)
+def test_payoff_order(order, expected):
+    book = LoanBook(order)
+    for percent, amount in ((5, 500_00), (18, 1000_00), (10, 200_00)):
+        book.borrow(amount, percent, 0)
+    assert book.pay(300_00, 0) == 300_00
+    assert {percent: loan.balance for percent, loan in book.loans.items()} == expected
+
+
+def test_paying_everything_closes_the_book():
+    book = LoanBook(PAYOFF_SNOWBALL)
+    book.borrow(1000_00, 18, 0)
+    book.borrow(500_00, 5, 100)
+    owed = -book.get_value(800)
+    assert book.pay(10**9, 800) == pytest.approx(owed)
+    assert len(book) == 0
+    assert book.get_value(800) == 0
+    assert book.interest_paid == pytest.approx(book.interest_accrued())
+    assert book.interest_paid + book.principal_paid == pytest.approx(owed)
+
+
+def test_loan_payback_in_a_run():
+    simulation = build_loan_churn(5)
+    borrowed = []
+    simulation.add_event_listener_applied('cash_state_negative', lambda debit_level: borrowed.append(-debit_level))
+    access_summary = attach_run_summary(simulation)
+    simulation.simulate()
+    book = simulation.ledger_items['loans']
+    assert book.interest_paid > 0
+    assert access_summary()['interest_paid'] == pytest.approx(book.interest_paid / 100)
+    assert book.principal_paid + book.total_quantity() == pytest.approx(sum(borrowed))
+
+
+def pay_back_debts(debt_type):
+    ledger_items = defaultdict(list)
+    ledger_items['cash'] = [Cash(LedgerItemProperties(10_000_00, 0))]
+    quantities = [100_00, 250_00, 50_00, 400_00, 120_00, 900_00]
+    ledger_items['debt'] = debt_type(
+        Debt(LedgerItemProperties(quantity, 0, LedgerItemType.Liability), 18) for quantity in quantities
+    )
+    payback = create_debt_payback_strategy(300_00)
+    for month in (1, 2, 3):
+        payback(ledger_items=ledger_items, day_date=date(2024, month, 10), events=Events(), n_day=0)
+    debts = [debt.properties.quantity for debt in ledger_items['debt']]
+    return debts, ledger_items['cash'][0].properties.quantity
+
+
+def test_debt_payback_strategy_on_lists_and_books():
+    # settled debts are dropped in one pass from a plain list, one by one from a book
+    debts, cash = pay_back_debts(list)
+    assert 0 < len(debts) < 6
+    assert pay_back_debts(DebtBook) == (debts, cash)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from SimCFA.configs import build_config1_simulation, config1_parameters, parse_date
+from SimCFA.LedgerItem import three_year_bond_builder
+from SimCFA.monte_carlo import BondPurchase, MonteCarloPlan, MonthlyCashMove, constant, simulate_monte_carlo
+from SimCFA.simulation_procedures import create_simulation_state_recorder
+
+
+def config1_plan(parameters, years=20):
+    """Plan of only constant distributions doing what `build_config1_simulation` does"""
+    params = config1_parameters | parameters
+    return MonteCarloPlan(
+        years * 365,
+        parse_date(params['start_date']),
+        params['initial_cash'],
+        [(parse_date(start), income) for start, income in params['income_map']],
+        cash_moves=[MonthlyCashMove(params['life_costs'], parse_date(params['life_costs_start_date']))],
+        bond_purchases=[
+            BondPurchase(parse_date(params['bond_buy_date']), params['bond_quantity'], three_year_bond_builder)
+        ],
+        house_purchases=[(parse_date(params['house_buy_date']), params['house_price'])],
+        debt_payback_monthly=params['debt_payback_monthly'],
+        inflation_percent=constant(params['inflation_percent']),
+        income_shock=constant(1),
+    )
+
+
+# the house is bought on credit and paid back monthly or left to grow, one debt is owed at a time so paying it back
+# pro rata (see `MonteCarloPlan`) and oldest first are the same
+@pytest.mark.parametrize('debt_payback_monthly', [0, 3000_00])
+def test_constant_plan_matches_simulation(debt_payback_monthly):
+    parameters = {'debt_payback_monthly': debt_payback_monthly}
+    simulation = build_config1_simulation(parameters)
+    record_state, access_state = create_simulation_state_recorder(simulation.n_days)
+    simulation.add_event_listener_applied('day_ended', record_state)
+    net_worth = np.array([record['net_worth'] for record in simulation.simulate_iter()])
+    inflation = access_state().curves['inflation'][: len(net_worth)]
+
+    result = simulate_monte_carlo(config1_plan(parameters), 3, seed=1)
+    assert result.n_day.tolist() == list(range(len(net_worth)))
+    for percentile in result.percentiles:
+        np.testing.assert_allclose(result.band('net_worth', percentile), net_worth, rtol=1e-9, atol=1e-3)
+        np.testing.assert_allclose(
+            result.band('net_worth_real', percentile), net_worth / inflation, rtol=1e-9, atol=1e-3
+        )
+    np.testing.assert_allclose(result.final_net_worth, net_worth[-1], rtol=1e-9)
+
+
+def test_constant_plan_does_not_depend_on_the_seed():
+    plan = config1_plan({}, years=5)
+    first, second = simulate_monte_carlo(plan, 2, seed=1), simulate_monte_carlo(plan, 2, seed=2)
+    np.testing.assert_array_equal(first.bands['net_worth'], second.bands['net_worth'])
+    np.testing.assert_array_equal(first.bands['net_worth_real'], second.bands['net_worth_real'])
@@ -0,0 +1,95 @@
+import json
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+from SimCFA.config_compiler import PLAN_CACHE_ENV, PlanCache, compile_config, config_hash, load_compiled_plan
+
+from SimCFA import config_compiler
+
+DATA = Path(__file__).parents[1] / 'data'
+CONFIG = json.loads((DATA / 'example_simulation_config01.json').read_text())
+
+
+class Foreign:
+    def __reduce__(self):
+        return (os.remove, ('no such file',))
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache(monkeypatch):
+    monkeypatch.setattr(config_compiler, '_memory_cache', type(config_compiler._memory_cache)())
+
+
+def test_disk_cache_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.delenv(PLAN_CACHE_ENV, raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    load_compiled_plan(CONFIG)
+    assert not list(tmp_path.iterdir())
+
+    monkeypatch.setenv(PLAN_CACHE_ENV, str(tmp_path / 'plans'))
+    config_compiler._memory_cache.clear()
+    load_compiled_plan(CONFIG)
+    assert (tmp_path / 'plans' / f'{config_hash(CONFIG)}.pickle').exists()
+
+
+def test_entry_round_trip(tmp_path):
+    cache = PlanCache(tmp_path)
+    key = config_hash(CONFIG)
+    plan = compile_config(CONFIG)
+    cache.put(key, plan)
+    assert PlanCache(tmp_path).get(key) == plan
+    assert os.stat(tmp_path / 'secret').st_mode & 0o077 == 0
+
+
+def test_foreign_and_stale_entries_are_not_unpickled(tmp_path, monkeypatch):
+    cache = PlanCache(tmp_path)
+    key = config_hash(CONFIG)
+    path = tmp_path / f'{key}.pickle'
+
+    path.write_bytes(pickle.dumps(Foreign()))
+    assert cache.get(key) is None
+    # an entry signed by another cache directory
+    other = PlanCache(tmp_path / 'other')
+    other.put(key, Foreign())
+    os.replace(tmp_path / 'other' / f'{key}.pickle', path)
+    assert cache.get(key) is None
+    # an entry of another plan renamed to the key
+    cache.put('other key', Foreign())
+    os.replace(tmp_path / 'other key.pickle', path)
+    assert cache.get(key) is None
+
+    cache.put(key, compile_config(CONFIG))
+    monkeypatch.setattr(config_compiler, 'code_version', lambda: 'newer')
+    assert cache.get(key) is None
+    # the stale entry is compiled again and replaced
+    plan = load_compiled_plan(CONFIG, cache)
+    assert cache.get(key) == plan
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    configs = [
+        {**CONFIG, 'simulation_parameters': {'start_date': '2023-01-01', 'end_date': f'{year}-01-01'}}
+        for year in range(2030, 2034)
+    ]
+    plans = [compile_config(config) for config in configs]
+    entry_size = len(pickle.dumps(plans[0], protocol=pickle.HIGHEST_PROTOCOL)) + 64
+    cache = PlanCache(tmp_path, max_bytes=3 * entry_size)
+    keys = [config_hash(config) for config in configs]
+    for n, (key, plan) in enumerate(zip(keys[:3], plans, strict=False)):
+        cache.put(key, plan)
+        os.utime(tmp_path / f'{key}.pickle', (n, n))
+    assert cache.get(keys[0]) is not None
+
+    cache.put(keys[3], plans[3])
+    assert cache.size() <= cache.max_bytes
+    assert [cache.get(key) is not None for key in keys] == [True, False, True, True]
+
+
+def test_memory_cache_is_checked_first(tmp_path):
+    cache = PlanCache(tmp_path)
+    assert load_compiled_plan(CONFIG, cache) is load_compiled_plan(CONFIG, cache)
+    config_compiler._memory_cache.clear()
+    assert load_compiled_plan(CONFIG, cache) == compile_config(CONFIG)
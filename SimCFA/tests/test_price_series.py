@@ -0,0 +1,102 @@
+import json
+import os
+import pickle
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pytest
+from SimCFA.config_compiler import compile_config, config_hash
+from SimCFA.price_series import (
+    PRICE_CACHE_ENV,
+    open_price_series,
+    read_daily_prices,
+    series_fingerprints,
+)
+from SimCFA.run_cache import run_key
+
+from SimCFA import price_series
+
+DATA = Path(__file__).parents[1] / 'data'
+# Friday with two ticks, the weekend without rows, Monday and Tuesday
+CSV = """date,close,volume
+2024-01-05 09:30,10.0,1
+2024-01-05 16:00,11.0,1
+2024-01-08,12.0,1
+2024-01-09,13.5,1
+"""
+DAILY = [11.0, 11.0, 11.0, 12.0, 13.5]
+
+
+@pytest.fixture(autouse=True)
+def price_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(price_series, '_opened', {})
+    monkeypatch.setenv(PRICE_CACHE_ENV, str(tmp_path / 'prices'))
+    return tmp_path / 'prices'
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(CSV)
+    return path
+
+
+def test_daily_prices(csv_path):
+    first_day, prices = read_daily_prices(csv_path)
+    assert first_day == date(2024, 1, 5).toordinal()
+    assert prices.tolist() == DAILY
+
+
+@pytest.mark.parametrize('cache_dir', ['default', None])
+def test_days_outside_the_data_are_clamped(csv_path, price_cache, cache_dir):
+    series = open_price_series(csv_path, scale=100, cache_dir=cache_dir)
+    days = [
+        date(2023, 12, 1),
+        date(2024, 1, 4),
+        date(2024, 1, 6),
+        date(2024, 1, 9),
+        date(2024, 1, 10),
+        date(2030, 1, 1),
+    ]
+    expected = [1100.0, 1100.0, 1100.0, 1350.0, 1350.0, 1350.0]
+    assert [series.value_at(day) for day in days] == expected
+    assert series.values(days).tolist() == expected
+    assert isinstance(series.prices, np.memmap) == (cache_dir == 'default')
+    assert (cache_dir == 'default') == price_cache.exists()
+
+
+def test_pickled_series_is_opened_again_with_its_shift(csv_path):
+    start = date(2024, 1, 1)
+    series = open_price_series(csv_path, scale=100).scaled(2).shifted(start)
+    n_days = list(range(-3, 12))
+    expected = series.values(n_days).tolist()
+    assert expected == [series.value_at(n_day) for n_day in n_days]
+    assert series.value_at((date(2024, 1, 8) - start).days) == 2400.0
+
+    pickled = pickle.dumps(series)
+    # the prices stay in the converted file
+    assert 'prices' not in series.__getstate__()
+    price_series._opened.clear()
+    unpickled = pickle.loads(pickled)
+    assert unpickled.shift == series.shift == start.toordinal()
+    assert unpickled.values(n_days).tolist() == expected
+
+
+def test_edited_csv_changes_the_keys(csv_path):
+    config = json.loads((DATA / 'example_simulation_config01.json').read_text())
+    config['assets'].append(
+        {'name': 'index', 'ID': 3, 'price': 100.0, 'value_calc_method': {'method': 'series', 'path': str(csv_path)}}
+    )
+    fingerprints, plan_key, cache_key = series_fingerprints(config), config_hash(config), run_key(config)
+    plan = compile_config(config)
+
+    csv_path.write_text(CSV.replace('13.5', '14.5'))
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert series_fingerprints(config) != fingerprints
+    assert config_hash(config) != plan_key
+    assert run_key(config) != cache_key
+    edited = compile_config(config)
+    curve, edited_curve = plan.assets[3].price_curve, edited.assets[3].price_curve
+    assert curve.value_at(400) != edited_curve.value_at(400)
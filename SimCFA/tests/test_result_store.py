@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from SimCFA.configs import build_config1_simulation
+from SimCFA.result_store import ResultStore
+from SimCFA.simulation_procedures import create_simulation_state_recorder
+
+
+def record_config1(years):
+    simulation = build_config1_simulation({'years': years})
+    record_state, access_state = create_simulation_state_recorder(simulation.n_days)
+    simulation.add_event_listener_applied('day_ended', record_state)
+    simulation.simulate()
+    return access_state()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / 'store')
+    # the cash goes negative in the fourth year, the shorter run never has debt
+    store.append_recording({'years': 5}, record_config1(5))
+    store.append_recording({'years': 2}, record_config1(2))
+    return store
+
+
+def test_recording_round_trip(store):
+    (run_id,) = store.runs(years=5)['run_id']
+    expected = record_config1(5)
+    stored = store.recording(run_id)
+    assert len(stored) == len(expected)
+    for name, column in expected.columns.items():
+        np.testing.assert_array_equal(stored.columns[name], column)
+
+
+def test_column_across_runs_pads_missing_columns(store):
+    run_5, run_2 = store.runs()['run_id']
+    assert 'debt - value' not in store.column_names(run_2)
+
+    debt = store.column_across_runs('debt - value')
+    assert debt.shape == (2, 5 * 365)
+    np.testing.assert_array_equal(debt[0], store.column(run_5, 'debt - value'))
+    assert np.isnan(debt[1]).all()
+
+    cash = store.column_across_runs('cash - value', [run_2, run_5])
+    np.testing.assert_array_equal(cash[0, : 2 * 365], store.column(run_2, 'cash - value'))
+    assert np.isnan(cash[0, 2 * 365 :]).all()
+
+
+def test_column_across_runs_unknown_column(store):
+    with pytest.raises(KeyError):
+        store.column_across_runs('no such column')
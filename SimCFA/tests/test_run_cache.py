@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+import pytest
+from SimCFA.configs import execute_loaded_config, invalidate_cached_run
+from SimCFA.LedgerItem import Cash
+from SimCFA.run_cache import RunCache
+from SimCFA.simulation_procedures import create_append_ledger_item
+
+DATA = Path(__file__).parents[1] / 'data'
+CONFIG = json.loads((DATA / 'example_simulation_config01.json').read_text())
+CONFIG['simulation_parameters']['end_date'] = '2030-01-01'
+
+
+def extra_cash(amount):
+    def transform(simulation):
+        simulation.add_event_listener_applied(
+            'simulation_started', create_append_ledger_item(amount, ledger_item=Cash(None))
+        )
+        return simulation
+
+    return transform
+
+
+def double_run(simulation):
+    return extra_cash(1000_00)(simulation)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RunCache(tmp_path)
+
+
+def test_closures_need_a_variant(cache):
+    # both closures are `extra_cash.<locals>.transform`, a name based key would return the first run for the second
+    with pytest.raises(ValueError, match='variant'):
+        execute_loaded_config(CONFIG, extra_cash(0), run_cache=cache)
+    with pytest.raises(ValueError, match='variant'):
+        execute_loaded_config(CONFIG, lambda simulation: simulation, run_cache=cache)
+
+    small = execute_loaded_config(CONFIG, extra_cash(0), run_cache=cache, variant='extra 0')
+    large = execute_loaded_config(CONFIG, extra_cash(10**9), run_cache=cache, variant='extra 10**9')
+    assert not large.cached
+    assert large.summary['final_net_worth'] != small.summary['final_net_worth']
+    again = execute_loaded_config(CONFIG, extra_cash(10**9), run_cache=cache, variant='extra 10**9')
+    assert again.cached
+    assert again.summary == large.summary
+
+
+def test_module_level_transform_is_named(cache):
+    plain = execute_loaded_config(CONFIG, run_cache=cache)
+    transformed = execute_loaded_config(CONFIG, double_run, run_cache=cache)
+    assert not transformed.cached
+    assert transformed.summary['final_net_worth'] != plain.summary['final_net_worth']
+    assert execute_loaded_config(CONFIG, double_run, run_cache=cache).cached
+
+
+def test_reporting_keys_share_the_entry(cache):
+    first = execute_loaded_config(CONFIG, run_cache=cache)
+    plotted = execute_loaded_config({**CONFIG, 'plot': {'show': True}}, run_cache=cache)
+    assert not first.cached and plotted.cached
+    assert plotted.key == first.key
+    assert plotted.summary == first.summary
+
+
+def test_refresh_and_invalidate_bypass_the_cache(cache):
+    execute_loaded_config(CONFIG, run_cache=cache)
+    refreshed = execute_loaded_config(CONFIG, run_cache=cache, refresh=True)
+    assert not refreshed.cached
+    assert execute_loaded_config(CONFIG, run_cache=cache).cached
+
+    assert invalidate_cached_run(CONFIG, run_cache=cache)
+    assert not invalidate_cached_run(CONFIG, run_cache=cache)
+    assert not execute_loaded_config(CONFIG, run_cache=cache).cached
+
+
+def test_cache_is_trimmed_to_max_bytes(tmp_path):
+    cache = RunCache(tmp_path)
+    first = execute_loaded_config(CONFIG, run_cache=cache)
+    cache.max_bytes = cache.size()
+    execute_loaded_config(CONFIG, double_run, run_cache=cache)
+    assert cache.size() <= cache.max_bytes
+    assert first.key not in cache
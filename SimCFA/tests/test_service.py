@@ -0,0 +1,74 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from SimCFA.config_compiler import config_hash
+from SimCFA.service import SimulationService
+
+DATA = Path(__file__).parents[1] / 'data'
+CONFIG_BODY = (DATA / 'example_simulation_config01.json').read_bytes()
+
+
+async def request(port, method, path, body=b''):
+    """Status and JSON answer of one request"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    answer = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, payload = answer.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+def serve(test):
+    """Runs `test(service)` against a service listening on a free port with one worker"""
+
+    async def run():
+        service = SimulationService(max_workers=1)
+        await service.start(port=0)
+        try:
+            return await test(service)
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+def test_identical_requests_share_a_run_and_the_cache():
+    async def test(service):
+        first, second = await asyncio.gather(
+            request(service.port, 'POST', '/simulate', CONFIG_BODY),
+            request(service.port, 'POST', '/simulate', CONFIG_BODY),
+        )
+        assert service.stats['runs'] == 1
+        assert service.stats['coalesced'] == 1
+        assert first == second
+        status, answer = first
+        assert status == 200
+        assert answer['config_hash'] == config_hash(json.loads(CONFIG_BODY))
+        assert answer['cached'] is False
+
+        status, repeated = await request(service.port, 'POST', '/simulate', CONFIG_BODY)
+        assert status == 200
+        assert repeated == {**answer, 'cached': True}
+        assert service.stats == {'requests': 3, 'runs': 1, 'cache_hits': 1, 'coalesced': 1}
+        assert (await request(service.port, 'GET', '/health'))[1]['cached'] == 1
+
+    serve(test)
+
+
+@pytest.mark.parametrize(
+    'body',
+    [b'{"simulation_parameters": ', b'[1, 2]', b'\xff', json.dumps({'simulation_parameters': {}}).encode()],
+    ids=['invalid JSON', 'not an object', 'not UTF-8', 'invalid config'],
+)
+def test_bad_requests(body):
+    async def test(service):
+        status, answer = await request(service.port, 'POST', '/simulate', body)
+        assert status == 400
+        assert answer['error']
+        assert service.stats['runs'] == 0
+
+    serve(test)
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from SimCFA.config_compiler import build_simulation_from_plan, compile_config
+from SimCFA.configs import build_config1_simulation
+from SimCFA.recorder import SAMPLING_DAILY, SAMPLING_MONTH_END, SAMPLING_ON_CHANGE
+from SimCFA.simulation import STEPPING_DAILY, STEPPING_NEXT_EVENT
+from SimCFA.simulation_procedures import (
+    attach_run_summary,
+    create_simulation_state_recorder,
+    make_df_from_state_list,
+)
+
+DATA = Path(__file__).parents[1] / 'data'
+
+
+def run(simulation, sampling=SAMPLING_DAILY):
+    record_state, access_state = create_simulation_state_recorder(simulation.n_days, sampling)
+    simulation.add_event_listener_applied('day_ended', record_state)
+    access_summary = attach_run_summary(simulation)
+    simulation.simulate()
+    return access_state(), access_summary()
+
+
+def run_config1(stepping, sampling):
+    simulation = build_config1_simulation({'years': 30})
+    simulation.stepping = stepping
+    return run(simulation, sampling)
+
+
+@pytest.mark.parametrize('sampling', [SAMPLING_DAILY, SAMPLING_ON_CHANGE, SAMPLING_MONTH_END])
+def test_next_event_stepping_matches_daily(sampling):
+    daily_recording, daily_summary = run_config1(STEPPING_DAILY, sampling)
+    recording, summary = run_config1(STEPPING_NEXT_EVENT, sampling)
+    assert summary == daily_summary
+    pd.testing.assert_frame_equal(make_df_from_state_list(recording), make_df_from_state_list(daily_recording))
+    assert recording.curves['inflation'].tolist() == daily_recording.curves['inflation'].tolist()
+
+
+@pytest.mark.parametrize('name', ['example_simulation_config01.json', 'example_simulation_config02.json'])
+def test_next_event_stepping_matches_daily_for_configs(name):
+    config = json.loads((DATA / name).read_text())
+    results = []
+    for stepping in (STEPPING_DAILY, STEPPING_NEXT_EVENT):
+        config['simulation_parameters']['stepping'] = stepping
+        results.append(run(build_simulation_from_plan(compile_config(config))))
+    (daily_recording, daily_summary), (recording, summary) = results
+    assert summary == daily_summary
+    pd.testing.assert_frame_equal(make_df_from_state_list(recording), make_df_from_state_list(daily_recording))
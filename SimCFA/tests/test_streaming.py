@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from SimCFA.configs import build_config1_simulation
+from SimCFA.streaming import ArrowIpcSink, CsvSink, ParquetSink, stop_when, write_records
+
+YEARS = 12
+
+
+def read_csv(path):
+    return pd.read_csv(path)
+
+
+def read_parquet(path):
+    return pd.read_parquet(path)
+
+
+def read_ipc(path):
+    import pyarrow
+
+    with pyarrow.memory_map(str(path)) as source:
+        return pyarrow.ipc.open_file(source).read_pandas()
+
+
+SINKS = [(CsvSink, read_csv), (ParquetSink, read_parquet), (ArrowIpcSink, read_ipc)]
+
+
+def per_item_net_worth(simulation):
+    """Net worth of every day summed item by item, without the ledger books"""
+    net_worth = []
+
+    def record(n_day, ledger_items):
+        net_worth.append(sum(item.get_value(n_day) for items in ledger_items.values() for item in list(items)))
+
+    simulation.add_event_listener_applied('day_ended', record)
+    return net_worth
+
+
+def test_records_match_per_item_values():
+    simulation = build_config1_simulation({'years': YEARS})
+    expected = per_item_net_worth(simulation)
+    records = list(simulation.simulate_iter())
+    assert [record['n_day'] for record in records] == list(range(simulation.n_days))
+    np.testing.assert_allclose([record['net_worth'] for record in records], expected, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize('sink_type, read', SINKS)
+def test_sink_adds_columns_seen_after_first_flush(tmp_path, sink_type, read):
+    if sink_type is not CsvSink:
+        pytest.importorskip('pyarrow')
+    records = list(build_config1_simulation({'years': YEARS}).simulate_iter())
+    first_batch = {name for record in records[:1000] for name in record}
+    assert 'debt - value' not in first_batch and 'house - value' not in first_batch
+
+    path = tmp_path / f'records.{sink_type.__name__}'
+    n_written = write_records(
+        build_config1_simulation({'years': YEARS}).simulate_iter(), sink_type(path, batch_size=1000)
+    )
+    assert n_written == len(records)
+    assert not [name for name in tmp_path.iterdir() if name.suffix == '.tmp']
+
+    frame = read(path)
+    columns = list(dict.fromkeys(name for record in records for name in record))
+    assert list(frame.columns) == columns
+    numeric = [name for name in columns if name != 'date']
+    expected = pd.DataFrame([[record.get(name, 0) for name in numeric] for record in records], columns=numeric)
+    np.testing.assert_allclose(frame[numeric].to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-12)
+
+
+def test_sink_with_columns_rejects_others(tmp_path):
+    records = build_config1_simulation({'years': 1}).simulate_iter()
+    with pytest.raises(ValueError, match='not written by the sink'):
+        write_records(records, CsvSink(tmp_path / 'records.csv', columns=['n_day', 'net_worth'], batch_size=10))
+
+
+def test_stop_when_closes_the_simulation():
+    simulation = build_config1_simulation({'years': YEARS})
+    records = list(stop_when(simulation.simulate_iter(), lambda record: record['n_day'] == 99))
+    assert len(records) == 100
+    assert simulation.next_day == 100
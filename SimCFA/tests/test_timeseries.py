@@ -0,0 +1,118 @@
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from SimCFA.configs import config1_parameters, parse_date
+from SimCFA.LedgerItem import Cash
+from SimCFA.simulation import Simulation
+from SimCFA.simulation_procedures import (
+    add_month_day_date_guard,
+    change_cash_in_place,
+    create_append_ledger_item,
+    create_cash_income,
+    create_simulation_state_recorder,
+)
+from SimCFA.timeseries import (
+    CompoundCurve,
+    ConstantCurve,
+    PiecewiseLinearCurve,
+    StepCurve,
+    as_curve,
+)
+
+START = parse_date(config1_parameters['start_date'])
+INCOME_MAP = [(parse_date(start), income) for start, income in config1_parameters['income_map']]
+STEP = 3
+DATES = [START + timedelta(days=n) for n in range(-40, 1500, STEP)]
+
+CURVES = {
+    'constant': ConstantCurve(250_00),
+    'step': StepCurve.from_pairs(INCOME_MAP),
+    'step with default': StepCurve.from_pairs(INCOME_MAP, default=100_00),
+    'compound': CompoundCurve(3, START, 1000_00),
+    'linear': PiecewiseLinearCurve([(date(2024, 1, 1), 10), (date(2023, 7, 1), 5), (date(2025, 3, 1), 40)]),
+}
+
+
+def legacy_income(newest_first, day_date):
+    """The lookup of `create_cash_income` before it used a curve, on the newest first income map"""
+    found = next(filter(lambda step: day_date >= step[0], newest_first), None)
+    return None if found is None else found[1]
+
+
+@pytest.mark.parametrize('name', CURVES)
+def test_value_at_matches_values(name):
+    curve = CURVES[name]
+    expected = np.array([curve.value_at(day) for day in DATES], dtype=np.float64)
+    np.testing.assert_array_equal(curve.values(DATES), expected)
+    np.testing.assert_array_equal(curve.values(np.array(DATES, dtype='datetime64[D]')), expected)
+    np.testing.assert_array_equal(curve.values_between(DATES[0], DATES[-1])[::STEP], expected)
+
+
+@pytest.mark.parametrize('name', CURVES)
+def test_shifted_is_indexed_by_simulation_day(name):
+    curve = CURVES[name]
+    by_day = curve.shifted(START)
+    n_days = [(day - START).days for day in DATES]
+    np.testing.assert_array_equal(
+        np.array([by_day.value_at(n_day) for n_day in n_days], dtype=np.float64),
+        np.array([curve.value_at(day) for day in DATES], dtype=np.float64),
+    )
+    np.testing.assert_array_equal(by_day.values(n_days), curve.values(DATES))
+
+
+def test_step_default():
+    curve = StepCurve([10, 20], [1, 2])
+    assert math.isnan(curve.value_at(9)) and np.isnan(curve.values([9])[0])
+    assert StepCurve([10, 20], [1, 2], default=0).value_at(9) == 0
+    with pytest.raises(TypeError):
+        StepCurve([10, 20], [1, 2], default=None)
+
+
+def test_from_pairs_orders_the_steps():
+    pairs = [(20, 2), (5, 0), (10, 1)]
+    curve = StepCurve.from_pairs(pairs)
+    assert curve.starts == [5, 10, 20] and curve.step_values == [0, 1, 2]
+    assert [curve.value_at(day) for day in (5, 9, 10, 19, 20, 100)] == [0, 0, 1, 1, 2, 2]
+    assert as_curve(pairs).step_values == curve.step_values
+    with pytest.raises(ValueError):
+        StepCurve([start for start, _ in pairs], [value for _, value in pairs])
+
+
+def test_income_curve_matches_the_newest_first_lookup():
+    newest_first = INCOME_MAP[::-1]
+    curve = as_curve(INCOME_MAP)
+    for day in DATES:
+        expected = legacy_income(newest_first, day)
+        value = curve.value_at(day)
+        assert (expected is None and math.isnan(value)) or value == expected
+        assert type(value) is type(expected) or expected is None
+
+
+def test_cash_income_matches_the_newest_first_lookup():
+    def legacy_cash_income(newest_first):
+        def inner(ledger_items, day_date, events, n_day, **kwargs):
+            income = legacy_income(newest_first, day_date)
+            if income is not None:
+                change_cash_in_place(ledger_items, income, events, n_day, **kwargs)
+
+        return add_month_day_date_guard(inner, 10)
+
+    # the first step starts after the simulation, the days before it have no income
+    assert INCOME_MAP[0][0] > START
+    recordings = []
+    for income in (create_cash_income(INCOME_MAP), legacy_cash_income(INCOME_MAP[::-1])):
+        simulation = Simulation(1500, START)
+        record_state, access_state = create_simulation_state_recorder(simulation.n_days)
+        simulation.add_event_listener_applied(
+            'simulation_started', create_append_ledger_item(0, 0, ledger_item=Cash(None))
+        )
+        simulation.add_event_listener_applied('day_started', income)
+        simulation.add_event_listener_applied('day_ended', record_state)
+        simulation.simulate()
+        recordings.append(access_state())
+    recording, legacy_recording = recordings
+    assert recording.columns.keys() == legacy_recording.columns.keys()
+    for name, column in recording.columns.items():
+        np.testing.assert_array_equal(column, legacy_recording.columns[name])